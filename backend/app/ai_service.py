@@ -2,9 +2,11 @@
 AI layer: OpenAI-powered recommendation engine and chat assistant.
 Uses prompt engineering for structured recommendations and natural chat.
 """
+import asyncio
 import json
 import hashlib
 from typing import List, Optional, Dict, Any
+
 from app.config import OPENAI_API_KEY, USE_BUILTIN_CHAT
 from app.data_store import (
     load_products,
@@ -15,14 +17,26 @@ from app.data_store import (
     add_to_cart,
     clear_cart,
 )
+from app.chat_history import build_history_messages
+from app.fallback_index import SEARCH_KEYWORDS, get_fallback_index
+from app.intent_classifier import classify_agent_intent
+from app.llm_gateway import (
+    get_openai_client,
+    get_async_openai_client,
+    chat_completion,
+    chat_completion_stream,
+    achat_completion_stream,
+    llm_available,
+)
 from app.models import Product
+from app.prompt_fragments import get_catalog_fragments, get_session_fragments
+from app.quick_order_index import get_quick_order_index
+from app.user_context import get_user_snapshot
 
-# Optional OpenAI client (graceful if no key)
-try:
-    from openai import OpenAI
-    _client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-except Exception:
-    _client = None
+# Optional OpenAI clients (graceful if no key); all calls go through the LLM gateway
+_client = get_openai_client()
+# Streaming chat runs on the event loop (see achat_stream)
+_async_client = get_async_openai_client()
 
 # Only log once when OpenAI key is invalid (avoid terminal spam)
 _openai_invalid_logged = False
@@ -69,6 +83,8 @@ def _classify_intent(message: str) -> str:
 
 # Quick order via chat: session_id -> draft { step, attributes, product_id, product }
 _quick_order_drafts: Dict[str, dict] = {}
+# Runner-up products shown next to the best quick-order match
+QUICK_ORDER_ALTERNATIVES = 2
 
 
 def _parse_quick_order_attributes(message: str) -> Dict[str, Any]:
@@ -145,34 +161,23 @@ def _merge_quick_order_from_message(message: str, attrs: Dict[str, Any]) -> Dict
     return out
 
 
-def _select_product_for_quick_order(attrs: Dict[str, Any], products: List[Product]) -> Optional[Product]:
-    """Select best product: category/color/budget match, in-stock, highest rating."""
-    category = attrs.get("category")
-    color = attrs.get("color")
-    budget_max = attrs.get("budget_max")
-    product_type = attrs.get("product_type")
-    candidates = list(products)
-    if category:
-        candidates = [p for p in candidates if category.lower() in (p.category or "").lower() or (p.name and category.lower() in p.name.lower())]
-    if color:
-        candidates = [p for p in candidates if (p.colors and any(color in c.lower() for c in p.colors)) or (p.name and color in p.name.lower())]
-    if budget_max is not None:
-        candidates = [p for p in candidates if p.price <= budget_max]
-    candidates = [p for p in candidates if getattr(p, "in_stock", True)]
-    if product_type:
-        candidates = [p for p in candidates if product_type in (p.name or "").lower() or product_type in (p.category or "").lower() or (p.tags and product_type in " ".join(p.tags).lower())]
-    if not candidates:
-        return None
-    return max(candidates, key=lambda p: (p.rating, -p.price))
+def _select_products_for_quick_order(attrs: Dict[str, Any], limit: int = 1 + QUICK_ORDER_ALTERNATIVES) -> List[Product]:
+    """Best matches first: category/color/budget/type match, in-stock, highest rating (then cheapest)."""
+    return get_quick_order_index().select(attrs, limit=limit)
 
 
 def _parse_agent_intent(message: str, orders_info: List[dict], cart_count: int) -> Dict[str, Any]:
     """
-    Use OpenAI to parse user message into agent intent + params.
+    Parse user message into agent intent + params: locally when the classifier is confident,
+    otherwise with OpenAI.
     Returns {"intent": "cancel_order"|"reorder_last"|"book_at_store"|"deliver_cart"|"none", "order_id": "last"|"ORD-XXX" or null}.
     """
-    if not _client or not OPENAI_API_KEY:
+    # Without the LLM agent actions stay off, as before; the classifier only saves LLM calls
+    if not _client or not OPENAI_API_KEY or not llm_available("gpt-4o-mini"):
         return {"intent": "none", "order_id": None}
+    local = classify_agent_intent(message)
+    if local is not None:
+        return {"intent": local.intent, "order_id": local.order_id}
     msg = (message or "").strip().lower()
     if not msg:
         return {"intent": "none", "order_id": None}
@@ -198,7 +203,7 @@ Rules:
 - For home delivery/deliver: use "deliver_cart", order_id null.
 - If unclear or not an action request: use "none", order_id null."""
     try:
-        resp = _client.chat.completions.create(
+        resp = chat_completion(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.1,
@@ -320,8 +325,8 @@ FAQ excerpts:
 User question: {message}
 
 Your answer (2-4 sentences):"""
-        if _client and OPENAI_API_KEY:
-            resp = _client.chat.completions.create(
+        if _client and OPENAI_API_KEY and llm_available("gpt-4o-mini"):
+            resp = chat_completion(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
@@ -371,9 +376,9 @@ Respond with a JSON array only, no other text: [{{"product_id": "<id>", "reason"
 Example: [{{"product_id": "P001", "reason": "Best value under budget"}}, ...]"""
         top5_ids = []
         content = ""
-        if _client and OPENAI_API_KEY:
+        if _client and OPENAI_API_KEY and llm_available("gpt-4o-mini"):
             try:
-                resp = _client.chat.completions.create(
+                resp = chat_completion(
                     model="gpt-4o-mini",
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.3,
@@ -481,26 +486,12 @@ def get_recommendations(
     """
     context = get_session_context(session_id)
     if user_id:
-        try:
-            from app.order_service import get_user_profile, get_user_orders
-            profile = get_user_profile(user_id)
-            orders = get_user_orders(user_id)
-            if profile:
-                context["user_name"] = profile.name or user_id
-                context["preferred_stores"] = profile.preferred_stores or []
-            if orders:
-                order_cats = []
-                for o in orders[:20]:
-                    for item in getattr(o, "items", []) or []:
-                        pid = getattr(item, "product_id", None)
-                        if pid:
-                            from app.data_store import get_product
-                            p = get_product(pid)
-                            if p and p.category and p.category not in order_cats:
-                                order_cats.append(p.category)
-                context["order_categories"] = order_cats[:10]
-        except Exception:
-            pass
+        user = get_user_snapshot(user_id)
+        if user.profile:
+            context["user_name"] = user.profile.name or user_id
+            context["preferred_stores"] = user.profile.preferred_stores or []
+        if user.orders:
+            context["order_categories"] = user.order_categories
     context_key = hashlib.md5(
         f"{limit}_{max_price}_{category}_{exclude_product_ids}_{user_id or ''}".encode()
     ).hexdigest()
@@ -537,9 +528,9 @@ Respond with a JSON array only, no other text. Each item: {{ "product_id": "<id>
 Order by relevance. Prefer products that match budget, category affinity, and high ratings."""
 
     result: List[dict] = []
-    if _client and OPENAI_API_KEY:
+    if _client and OPENAI_API_KEY and llm_available("gpt-4o-mini"):
         try:
-            resp = _client.chat.completions.create(
+            resp = chat_completion(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
@@ -600,92 +591,28 @@ def chat(session_id: str, message: str, history: Optional[List[dict]] = None) ->
     Enhanced AI shopping assistant with FULL SYSTEM ACCESS - true agent capabilities.
     Returns { content, product_ids } for inline product cards.
     """
-    from app.order_service import get_user_orders, get_user_profile
-    from app.wallet_service import get_wallet_summary
-    from app.data_store import get_categories
+    # Get comprehensive user data (cached until the session's cart / events change)
+    session = get_session_fragments(session_id)
+    context = session.context
+    cart_items = session.cart_items
+    cart_total = session.cart_total
     
-    context = get_session_context(session_id)
-    products = load_products()
+    # Orders, wallet and profile (cached until they change)
+    user = get_user_snapshot(session_id)
+    orders_info = user.orders_info
+    wallet_info = user.wallet_info
+    profile_name = user.profile_name
     
-    # Get comprehensive user data
-    cart_ids = context.get("cart_ids", [])
-    cart_items = []
-    cart_total = 0
-    if cart_ids:
-        cart_items = [get_product(pid) for pid in cart_ids]
-        cart_items = [p for p in cart_items if p]
-        cart_total = sum(p.price for p in cart_items)
-    
-    # Get orders
-    orders_info = []
-    try:
-        orders = get_user_orders(session_id)
-        for order in orders[:3]:
-            orders_info.append({
-                "id": order.id,
-                "total": order.total,
-                "status": order.status.value,
-                "items_count": len(order.items)
-            })
-    except:
-        pass
-    
-    # Get wallet
-    wallet_info = {"balance": 0, "pending_points": 0, "total_earned": 0}
-    try:
-        wallet_summary = get_wallet_summary(session_id)
-        wallet_info = {
-            "balance": wallet_summary.get("balance", 0),
-            "pending_points": wallet_summary.get("pending_points", 0),
-            "total_earned": wallet_summary.get("total_earned", 0),
-            "expiring_soon": wallet_summary.get("expiring_soon", 0)
-        }
-    except:
-        pass
-    
-    # Get profile
-    profile_name = "there"
-    try:
-        profile = get_user_profile(session_id)
-        if profile and profile.name:
-            profile_name = profile.name
-    except:
-        pass
-    
-    # Sample products across categories
-    by_cat: Dict[str, List[Product]] = {}
-    for p in products:
-        by_cat.setdefault(p.category, []).append(p)
-    sampled = []
-    for cat_products in by_cat.values():
-        sampled.extend(cat_products[:10])
-    sampled = (sampled + products)[:100]
-    product_list = "\n".join(
-        [f"- {p.id}: {p.name}, ₹{p.price}, {p.category}, {p.rating}⭐"
-         for p in sampled]
-    )
-    
-    user_context = _build_user_summary(context)
-    cart_summary = ""
-    if cart_items:
-        cart_summary = f"Cart ({len(cart_items)} items, ₹{cart_total}): " + ", ".join([f"{p.name} (₹{p.price})" for p in cart_items[:3]])
-        if len(cart_items) > 3:
-            cart_summary += f" +{len(cart_items)-3} more"
-    
-    categories = get_categories()
+    # Catalog fragments are built once per catalog version
+    catalog = get_catalog_fragments()
+    product_list = catalog.product_list
+    categories = catalog.categories
+    user_context = session.user_context
+    cart_summary = session.cart_summary
 
     # Agent layer: parse intent with OpenAI and execute actions (cancel, reorder, book at store, deliver)
     agent_result = _parse_agent_intent(message, orders_info, len(cart_items))
     if agent_result.get("intent") and agent_result["intent"] != "none":
-        profile_address = None
-        try:
-            profile = get_user_profile(session_id)
-            if profile and getattr(profile, "addresses", None):
-                addrs = profile.addresses if isinstance(profile.addresses, list) else []
-                if addrs:
-                    profile_address = addrs[0]
-        except Exception:
-            pass
         action_result = _execute_agent_action(
             session_id,
             agent_result["intent"],
@@ -693,7 +620,7 @@ def chat(session_id: str, message: str, history: Optional[List[dict]] = None) ->
             orders_info,
             cart_items,
             profile_name,
-            profile_address,
+            get_user_snapshot(session_id).profile_address,
         )
         if action_result:
             return {"content": action_result[0], "product_ids": action_result[1][:6]}
@@ -764,10 +691,7 @@ Remember: You have REAL user data. Use it for accurate, personalized help!"""
     user_block = f"""User message: {message}"""
 
     messages = [{"role": "system", "content": system}]
-    if history:
-        for h in history[-8:]:
-            role = "user" if h.get("role") == "user" else "assistant"
-            messages.append({"role": role, "content": h.get("content", "")})
+    messages.extend(build_history_messages(session_id, history))
     messages.append({"role": "user", "content": user_block})
 
     product_ids: List[str] = []
@@ -776,9 +700,9 @@ Remember: You have REAL user data. Use it for accurate, personalized help!"""
     # Try OpenAI first unless disabled; fallback to built-in intelligent assistant
     global _openai_invalid_logged
 
-    if not USE_BUILTIN_CHAT and _client and OPENAI_API_KEY:
+    if not USE_BUILTIN_CHAT and _client and OPENAI_API_KEY and llm_available("gpt-4o-mini"):
         try:
-            resp = _client.chat.completions.create(
+            resp = chat_completion(
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0.7,
@@ -795,9 +719,9 @@ Remember: You have REAL user data. Use it for accurate, personalized help!"""
                 _openai_invalid_logged = True
             elif not is_invalid_key:
                 print(f"OpenAI chat error: {e}")
-            content, product_ids = _intelligent_fallback(message, profile_name, cart_items, cart_total, wallet_info, orders_info, products, by_cat, user_context)
+            content, product_ids = _intelligent_fallback(message, profile_name, cart_items, cart_total, wallet_info, orders_info, user_context)
     else:
-        content, product_ids = _intelligent_fallback(message, profile_name, cart_items, cart_total, wallet_info, orders_info, products, by_cat, user_context)
+        content, product_ids = _intelligent_fallback(message, profile_name, cart_items, cart_total, wallet_info, orders_info, user_context)
 
     return {"content": content, "product_ids": product_ids[:6]}
 
@@ -837,84 +761,37 @@ def _build_chat_actions(
     return actions[:5]  # Max 5 actions
 
 
-def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = None, context: Optional[dict] = None):
+def _prepare_stream_turn(session_id: str, message: str, history: Optional[List[dict]], context: Optional[dict]) -> dict:
     """
-    Generator that yields SSE-style dicts: {"content": "..."} for each chunk,
-    then {"done": True, "product_ids": [...], "actions": [...]}. Context-aware Aura AI copilot.
+    Everything in a streaming chat turn up to the LLM call (blocking: agent intent, RAG, orders).
+    Returns {"events": [...]} when the turn is answered without streaming, else
+    {"messages", "finish": content -> done event, "fallback": () -> events}.
     """
     import re
-    from app.order_service import get_user_orders, get_user_profile
-    from app.wallet_service import get_wallet_summary
-    from app.data_store import get_categories
 
     request_context = context or {}
     current_page = request_context.get("current_page") or ""
     user_id_for_data = request_context.get("user_id") or session_id  # Use email when logged in for orders/wallet
 
-    context = get_session_context(session_id)
-    products = load_products()
-    cart_ids = context.get("cart_ids", [])
-    cart_items = []
-    cart_total = 0
-    if cart_ids:
-        cart_items = [get_product(pid) for pid in cart_ids]
-        cart_items = [p for p in cart_items if p]
-        cart_total = sum(p.price for p in cart_items)
-
-    orders_info = []
-    try:
-        orders = get_user_orders(user_id_for_data)
-        for order in orders[:3]:
-            orders_info.append({
-                "id": order.id, "total": order.total, "status": order.status.value,
-                "items_count": len(order.items)
-            })
-    except Exception:
-        pass
+    session = get_session_fragments(session_id)
+    context = session.context
+    cart_items = session.cart_items
+    cart_total = session.cart_total
 
-    wallet_info = {"balance": 0, "pending_points": 0, "total_earned": 0}
-    try:
-        ws = get_wallet_summary(user_id_for_data)
-        wallet_info = {**wallet_info, **{k: ws.get(k, 0) for k in ["balance", "pending_points", "total_earned", "expiring_soon"]}}
-    except Exception:
-        pass
+    user = get_user_snapshot(user_id_for_data)
+    orders_info = user.orders_info
+    wallet_info = user.wallet_info
+    profile_name = user.profile_name
 
-    profile_name = "there"
-    try:
-        profile = get_user_profile(user_id_for_data)
-        if profile and profile.name:
-            profile_name = profile.name
-    except Exception:
-        pass
-
-    by_cat: Dict[str, List[Product]] = {}
-    for p in products:
-        by_cat.setdefault(p.category, []).append(p)
-    sampled = []
-    for cat_products in by_cat.values():
-        sampled.extend(cat_products[:10])
-    sampled = (sampled + products)[:100]
-    product_list = "\n".join([f"- {p.id}: {p.name}, ₹{p.price}, {p.category}, {p.rating}⭐" for p in sampled])
-    user_context = _build_user_summary(context)
-    cart_summary = ""
-    if cart_items:
-        cart_summary = f"Cart ({len(cart_items)} items, ₹{cart_total}): " + ", ".join([f"{p.name} (₹{p.price})" for p in cart_items[:3]])
-        if len(cart_items) > 3:
-            cart_summary += f" +{len(cart_items)-3} more"
-    categories = get_categories()
+    catalog = get_catalog_fragments()
+    product_list = catalog.product_list
+    categories = catalog.categories
+    user_context = session.user_context
+    cart_summary = session.cart_summary
 
     # Agent layer: parse intent with OpenAI and execute actions
     agent_result = _parse_agent_intent(message, orders_info, len(cart_items))
     if agent_result.get("intent") and agent_result["intent"] != "none":
-        profile_address = None
-        try:
-            profile = get_user_profile(session_id)
-            if profile and getattr(profile, "addresses", None):
-                addrs = profile.addresses if isinstance(profile.addresses, list) else []
-                if addrs:
-                    profile_address = addrs[0]
-        except Exception:
-            pass
         action_result = _execute_agent_action(
             session_id,
             agent_result["intent"],
@@ -922,13 +799,11 @@ def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = N
             orders_info,
             cart_items,
             profile_name,
-            profile_address,
+            get_user_snapshot(session_id).profile_address,
         )
         if action_result:
             actions = _build_chat_actions("order", bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, message.lower())
-            yield {"content": action_result[0]}
-            yield {"done": True, "product_ids": action_result[1][:6], "actions": actions}
-            return
+            return {"events": [{"content": action_result[0]}, {"done": True, "product_ids": action_result[1][:6], "actions": actions}]}
 
     intent = _classify_intent(message)
     msg_lower = (message or "").lower()
@@ -958,24 +833,17 @@ def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = N
             delivery_date = (datetime.utcnow() + timedelta(days=5)).strftime("%b %d, %Y")
             content = f"Done! **Order placed.**\n\n**Order ID:** {order.id}\n**Delivery by:** {delivery_date}\n**Earned AuraPoints:** ₹{points:.0f} (credited after delivery)\n\nView order: [Order {order.id}](/orders/{order.id})"
             del _quick_order_drafts[session_id]
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": [{"type": "navigate", "label": "View Order", "payload": f"/orders/{order.id}"}]}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": [{"type": "navigate", "label": "View Order", "payload": f"/orders/{order.id}"}]}]}
         else:
             content = "Something went wrong. Please try again or add the item to cart and checkout."
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": []}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": []}]}
 
     if draft and change_msg:
         del _quick_order_drafts[session_id]
         content = "No problem! Tell me again what you'd like—e.g. \"order any black shoe mens for me\"—and we can pick size, budget & type."
-        yield {"content": content}
-        yield {"done": True, "product_ids": [], "actions": []}
-        return
+        return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": []}]}
 
     if draft or intent == "quick_order":
-        products_list = load_products()
         if not draft:
             attrs = _parse_quick_order_attributes(message)
             draft = {"step": "collect", "attributes": attrs, "product_id": None, "product": None}
@@ -991,53 +859,39 @@ def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = N
         if need_size:
             content = f"Got it—looking for **{attrs.get('color') or 'your'} {attrs.get('category') or 'item'}** for **{attrs.get('gender') or 'you'}**. What size?"
             actions = [{"type": "quick_order_option", "label": "Size 8", "payload": "size=8"}, {"type": "quick_order_option", "label": "Size 9", "payload": "size=9"}, {"type": "quick_order_option", "label": "Size 10", "payload": "size=10"}, {"type": "quick_order_option", "label": "Size 11", "payload": "size=11"}]
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": actions}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": actions}]}
 
         if need_budget:
             content = "What's your budget?"
             actions = [{"type": "quick_order_option", "label": "Under ₹1000", "payload": "budget=1000"}, {"type": "quick_order_option", "label": "₹1000–₹2000", "payload": "budget=2000"}, {"type": "quick_order_option", "label": "No limit", "payload": "budget=none"}]
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": actions}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": actions}]}
 
         if need_type:
             content = "Casual, formal, or sports?"
             actions = [{"type": "quick_order_option", "label": "Casual", "payload": "type=casual"}, {"type": "quick_order_option", "label": "Formal", "payload": "type=formal"}, {"type": "quick_order_option", "label": "Sports", "payload": "type=sports"}]
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": actions}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": actions}]}
 
-        product = _select_product_for_quick_order(attrs, products_list)
+        matches = _select_products_for_quick_order(attrs)
+        product = matches[0] if matches else None
         if not product:
             content = "I couldn't find a match with those filters. Try \"Under ₹2000\" or \"No limit\" for budget, or say \"Change details\" to start over."
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": [{"type": "quick_order_change", "label": "Change Details", "payload": "change"}]}
-            return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": [{"type": "quick_order_change", "label": "Change Details", "payload": "change"}]}]}
 
         draft["step"] = "confirm"
         draft["product_id"] = product.id
         draft["product"] = product
         _quick_order_drafts[session_id] = draft
 
-        profile = None
-        try:
-            profile = get_user_profile(request_context.get("user_id") or session_id)
-        except Exception:
-            pass
-        address = "Default address (update in Profile)"
-        if profile and getattr(profile, "addresses", None):
-            addrs = profile.addresses if isinstance(profile.addresses, list) else []
-            if addrs:
-                address = addrs[0]
+        address = user.profile_address or "Default address (update in Profile)"
         wallet_bal = wallet_info.get("balance", 0)
 
-        content = f"Here’s the best match for you:\n\n**{product.name}** — **₹{product.price}** ({product.rating}⭐)\n\n**Order summary:**\n• Product: {product.name}\n• Price: ₹{product.price}\n• Delivery: {address[:50]}{'...' if len(address) > 50 else ''}\n• Payment: Card / UPI at checkout\n• Wallet: ₹{wallet_bal:.0f} available\n\nConfirm to place order?"
+        alternatives = matches[1:]
+        content = f"Here’s the best match for you:\n\n**{product.name}** — **₹{product.price}** ({product.rating}⭐)\n\n"
+        if alternatives:
+            content += "Other close matches: " + ", ".join(f"{p.name} (₹{p.price})" for p in alternatives) + "\n\n"
+        content += f"**Order summary:**\n• Product: {product.name}\n• Price: ₹{product.price}\n• Delivery: {address[:50]}{'...' if len(address) > 50 else ''}\n• Payment: Card / UPI at checkout\n• Wallet: ₹{wallet_bal:.0f} available\n\nConfirm to place order?"
         actions = [{"type": "quick_order_confirm", "label": "Confirm & Place Order", "payload": "confirm"}, {"type": "quick_order_change", "label": "Change Details", "payload": "change"}]
-        yield {"content": content}
-        yield {"done": True, "product_ids": [product.id], "actions": actions}
-        return
+        return {"events": [{"content": content}, {"done": True, "product_ids": [p.id for p in matches], "actions": actions}]}
 
     actions = _build_chat_actions(intent, bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
 
@@ -1047,30 +901,22 @@ def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = N
             content += f"Items in your cart: {len(cart_items)}\nTotal: **₹{cart_total}**\n"
             content += f"Estimated AuraPoints: ₹{(cart_total * (0.07 if cart_total >= 1000 else 0.05)):.0f}\n\n"
             content += "Go to Checkout to finalize, or apply a coupon first!"
-            yield {"content": content}
-            yield {"done": True, "product_ids": [p.id for p in cart_items[:6]], "actions": actions}
+            return {"events": [{"content": content}, {"done": True, "product_ids": [p.id for p in cart_items[:6]], "actions": actions}]}
         else:
             content = f"Hi {profile_name}! Your cart is empty. Tell me what you're looking for and I'll recommend products!"
-            yield {"content": content}
-            yield {"done": True, "product_ids": [], "actions": []}
-        return
+            return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": []}]}
 
     if intent == "faq":
         faq_content = _handle_faq_rag(message)
         content = faq_content or "I don't have that specific information. You can ask about orders, wallet, or product recommendations!"
-        yield {"content": content}
-        yield {"done": True, "product_ids": [], "actions": actions}
-        return
+        return {"events": [{"content": content}, {"done": True, "product_ids": [], "actions": actions}]}
 
     if intent == "recommend":
         rag_result = _handle_recommend_rag(session_id, message, profile_name, context)
         if rag_result:
-            yield {"content": rag_result[0]}
-            yield {"done": True, "product_ids": rag_result[1][:6], "actions": actions}
+            return {"events": [{"content": rag_result[0]}, {"done": True, "product_ids": rag_result[1][:6], "actions": actions}]}
         else:
-            yield {"content": f"Hi {profile_name}! What kind of products are you looking for? Try 'under ₹5000' or 'best laptops'."}
-            yield {"done": True, "product_ids": [], "actions": []}
-        return
+            return {"events": [{"content": f"Hi {profile_name}! What kind of products are you looking for? Try 'under ₹5000' or 'best laptops'."}, {"done": True, "product_ids": [], "actions": []}]}
 
     system = f"""You are AuraShop's friendly AI shopping assistant. Be conversational and helpful.
 
@@ -1085,91 +931,118 @@ Reply in 1-3 short paragraphs. Use **bold** for emphasis. Mention product IDs fo
 
     user_block = f"User: {message}"
     messages = [{"role": "system", "content": system}]
-    if history:
-        for h in history[-8:]:
-            role = "user" if h.get("role") == "user" else "assistant"
-            messages.append({"role": role, "content": h.get("content", "")})
+    messages.extend(build_history_messages(session_id, history))
     messages.append({"role": "user", "content": user_block})
 
-    product_ids: List[str] = []
+    def fallback() -> List[dict]:
+        content, product_ids = _intelligent_fallback(
+            message, profile_name, cart_items, cart_total, wallet_info, orders_info, user_context
+        )
+        act = _build_chat_actions("general", bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
+        return [{"content": content}, {"done": True, "product_ids": product_ids[:6], "actions": act}]
+
+    def finish(content_str: str) -> dict:
+        product_ids = list(dict.fromkeys(re.findall(r"P\d{3,5}", content_str)))[:6]
+        act = _build_chat_actions(intent, bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
+        return {"done": True, "product_ids": product_ids, "actions": act}
+
+    if USE_BUILTIN_CHAT or not OPENAI_API_KEY or not llm_available("gpt-4o-mini"):
+        # Built-in assistant; also while the LLM circuit breaker is open (no network wait)
+        return {"events": fallback()}
+    return {"messages": messages, "finish": finish, "fallback": fallback}
+
+
+def _note_openai_error(e: Exception) -> None:
     global _openai_invalid_logged
+    err_str = str(e).lower()
+    if ("401" in err_str or "invalid_api_key" in err_str) and not _openai_invalid_logged:
+        _openai_invalid_logged = True
 
-    if not USE_BUILTIN_CHAT and _client and OPENAI_API_KEY:
-        try:
-            stream = _client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500,
-                stream=True,
-            )
+
+def chat_stream(session_id: str, message: str, history: Optional[List[dict]] = None, context: Optional[dict] = None):
+    """
+    Generator that yields SSE-style dicts: {"content": "..."} for each chunk,
+    then {"done": True, "product_ids": [...], "actions": [...]}. Context-aware Aura AI copilot.
+    Blocking; achat_stream is the async variant used by /chat/stream.
+    """
+    turn = _prepare_stream_turn(session_id, message, history, context)
+    if "events" in turn:
+        yield from turn["events"]
+        return
+    if not _client:
+        yield from turn["fallback"]()
+        return
+    try:
+        with chat_completion_stream(
+            model="gpt-4o-mini",
+            messages=turn["messages"],
+            temperature=0.7,
+            max_tokens=500,
+        ) as stream:
             full_content = []
             for chunk in stream:
                 delta = (chunk.choices[0].delta.content or "") if chunk.choices else ""
                 if delta:
                     full_content.append(delta)
                     yield {"content": delta}
-            content_str = "".join(full_content)
-            product_ids = list(dict.fromkeys(re.findall(r"P\d{3,5}", content_str)))[:6]
-            act = _build_chat_actions(intent, bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
-            yield {"done": True, "product_ids": product_ids, "actions": act}
-        except Exception as e:
-            err_str = str(e).lower()
-            if ("401" in err_str or "invalid_api_key" in err_str) and not _openai_invalid_logged:
-                _openai_invalid_logged = True
-            content, product_ids = _intelligent_fallback(
-                message, profile_name, cart_items, cart_total, wallet_info, orders_info, products, by_cat, user_context
-            )
-            act = _build_chat_actions("general", bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
-            yield {"content": content}
-            yield {"done": True, "product_ids": product_ids[:6], "actions": act}
-            return
-    else:
-        content, product_ids = _intelligent_fallback(
-            message, profile_name, cart_items, cart_total, wallet_info, orders_info, products, by_cat, user_context
-        )
-        act = _build_chat_actions("general", bool(cart_items), cart_total, wallet_info.get("balance", 0), current_page, msg_lower)
-        yield {"content": content}
-        yield {"done": True, "product_ids": product_ids[:6], "actions": act}
+        yield turn["finish"]("".join(full_content))
+    except Exception as e:
+        _note_openai_error(e)
+        yield from turn["fallback"]()
+
+
+async def achat_stream(session_id: str, message: str, history: Optional[List[dict]] = None, context: Optional[dict] = None):
+    """
+    Async generator with the same events as chat_stream. Turn preparation (session data,
+    agent intent, RAG) runs on a worker thread; the OpenAI stream is consumed on the event
+    loop, so open streams don't hold threadpool threads. If the consumer stops early
+    (client disconnect cancels the response task), the upstream stream is closed at once.
+    """
+    turn = await asyncio.to_thread(_prepare_stream_turn, session_id, message, history, context)
+    if "events" in turn:
+        for event in turn["events"]:
+            yield event
+        return
+    if not _async_client:
+        for event in await asyncio.to_thread(turn["fallback"]):
+            yield event
         return
+    try:
+        async with achat_completion_stream(
+            model="gpt-4o-mini",
+            messages=turn["messages"],
+            temperature=0.7,
+            max_tokens=500,
+        ) as stream:
+            full_content = []
+            async for chunk in stream:
+                delta = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+                if delta:
+                    full_content.append(delta)
+                    yield {"content": delta}
+    except Exception as e:
+        _note_openai_error(e)
+        for event in await asyncio.to_thread(turn["fallback"]):
+            yield event
+        return
+    yield turn["finish"]("".join(full_content))
 
 
-def _intelligent_fallback(message: str, profile_name: str, cart_items: List, cart_total: float, wallet_info: dict, orders_info: List, products: List[Product], by_cat: Dict, user_context: str) -> tuple:
+def _intelligent_fallback(message: str, profile_name: str, cart_items: List, cart_total: float, wallet_info: dict, orders_info: List, user_context: str) -> tuple:
     """
     Intelligent rule-based AI agent when OpenAI is unavailable.
     Handles: search, recommendations, cart, orders, wallet, comparisons.
+    Product lookups go through the precomputed fallback index (no catalog scans per message).
     """
     import re
     msg_lower = message.lower()
     product_ids = []
-    
-    # SEARCH/PRODUCT QUERIES - Extract budget and category
-    budget_match = re.search(r'under\s+₹?(\d+)|below\s+₹?(\d+)|<\s*₹?(\d+)|budget\s+of\s+₹?(\d+)|price\s+around\s+₹?(\d+)', msg_lower)
-    budget = None
-    if budget_match:
-        # Find the first non-None group
-        for group in budget_match.groups():
-            if group:
-                budget = int(group)
-                break
+    index = get_fallback_index()
     
     # AGENT ACTIONS - EXTRACT INTENT
     is_buying = any(word in msg_lower for word in ['buy', 'purchase', 'order', 'checkout', 'pay'])
     is_searching = any(word in msg_lower for word in ['search', 'find', 'show', 'look for', 'get me'])
     is_adding = any(word in msg_lower for word in ['add to cart', 'put in cart', 'add this'])
-    
-    # Find matching category
-    matching_category = None
-    for cat in by_cat.keys():
-        if cat.lower() in msg_lower:
-            matching_category = cat
-            break
-    
-    # Search keywords
-    search_terms = []
-    for word in ['phone', 'shirt', 'shoes', 'laptop', 'watch', 'bag', 'dress', 'jeans', 'electronics', 'fashion', 'camera', 'tv', 'headphone']:
-        if word in msg_lower:
-            search_terms.append(word)
 
     # ACTION: BUYING / CHECKOUT
     if is_buying and not is_searching:
@@ -1188,11 +1061,7 @@ def _intelligent_fallback(message: str, profile_name: str, cart_items: List, car
     # ACTION: ADDING TO CART
     if is_adding and not is_searching:
         # Try to find which product to add
-        target_product = None
-        for p in products:
-            if p.name.lower() in msg_lower or p.id.lower() in msg_lower:
-                target_product = p
-                break
+        target_product = index.find_mentioned(msg_lower)
         
         if target_product:
             content = f"Hi {profile_name}! I've found **{target_product.name}** (₹{target_product.price}). ✨\n\n"
@@ -1200,7 +1069,7 @@ def _intelligent_fallback(message: str, profile_name: str, cart_items: List, car
             return content, [target_product.id]
         else:
             content = f"Hi {profile_name}! Which item would you like to add to your cart? Please mention the name or ID, or browse our trending products below!"
-            return content, [p.id for p in sorted(products, key=lambda x: -x.rating)[:4]]
+            return content, [p.id for p in index.best_rated]
     
     # WALLET QUERIES
     if any(word in msg_lower for word in ['wallet', 'balance', 'money', 'aurapoints', 'points', 'rewards', 'topup', 'add money']):
@@ -1266,22 +1135,15 @@ def _intelligent_fallback(message: str, profile_name: str, cart_items: List, car
         budget = int(budget_match.group(1) or budget_match.group(2) or budget_match.group(3))
     
     # Find matching category
-    matching_category = None
-    for cat in by_cat.keys():
-        if cat.lower() in msg_lower:
-            matching_category = cat
-            break
+    matching_category = index.match_category(msg_lower)
     
     # Search keywords
-    search_terms = []
-    for word in ['phone', 'shirt', 'shoes', 'laptop', 'watch', 'bag', 'dress', 'jeans', 'electronics', 'fashion']:
-        if word in msg_lower:
-            search_terms.append(word)
+    search_terms = [word for word in SEARCH_KEYWORDS if word in msg_lower]
     
     # TRENDING/BEST QUERIES
     if any(word in msg_lower for word in ['trending', 'popular', 'best', 'top', 'recommend', 'suggest', 'find', 'search', 'show', 'look for', 'get me']):
         # Get top-rated products
-        sorted_products = sorted(products, key=lambda p: (-p.rating, -p.price))[:30]
+        sorted_products = index.trending
         if budget:
             sorted_products = [p for p in sorted_products if p.price <= budget]
         if matching_category:
@@ -1305,19 +1167,13 @@ def _intelligent_fallback(message: str, profile_name: str, cart_items: List, car
     
     # CATEGORY/SEARCH QUERIES
     if matching_category or search_terms or budget:
-        results = products
-        
+        # Best rated first, within budget
         if matching_category:
-            results = by_cat.get(matching_category, [])
+            results = index.by_category[matching_category].top(4, budget or None)
         elif search_terms:
-            # Search by keywords
-            results = [p for p in products if any(term in p.name.lower() or term in p.category.lower() for term in search_terms)]
-        
-        if budget:
-            results = [p for p in results if p.price <= budget]
-        
-        # Sort by rating
-        results = sorted(results, key=lambda p: (-p.rating, p.price))[:4]
+            results = index.top_for_keywords(search_terms, 4, budget or None)
+        else:
+            results = index.all.top(4, budget or None)
         
         if results:
             content = f"Hi {profile_name}! 🔍 Found {len(results)} great options"
@@ -1356,7 +1212,7 @@ def _intelligent_fallback(message: str, profile_name: str, cart_items: List, car
         return content, []
     
     # DEFAULT - Show trending
-    trending = sorted(products, key=lambda p: (-p.rating, -p.price))[:4]
+    trending = index.trending[:4]
     content = f"Hi {profile_name}! 🎯 Here are some trending products:\n\n"
     for i, p in enumerate(trending, 1):
         content += f"{i}. **{p.id}** - {p.name}\n   ₹{p.price} | {p.rating}⭐\n\n"
@@ -0,0 +1,195 @@
+"""
+Prefix autocomplete for the search box.
+A sorted array of normalized phrases (product names and their word suffixes, brands,
+categories) answered with bisect, plus popular past queries from search events.
+Search events come from anonymous sessions, so a past query is only suggested once
+QUERY_MIN_SESSIONS sessions have searched it and every word of it occurs in the catalog,
+and its weight never exceeds the strongest catalog phrase.
+Rebuilt when the catalog version changes; the query list when new searches arrive.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from app.data_store import (
+    load_products,
+    get_catalog_version,
+    get_popular_search_queries,
+    get_search_queries_version,
+)
+from app.keyword_index import BM25Index, get_keyword_index, tokenize
+from app.models import Product
+
+# Name suffixes starting at the first N word offsets are indexed too ("cycling sho" -> shorts)
+NAME_SUFFIX_WORDS = 6
+# Prefixes up to this length get precomputed top lists (their ranges are huge)
+PRECOMPUTED_PREFIX_LEN = 3
+PRECOMPUTED_TOP = 20
+# Popular-query list is rebuilt at most this often while searches keep arriving
+QUERY_INDEX_MIN_AGE_SECONDS = 5.0
+KIND_WEIGHT = {"category": 3.0, "brand": 2.0, "product": 1.0, "query": 20.0}
+# Distinct sessions that must have searched a query before it is suggested to everyone
+QUERY_MIN_SESSIONS = 3
+# Query weight cap, as a fraction of the heaviest catalog phrase
+QUERY_WEIGHT_CAP = 1.0
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+class PrefixIndex:
+    """
+    Sorted (key, entry) arrays: all keys starting with a prefix form one contiguous
+    range found with two bisects. Short prefixes read a precomputed top list instead.
+    """
+
+    def __init__(self, phrases: Dict[Tuple[str, str], dict]):
+        # phrases: (kind, display lower) -> {"text", "type", "weight", "product_id"?, "keys": set}
+        pairs: List[Tuple[str, int]] = []
+        self.entries: List[dict] = []
+        for entry in phrases.values():
+            idx = len(self.entries)
+            self.entries.append({k: v for k, v in entry.items() if k != "keys"})
+            for key in entry["keys"]:
+                if key:
+                    pairs.append((key, idx))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.refs = [i for _, i in pairs]
+        self.top: Dict[str, List[int]] = {}
+        for length in range(1, PRECOMPUTED_PREFIX_LEN + 1):
+            ranges: Dict[str, set] = {}
+            for key, idx in pairs:
+                if len(key) >= length:
+                    ranges.setdefault(key[:length], set()).add(idx)
+            for prefix, idxs in ranges.items():
+                self.top[prefix] = heapq.nlargest(
+                    PRECOMPUTED_TOP, idxs, key=lambda i: (self.entries[i]["weight"], -i)
+                )
+
+    def complete(self, prefix: str, limit: int = 8) -> List[dict]:
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LEN:
+            return [self.entries[i] for i in self.top.get(prefix, [])[:limit]]
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        idxs = set(self.refs[lo:hi])
+        best = heapq.nlargest(limit, idxs, key=lambda i: (self.entries[i]["weight"], -i))
+        return [self.entries[i] for i in best]
+
+
+def _add_phrase(phrases: Dict[Tuple[str, str], dict], kind: str, text: str, weight: float, keys: List[str], product_id: Optional[str] = None) -> None:
+    slot = (kind, text.lower())
+    entry = phrases.get(slot)
+    if entry is None:
+        entry = phrases[slot] = {"text": text, "type": kind, "weight": 0.0, "keys": set()}
+        if product_id:
+            entry["product_id"] = product_id
+    entry["weight"] += weight
+    entry["keys"].update(keys)
+
+
+def build_catalog_index(products: List[Product]) -> PrefixIndex:
+    phrases: Dict[Tuple[str, str], dict] = {}
+    brand_counts: Dict[str, int] = {}
+    category_counts: Dict[str, int] = {}
+    for p in products:
+        name = " ".join((p.name or "").split())
+        words = normalize_phrase(name).split()
+        if words:
+            keys = [" ".join(words[i:]) for i in range(min(NAME_SUFFIX_WORDS, len(words)))]
+            popularity = (p.rating or 0) * math.log1p(p.review_count or 0) + 1
+            _add_phrase(phrases, "product", name, KIND_WEIGHT["product"] * popularity, keys, p.id)
+        if p.brand:
+            brand_counts[p.brand] = brand_counts.get(p.brand, 0) + 1
+        if p.category:
+            category_counts[p.category] = category_counts.get(p.category, 0) + 1
+    for brand, n in brand_counts.items():
+        _add_phrase(phrases, "brand", brand, KIND_WEIGHT["brand"] * n, [normalize_phrase(brand)])
+    for category, n in category_counts.items():
+        norm = normalize_phrase(category)
+        words = norm.split()
+        _add_phrase(phrases, "category", category, KIND_WEIGHT["category"] * n, [" ".join(words[i:]) for i in range(len(words))])
+    return PrefixIndex(phrases)
+
+
+def build_query_index(queries: List[Tuple[str, int]], catalog_index: PrefixIndex, keyword_index: BM25Index) -> PrefixIndex:
+    """Past queries searched by enough sessions whose words all match catalog terms."""
+    cap = QUERY_WEIGHT_CAP * max((e["weight"] for e in catalog_index.entries), default=0.0)
+    phrases: Dict[Tuple[str, str], dict] = {}
+    for q, count in queries:
+        if count < QUERY_MIN_SESSIONS:
+            continue
+        norm = normalize_phrase(q)
+        terms = tokenize(norm)
+        if not terms or any(t not in keyword_index.postings for t in terms):
+            continue
+        _add_phrase(phrases, "query", q, min(KIND_WEIGHT["query"] * count, cap), [norm])
+    return PrefixIndex(phrases)
+
+
+_catalog_index: Optional[PrefixIndex] = None
+_catalog_version = -1
+_query_index: Optional[PrefixIndex] = None
+_queries_version = -1
+_query_index_built_at = 0.0
+_lock = threading.Lock()
+
+
+def _get_indexes() -> Tuple[PrefixIndex, PrefixIndex]:
+    global _catalog_index, _catalog_version, _query_index, _queries_version, _query_index_built_at
+    version = get_catalog_version()
+    qversion = get_search_queries_version()
+    queries_stale = _query_index is None or (
+        _queries_version != qversion
+        and time.monotonic() - _query_index_built_at >= QUERY_INDEX_MIN_AGE_SECONDS
+    )
+    if _catalog_index is None or _catalog_version != version or queries_stale:
+        with _lock:
+            if _catalog_index is None or _catalog_version != version:
+                _catalog_index = build_catalog_index(load_products())
+                _catalog_version = version
+                # Which queries qualify depends on the catalog
+                queries_stale = True
+            if queries_stale:
+                _query_index = build_query_index(get_popular_search_queries(), _catalog_index, get_keyword_index())
+                _queries_version = qversion
+                _query_index_built_at = time.monotonic()
+    return _catalog_index, _query_index
+
+
+def suggest(prefix: str, limit: int = 8) -> List[dict]:
+    """
+    Ranked completions for a partial query.
+    Returns list of { text, type: product|brand|category|query, product_id? }.
+    """
+    norm = normalize_phrase(prefix)
+    if not norm:
+        return []
+    if prefix[-1:].isspace():
+        norm += " "
+    catalog_index, query_index = _get_indexes()
+    candidates = query_index.complete(norm, limit) + catalog_index.complete(norm, limit)
+    candidates.sort(key=lambda e: -e["weight"])
+    out = []
+    seen = set()
+    for e in candidates:
+        key = e["text"].lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        item = {"text": e["text"], "type": e["type"]}
+        if e.get("product_id"):
+            item["product_id"] = e["product_id"]
+        out.append(item)
+        if len(out) >= limit:
+            break
+    return out
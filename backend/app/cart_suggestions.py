@@ -0,0 +1,284 @@
+"""
+Frequently-bought-together engine mined from order history.
+Keeps pairwise co-purchase counts (product and category level) in memory and scores
+association rules (support / confidence / lift) for the current cart in one pass.
+Built lazily from existing orders, then updated incrementally by order_service.
+"""
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Rules seen in fewer baskets than this are treated as noise and never suggested
+MIN_PAIR_COUNT = 2
+# Cap items per basket so one huge order can't add quadratic pair counts
+MAX_BASKET_ITEMS = 20
+# Strongest rules kept per antecedent; scoring a cart only walks these
+RULES_PER_PRODUCT = 50
+# Category-level rules only fill remaining slots; keep candidate lists short
+CATEGORY_FILL_PER_CATEGORY = 10
+
+
+class AssociationRules:
+    """Incremental pairwise association rules keyed by product and by category."""
+
+    def __init__(self):
+        self.n_baskets = 0
+        self.item_counts: Counter = Counter()
+        self.pair_counts: Dict[str, Counter] = {}
+        self.category_counts: Counter = Counter()
+        self.category_pair_counts: Dict[str, Counter] = {}
+        # antecedent -> pruned [(consequent, n_ab)] by confidence x lift; dropped when its row changes
+        self._top_rules: Dict[str, List[Tuple[str, int]]] = {}
+
+    def add_basket(self, items: Iterable[Tuple[str, Optional[str]]], weight: int = 1) -> None:
+        """
+        Count one basket of (product_id, category) pairs. weight=-1 removes a basket
+        (e.g. when an order is cancelled).
+        """
+        items = list(items)
+        product_ids = list(dict.fromkeys(pid for pid, _ in items if pid))[:MAX_BASKET_ITEMS]
+        if not product_ids:
+            return
+        categories = list(dict.fromkeys(cat for pid, cat in items if cat and pid in product_ids))
+        self.n_baskets += weight
+        for pid in product_ids:
+            self._top_rules.pop(pid, None)
+        _count_pairs(product_ids, self.item_counts, self.pair_counts, weight)
+        _count_pairs(categories, self.category_counts, self.category_pair_counts, weight)
+
+    def product_rules(self, antecedent: str) -> List[dict]:
+        """All rules antecedent -> consequent with their metrics (for debugging / admin)."""
+        return [
+            _rule_metrics(antecedent, consequent, n_ab, self.item_counts, self.n_baskets)
+            for consequent, n_ab in self.pair_counts.get(antecedent, {}).items()
+            if n_ab >= MIN_PAIR_COUNT
+        ]
+
+    def score_cart(self, cart_ids: List[str], limit: int = 6) -> List[dict]:
+        """
+        Score every rule whose antecedent is in the cart, in one pass over the cart's
+        neighbours. A candidate reached from several cart items sums confidence x lift;
+        the strongest single rule is reported with it.
+        """
+        n = self.n_baskets
+        if n <= 0:
+            return []
+        counts = self.item_counts
+        in_cart = set(cart_ids)
+        # consequent -> [score, best_confidence, antecedent, n_ab]
+        acc: Dict[str, list] = {}
+        for antecedent in in_cart:
+            n_a = counts.get(antecedent) or 1
+            for consequent, n_ab in self._rules_for(antecedent):
+                if consequent in in_cart:
+                    continue
+                confidence = n_ab / n_a
+                score = confidence * confidence * n / (counts.get(consequent) or 1)
+                entry = acc.get(consequent)
+                if entry is None:
+                    acc[consequent] = [score, confidence, antecedent, n_ab]
+                else:
+                    entry[0] += score
+                    if confidence > entry[1]:
+                        entry[1], entry[2], entry[3] = confidence, antecedent, n_ab
+        top = heapq.nlargest(limit, acc.items(), key=lambda kv: (kv[1][0], kv[1][3]))
+        out = []
+        for consequent, (score, _, antecedent, n_ab) in top:
+            rule = _rule_metrics(antecedent, consequent, n_ab, counts, n)
+            rule["score"] = score
+            out.append(rule)
+        return out
+
+    def _rules_for(self, antecedent: str) -> List[Tuple[str, int]]:
+        rules = self._top_rules.get(antecedent)
+        if rules is None:
+            counts = self.item_counts
+            neighbours = self.pair_counts.get(antecedent) or {}
+            rules = heapq.nlargest(
+                RULES_PER_PRODUCT,
+                ((b, n_ab) for b, n_ab in neighbours.items() if n_ab >= MIN_PAIR_COUNT),
+                key=lambda x: x[1] * x[1] / (counts.get(x[0]) or 1),
+            )
+            self._top_rules[antecedent] = rules
+        return rules
+
+    def related_categories(self, categories: List[str], limit: int = 3) -> List[Tuple[str, float]]:
+        """Categories most often bought together with the given ones, ranked by lift."""
+        if self.n_baskets <= 0:
+            return []
+        scores: Dict[str, float] = {}
+        for cat in set(categories):
+            for other, n_ab in self.category_pair_counts.get(cat, {}).items():
+                if n_ab < MIN_PAIR_COUNT or other in categories:
+                    continue
+                rule = _rule_metrics(cat, other, n_ab, self.category_counts, self.n_baskets)
+                scores[other] = max(scores.get(other, 0.0), rule["confidence"] * rule["lift"])
+        return sorted(scores.items(), key=lambda x: -x[1])[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "baskets": self.n_baskets,
+            "products": len(self.item_counts),
+            "product_pairs": sum(len(c) for c in self.pair_counts.values()) // 2,
+            "categories": len(self.category_counts),
+        }
+
+
+def _count_pairs(keys: List[str], counts: Counter, pairs: Dict[str, Counter], weight: int) -> None:
+    for i, a in enumerate(keys):
+        counts[a] += weight
+        row = pairs.get(a)
+        if row is None:
+            row = pairs[a] = Counter()
+        for j, b in enumerate(keys):
+            if i != j:
+                row[b] += weight
+                if row[b] <= 0:
+                    del row[b]
+        if counts[a] <= 0:
+            del counts[a]
+
+
+def _rule_metrics(antecedent: str, consequent: str, n_ab: int, counts: Counter, n: int) -> dict:
+    n_a = counts.get(antecedent, 0) or 1
+    n_b = counts.get(consequent, 0) or 1
+    confidence = n_ab / n_a
+    return {
+        "product_id": consequent,
+        "antecedent": antecedent,
+        "support": n_ab / n,
+        "confidence": confidence,
+        "lift": confidence / (n_b / n),
+    }
+
+
+# Process-wide rules index, built from persisted orders on first use
+_rules: Optional[AssociationRules] = None
+# Ids of the orders whose baskets are in _rules. An order placed (or cancelled) while the
+# index is built can be seen by both the build and record_order / forget_order; the ids
+# make sure it is counted (or removed) once.
+_counted: set = set()
+_lock = threading.RLock()
+
+
+def _order_items(order) -> List[Tuple[str, Optional[str]]]:
+    from app.data_store import get_product
+    out = []
+    for item in getattr(order, "items", []) or []:
+        p = get_product(item.product_id)
+        out.append((item.product_id, p.category if p else None))
+    return out
+
+
+def get_rules() -> AssociationRules:
+    """Return the rules index, mining all non-cancelled orders the first time."""
+    global _rules
+    with _lock:
+        if _rules is None:
+            from app.order_service import iter_orders
+            from app.models import OrderStatus
+            rules = AssociationRules()
+            for order in iter_orders():
+                if order.status != OrderStatus.CANCELLED and order.id not in _counted:
+                    rules.add_basket(_order_items(order))
+                    _counted.add(order.id)
+            _rules = rules
+        return _rules
+
+
+def record_order(order) -> None:
+    """Add a newly created order's basket. No-op until the index has been built."""
+    with _lock:
+        if _rules is not None and order.id not in _counted:
+            _rules.add_basket(_order_items(order))
+            _counted.add(order.id)
+
+
+def forget_order(order) -> None:
+    """Remove a cancelled order's basket from the counts."""
+    with _lock:
+        if _rules is not None and order.id in _counted:
+            _rules.add_basket(_order_items(order), weight=-1)
+            _counted.discard(order.id)
+
+
+# Category fill candidates: category -> top CATEGORY_FILL_PER_CATEGORY products by rating
+# (then price), precomputed once per catalog version
+_category_top: Dict[str, list] = {}
+_category_top_version = -1
+_category_lock = threading.Lock()
+
+
+def _top_in_category(category: str) -> list:
+    global _category_top, _category_top_version
+    from app.data_store import get_catalog_version, load_products
+    version = get_catalog_version()
+    if _category_top_version != version:
+        with _category_lock:
+            if _category_top_version != version:
+                by_category: Dict[str, list] = {}
+                for p in load_products():
+                    by_category.setdefault(p.category, []).append(p)
+                _category_top = {
+                    c: heapq.nsmallest(CATEGORY_FILL_PER_CATEGORY, ps, key=lambda x: (-x.rating, x.price))
+                    for c, ps in by_category.items()
+                }
+                _category_top_version = version
+    return _category_top.get(category, [])
+
+
+def get_cart_suggestions(cart_ids: List[str], limit: int = 6) -> List[dict]:
+    """
+    Frequently-bought-together suggestions for a cart.
+    Product rules first; remaining slots filled with top-rated products from
+    categories that co-occur with the cart's categories.
+    Returns list of { product_id, reason, score, confidence, lift, support, basis }.
+    """
+    from app.data_store import get_product
+    if not cart_ids:
+        return []
+    rules = get_rules()
+    with _lock:
+        ranked = rules.score_cart(cart_ids, limit=limit * 2)
+        cart_categories = []
+        for pid in cart_ids:
+            p = get_product(pid)
+            if p and p.category not in cart_categories:
+                cart_categories.append(p.category)
+        related = rules.related_categories(cart_categories)
+
+    out: List[dict] = []
+    seen = set(cart_ids)
+    for rule in ranked:
+        p = get_product(rule["product_id"])
+        source = get_product(rule["antecedent"])
+        if not p or p.id in seen:
+            continue
+        seen.add(p.id)
+        out.append({
+            **rule,
+            "reason": f"Often bought with {source.name if source else rule['antecedent']}",
+            "basis": "product",
+        })
+        if len(out) >= limit:
+            return out
+
+    for category, cat_score in related:
+        for p in _top_in_category(category):
+            if p.id in seen or not p.in_stock:
+                continue
+            seen.add(p.id)
+            out.append({
+                "product_id": p.id,
+                "antecedent": None,
+                "reason": f"Shoppers who buy from your cart's categories also buy {category}",
+                "score": cat_score,
+                "confidence": None,
+                "lift": None,
+                "support": None,
+                "basis": "category",
+            })
+            if len(out) >= limit:
+                return out
+    return out
@@ -0,0 +1,178 @@
+"""
+WebSocket chat transport (/ws/chat): one socket carries many conversations.
+Each turn runs the same pipeline as /chat/stream (ai_service.achat_stream, with deltas
+merged by stream_chunker.coalesce_events), so replies and the done event are identical.
+The connection keeps per-conversation state (session id, page context, history), so a
+client sends only the new message instead of its whole history on every turn.
+
+Client -> server (JSON):
+  {"type": "hello", "session_id": "...", "user_id": "..."}          connection defaults (optional)
+  {"type": "chat", "conversation_id": "c1", "message": "...",
+   "session_id"?: "...", "context"?: {...}, "history"?: [...]}      start a turn (history replaces the kept one)
+  {"type": "cancel", "conversation_id": "c1"}                       stop that conversation's turn
+  {"type": "reset", "conversation_id": "c1"}                        forget its history
+  {"type": "ping"}
+Server -> client:
+  {"conversation_id": "c1", "content": "..."}                       text deltas
+  {"conversation_id": "c1", "done": true, "product_ids": [...], "actions": [...]}
+  {"conversation_id": "c1", "type": "cancelled"}
+  {"type": "error", "conversation_id"?: "c1", "error": "..."}
+  {"type": "ping"} / {"type": "pong"}                                heartbeat / reply to ping
+Backpressure: every turn writes into one bounded outbox drained by a single writer, so
+a slow client pauses the turns (and, through the chunker's bounded queue, the upstream
+LLM reads) instead of buffering without limit.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.ai_service import achat_stream
+from app.config import CHAT_WS_MAX_ACTIVE_TURNS, CHAT_WS_OUTBOX_SIZE
+from app.stream_chunker import coalesce_events
+
+# History entries kept per conversation (older turns are summarized by chat_history anyway)
+HISTORY_MAX = 40
+CONVERSATIONS_MAX = 64
+
+
+@dataclass
+class _Conversation:
+    session_id: str
+    context: dict = field(default_factory=dict)
+    history: List[dict] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+
+
+class ChatConnection:
+    def __init__(self, websocket: WebSocket):
+        self.ws = websocket
+        self.session_id: Optional[str] = None
+        self.user_id: Optional[str] = None
+        self.conversations: Dict[str, _Conversation] = {}
+        self.outbox: asyncio.Queue = asyncio.Queue(CHAT_WS_OUTBOX_SIZE)
+
+    async def send(self, message: dict) -> None:
+        await self.outbox.put(message)
+
+    def send_nowait(self, message: dict) -> None:
+        """For notices sent while a turn is being torn down; dropped if the client is backed up."""
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def _writer(self) -> None:
+        while True:
+            await self.ws.send_json(await self.outbox.get())
+
+    def _active_turns(self) -> int:
+        return sum(1 for c in self.conversations.values() if c.task and not c.task.done())
+
+    async def _run_turn(self, cid: str, conv: _Conversation, message: str) -> None:
+        parts = []
+        events = achat_stream(session_id=conv.session_id, message=message, history=list(conv.history), context=conv.context)
+        chunks = coalesce_events(events)
+        try:
+            async for event in chunks:
+                if event is None:
+                    await self.send({"type": "ping"})
+                    continue
+                if "content" in event:
+                    parts.append(event["content"])
+                await self.send({"conversation_id": cid, **event})
+        except asyncio.CancelledError:
+            self.send_nowait({"conversation_id": cid, "type": "cancelled"})
+            raise
+        except Exception as e:
+            print(f"WebSocket chat turn error: {e}")
+            await self.send({"type": "error", "conversation_id": cid, "error": "chat failed"})
+            return
+        finally:
+            # Stops the producer (and with it the upstream LLM stream) now, not at garbage collection
+            await chunks.aclose()
+        conv.history.append({"role": "user", "content": message})
+        conv.history.append({"role": "assistant", "content": "".join(parts)})
+        del conv.history[:-HISTORY_MAX]
+
+    def _conversation(self, cid: str, data: dict) -> Optional[_Conversation]:
+        conv = self.conversations.get(cid)
+        if conv is None:
+            session_id = data.get("session_id") or self.session_id
+            if not session_id or len(self.conversations) >= CONVERSATIONS_MAX:
+                return None
+            conv = self.conversations[cid] = _Conversation(session_id=session_id)
+        elif data.get("session_id"):
+            conv.session_id = data["session_id"]
+        if isinstance(data.get("context"), dict):
+            conv.context.update(data["context"])
+        if self.user_id and not conv.context.get("user_id"):
+            conv.context["user_id"] = self.user_id
+        if isinstance(data.get("history"), list):
+            conv.history = list(data["history"])[-HISTORY_MAX:]
+        return conv
+
+    async def _handle(self, data: dict) -> None:
+        kind = data.get("type")
+        cid = str(data.get("conversation_id") or "default")
+        if kind == "hello":
+            self.session_id = data.get("session_id") or self.session_id
+            self.user_id = data.get("user_id") or self.user_id
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind == "cancel":
+            conv = self.conversations.get(cid)
+            if conv and conv.task and not conv.task.done():
+                conv.task.cancel()
+        elif kind == "reset":
+            conv = self.conversations.get(cid)
+            if conv:
+                conv.history.clear()
+        elif kind == "chat":
+            message = (data.get("message") or "").strip()
+            conv = self._conversation(cid, data)
+            if not message:
+                await self.send({"type": "error", "conversation_id": cid, "error": "message is required"})
+            elif conv is None:
+                await self.send({"type": "error", "conversation_id": cid, "error": "session_id is required (or too many conversations)"})
+            elif conv.task and not conv.task.done():
+                await self.send({"type": "error", "conversation_id": cid, "error": "a reply is still streaming for this conversation"})
+            elif self._active_turns() >= CHAT_WS_MAX_ACTIVE_TURNS:
+                await self.send({"type": "error", "conversation_id": cid, "error": "too many concurrent conversations"})
+            else:
+                conv.task = asyncio.create_task(self._run_turn(cid, conv, message))
+        else:
+            await self.send({"type": "error", "error": f"unknown message type: {kind}"})
+
+    async def serve(self) -> None:
+        await self.ws.accept()
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                receive = asyncio.create_task(self.ws.receive_json())
+                done, _ = await asyncio.wait({receive, writer}, return_when=asyncio.FIRST_COMPLETED)
+                if writer in done:
+                    # Socket closed while sending
+                    receive.cancel()
+                    break
+                try:
+                    data = receive.result()
+                except (WebSocketDisconnect, RuntimeError):
+                    break
+                except ValueError:
+                    await self.send({"type": "error", "error": "invalid JSON"})
+                    continue
+                if isinstance(data, dict):
+                    await self._handle(data)
+        finally:
+            turns = [c.task for c in self.conversations.values() if c.task and not c.task.done()]
+            for task in turns:
+                task.cancel()
+            writer.cancel()
+            # Let the turns close their upstream LLM streams
+            await asyncio.gather(*turns, writer, return_exceptions=True)
+
+
+async def serve_chat_socket(websocket: WebSocket) -> None:
+    await ChatConnection(websocket).serve()
@@ -2,7 +2,7 @@
 ChromaDB client for policy vector search (simplified version for AuraShop integration).
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 import chromadb
 from chromadb.config import Settings
 
@@ -27,14 +27,22 @@ class ChromaClient:
             self.client = None
             self.collection = None
     
+    @staticmethod
+    def _query_input(query_text: str, query_embedding: Optional[Sequence[float]]) -> Dict[str, Any]:
+        if query_embedding is not None:
+            return {"query_embeddings": [[float(x) for x in query_embedding]]}
+        return {"query_texts": [query_text]}
+    
     def get_cosine_similarity_scores(
         self,
         query_text: str,
         product_category: str,
-        n_results: int = 10
+        n_results: int = 10,
+        query_embedding: Optional[Sequence[float]] = None
     ) -> List[tuple]:
         """
         Get policy matches with cosine similarity scores.
+        Pass query_embedding (e.g. from app.embedding_cache) to skip embedding query_text again.
         
         Returns:
             List of (policy_id, similarity_score) tuples
@@ -45,7 +53,7 @@ class ChromaClient:
         
         try:
             results = self.collection.query(
-                query_texts=[query_text],
+                **self._query_input(query_text, query_embedding),
                 n_results=n_results,
                 where={"category": product_category} if product_category else None
             )
@@ -70,10 +78,12 @@ class ChromaClient:
         self,
         query_text: str,
         product_category: str,
-        n_results: int = 10
+        n_results: int = 10,
+        query_embedding: Optional[Sequence[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Query policies and return detailed results.
+        Pass query_embedding to skip embedding query_text again.
         
         Returns:
             List of policy details with text, metadata, etc.
@@ -84,7 +94,7 @@ class ChromaClient:
         
         try:
             results = self.collection.query(
-                query_texts=[query_text],
+                **self._query_input(query_text, query_embedding),
                 n_results=n_results,
                 where={"category": product_category} if product_category else None
             )
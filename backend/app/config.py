@@ -1,9 +1,59 @@
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Optional OpenAI-compatible endpoint (e.g. a local stand-in server for load tests)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 # Set to "1" or "true" to use built-in chat only (no OpenAI); useful if API key is invalid
 USE_BUILTIN_CHAT = os.getenv("USE_BUILTIN_CHAT", "").lower() in ("1", "true", "yes")
+# Order/profile store; defaults to data/orders.json (load tests point it at a scratch file).
+# orders.db, state.db and commit.log live in the same directory
+ORDERS_FILE = os.getenv("ORDERS_FILE") or None
+# Persistence (orders, coupon usage, wallets): writes are group-committed to the commit log with one
+# fsync per batch of up to PERSIST_COMMIT_MAX_BATCH writes, gathered for at most PERSIST_COMMIT_INTERVAL_MS.
+# PERSIST_GROUP_COMMIT=0 commits each write on its own. The log is checkpointed past PERSIST_CHECKPOINT_BYTES
+PERSIST_GROUP_COMMIT = os.getenv("PERSIST_GROUP_COMMIT", "1").lower() in ("1", "true", "yes")
+PERSIST_COMMIT_INTERVAL_MS = float(os.getenv("PERSIST_COMMIT_INTERVAL_MS", "2"))
+PERSIST_COMMIT_MAX_BATCH = int(os.getenv("PERSIST_COMMIT_MAX_BATCH", "256"))
+PERSIST_CHECKPOINT_BYTES = int(os.getenv("PERSIST_CHECKPOINT_BYTES", str(8 * 1024 * 1024)))
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+# Semantic product search: "chroma" (default), "auto" (in-process vectors when sentence-transformers
+# is installed, else Chroma) or "numpy" (in-process vectors only); the in-process index is opt-in
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "chroma").lower()
+# Stored embedding precision for the in-process index: "float32" or "int8"
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32").lower()
+# Catalogs at least this large are searched through an HNSW graph (if hnswlib is installed)
+VECTOR_HNSW_MIN_SIZE = int(os.getenv("VECTOR_HNSW_MIN_SIZE", "200000"))
+# Query embeddings kept in the shared LRU (product, FAQ and policy retrieval)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Chat prompts: recent history messages sent verbatim and their token budget; older turns are summarized
+CHAT_HISTORY_RECENT_TURNS = int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "8"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+# Chat streaming: merge LLM deltas into frames of up to this age (ms; 0 = one frame per delta) or size
+# (bytes), and send a heartbeat after this many silent seconds
+CHAT_STREAM_FLUSH_MS = float(os.getenv("CHAT_STREAM_FLUSH_MS", "50"))
+CHAT_STREAM_FLUSH_BYTES = int(os.getenv("CHAT_STREAM_FLUSH_BYTES", "512"))
+CHAT_STREAM_HEARTBEAT_S = float(os.getenv("CHAT_STREAM_HEARTBEAT_S", "15"))
+# WebSocket chat (/ws/chat): concurrent streaming turns per connection, and messages queued for a slow client
+CHAT_WS_MAX_ACTIVE_TURNS = int(os.getenv("CHAT_WS_MAX_ACTIVE_TURNS", "4"))
+CHAT_WS_OUTBOX_SIZE = int(os.getenv("CHAT_WS_OUTBOX_SIZE", "64"))
+# LLM gateway: per-model concurrency and rate limits (requests / tokens per minute).
+# LLM_MODEL_LIMITS overrides them per model, e.g. {"gpt-4o": {"concurrency": 4, "rpm": 500, "tpm": 30000}}
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Slots per model that background work (returns processing) may not use
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))
+LLM_MODEL_LIMITS = {"gpt-4o": {"concurrency": 8, "tpm": 30000}}
+try:
+    LLM_MODEL_LIMITS.update(json.loads(os.getenv("LLM_MODEL_LIMITS") or "{}"))
+except ValueError:
+    pass
+# LLM circuit breaker: consecutive upstream failures that open it, first and maximum cool-down (seconds)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "15"))
+LLM_BREAKER_MAX_COOLDOWN = float(os.getenv("LLM_BREAKER_MAX_COOLDOWN", "300"))
@@ -1,10 +1,15 @@
 """
 Coupon validation and first-time-only usage tracking.
 Coupons from the discounts list; each code works only once per user.
+Usage is kept in memory and persisted through the group-commit log (state.db, kind
+"coupon_usage"); a legacy data/coupon_usage.json is imported on first load.
 """
 import json
+import threading
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
+
+from app.persistence import open_state, persist
 
 COUPON_USAGE_PATH = Path(__file__).resolve().parent.parent / "data" / "coupon_usage.json"
 
@@ -23,24 +28,32 @@ COUPONS = [
 ]
 
 
-def _load_usage() -> dict:
-    """Load { user_id: [code, ...] } from file."""
-    if not COUPON_USAGE_PATH.exists():
-        return {}
-    try:
-        with open(COUPON_USAGE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def _save_usage(usage: dict) -> None:
-    COUPON_USAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        with open(COUPON_USAGE_PATH, "w", encoding="utf-8") as f:
-            json.dump(usage, f, indent=2)
-    except Exception:
-        pass
+_usage: Optional[Dict[str, List[str]]] = None
+_usage_lock = threading.Lock()
+
+
+def _load_usage() -> Dict[str, List[str]]:
+    """{ user_id: [code, ...] }, loaded from the store on first access."""
+    global _usage
+    if _usage is not None:
+        return _usage
+    with _usage_lock:
+        if _usage is None:
+            try:
+                usage = open_state("coupon_usage")
+            except Exception as e:
+                print(f"Coupon usage store unavailable, tracking in memory only: {e}")
+                usage = {}
+            if not usage and COUPON_USAGE_PATH.exists():
+                try:
+                    with open(COUPON_USAGE_PATH, "r", encoding="utf-8") as f:
+                        usage = json.load(f)
+                    for user_id, codes in usage.items():
+                        persist("coupon_usage", user_id, codes)
+                except Exception as e:
+                    print(f"Could not import {COUPON_USAGE_PATH}: {e}")
+            _usage = usage
+    return _usage
 
 
 def get_used_coupons(user_id: str) -> List[str]:
@@ -64,7 +77,10 @@ def mark_coupon_used(user_id: str, code: str) -> None:
     if code_upper not in used:
         used.append(code_upper)
         usage[user_id] = used
-        _save_usage(usage)
+        try:
+            persist("coupon_usage", user_id, list(used))
+        except Exception as e:
+            print(f"Failed to save coupon usage for {user_id}: {e}")
 
 
 def get_discount_amount(code: str, order_total: float) -> Optional[Tuple[float, str]]:
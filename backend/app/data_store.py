@@ -3,6 +3,7 @@ In-memory data store for sessions, events, and user preferences.
 Used for real-time personalization and recommendation context.
 """
 import json
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -12,6 +13,9 @@ from app.models import EventPayload, Product, EventType
 PRODUCTS_PATH = Path(__file__).resolve().parent.parent / "data" / "products.json"
 _products: List[Product] = []
 _products_by_id: Dict[str, Product] = {}
+# Bumped whenever the catalog is (re)loaded; derived indexes rebuild when it changes
+_catalog_version = 0
+_catalog_lock = threading.Lock()
 
 # Session events: session_id -> list of events
 _events: Dict[str, List[dict]] = {}
@@ -22,34 +26,76 @@ _profiles: Dict[str, dict] = {}
 # Cart per session: session_id -> list of product_ids
 _carts: Dict[str, List[str]] = {}
 
+# Global search query popularity (normalized query -> distinct sessions), fed by search events
+_search_query_counts: Dict[str, int] = {}
+# Sessions already counted per query (up to _SEARCH_QUERY_SESSIONS_MAX, then every search counts)
+_search_query_sessions: Dict[str, set] = {}
+_SEARCH_QUERY_SESSIONS_MAX = 100
+_search_queries_version = 0
+_SEARCH_QUERIES_MAX = 10_000
+
+# Bumped on every event / cart / profile change of a session; per-session caches key on it
+_session_versions: Dict[str, int] = {}
+
 # Recommendation cache: (session_id, context_hash) -> list of recs (optional TTL)
 _rec_cache: Dict[str, List[dict]] = {}
 _CACHE_MAX = 500
 
 
+def _read_products() -> List[Product]:
+    if not PRODUCTS_PATH.exists():
+        return []
+    with open(PRODUCTS_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        data = []
+    products = []
+    for p in data:
+        try:
+            products.append(Product(**p))
+        except Exception:
+            continue
+    return products
+
+
+def _swap_catalog(products: List[Product]) -> List[Product]:
+    """Publish a fully built catalog; readers never see it empty or half loaded."""
+    global _products, _products_by_id, _catalog_version
+    # One assignment, stored left to right: the version changes last, so an index rebuilt
+    # for the new version is always built from the new products
+    _products_by_id, _products, _catalog_version = {p.id: p for p in products}, products, _catalog_version + 1
+    return products
+
+
 def load_products() -> List[Product]:
-    global _products, _products_by_id
     if _products:
         return _products
-    try:
-        if not PRODUCTS_PATH.exists():
+    with _catalog_lock:
+        if _products:
             return _products
-        with open(PRODUCTS_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if not isinstance(data, list):
-            data = []
-        _products = []
-        for p in data:
-            try:
-                _products.append(Product(**p))
-            except Exception:
-                continue
-        _products_by_id = {p.id: p for p in _products}
-        return _products
-    except Exception:
-        _products = []
-        _products_by_id = {}
-        return _products
+        try:
+            products = _read_products()
+        except Exception:
+            return _products
+        if not products:
+            return _products
+        return _swap_catalog(products)
+
+
+def reload_products() -> List[Product]:
+    """Load products.json again and swap it in (bumps catalog version); the old catalog stays live meanwhile."""
+    with _catalog_lock:
+        try:
+            products = _read_products()
+        except Exception:
+            return _products
+        return _swap_catalog(products)
+
+
+def get_catalog_version() -> int:
+    """Version of the loaded catalog; changes on every (re)load."""
+    load_products()
+    return _catalog_version
 
 
 def get_product(product_id: str) -> Optional[Product]:
@@ -86,8 +132,18 @@ def get_products(
     return out[:limit]
 
 
+def _touch_session(session_id: str) -> None:
+    _session_versions[session_id] = _session_versions.get(session_id, 0) + 1
+
+
+def get_session_version(session_id: str) -> int:
+    """Changes whenever the session's events, cart or profile change."""
+    return _session_versions.get(session_id, 0)
+
+
 def add_event(payload: EventPayload) -> None:
     session_id = payload.session_id
+    _touch_session(session_id)
     if session_id not in _events:
         _events[session_id] = []
     _events[session_id].append({
@@ -96,6 +152,38 @@ def add_event(payload: EventPayload) -> None:
     })
     # Keep last 500 events per session
     _events[session_id] = _events[session_id][-500:]
+    if payload.event_type == EventType.SEARCH and payload.query:
+        _record_search_query(payload.query, session_id)
+
+
+def _record_search_query(query: str, session_id: str) -> None:
+    global _search_queries_version
+    q = " ".join(query.lower().split())[:100]
+    if not q:
+        return
+    # One session repeating a query counts once
+    sessions = _search_query_sessions.setdefault(q, set())
+    if session_id in sessions:
+        return
+    if len(sessions) < _SEARCH_QUERY_SESSIONS_MAX:
+        sessions.add(session_id)
+    _search_query_counts[q] = _search_query_counts.get(q, 0) + 1
+    _search_queries_version += 1
+    if len(_search_query_counts) > _SEARCH_QUERIES_MAX:
+        # Keep the most popular half
+        for k, _ in sorted(_search_query_counts.items(), key=lambda x: x[1])[:_SEARCH_QUERIES_MAX // 2]:
+            del _search_query_counts[k]
+            _search_query_sessions.pop(k, None)
+
+
+def get_popular_search_queries(limit: int = 500) -> List[tuple]:
+    """Most searched queries across all sessions: [(query, distinct sessions)]."""
+    return sorted(_search_query_counts.items(), key=lambda x: (-x[1], x[0]))[:limit]
+
+
+def get_search_queries_version() -> int:
+    """Changes whenever a search event is recorded."""
+    return _search_queries_version
 
 
 def get_events(session_id: str, limit: int = 100) -> List[dict]:
@@ -111,21 +199,25 @@ def add_to_cart(session_id: str, product_id: str) -> None:
         _carts[session_id] = []
     if product_id not in _carts[session_id]:
         _carts[session_id].append(product_id)
+        _touch_session(session_id)
 
 
 def remove_from_cart(session_id: str, product_id: str) -> None:
     if session_id in _carts and product_id in _carts[session_id]:
         _carts[session_id].remove(product_id)
+        _touch_session(session_id)
 
 
 def clear_cart(session_id: str) -> None:
     """Clear all items from cart."""
     if session_id in _carts:
         _carts[session_id] = []
+        _touch_session(session_id)
 
 
 def set_profile(session_id: str, profile: dict) -> None:
     _profiles[session_id] = profile
+    _touch_session(session_id)
 
 
 def get_profile(session_id: str) -> dict:
@@ -0,0 +1,119 @@
+"""
+Process-wide query embedding cache shared by product, FAQ and return-policy retrieval.
+Entries are keyed by (model, normalized text) in a bounded LRU, so a query string is
+embedded once and reused across retrievers and requests. Vectors come from the
+sentence-transformers EmbeddingService when installed, else Chroma's default embedding
+function (the same all-MiniLM-L6-v2 model, ONNX build).
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_SIZE
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def normalize_text(text: str) -> str:
+    """The model's tokenizer is uncased, so case and whitespace never change the vector."""
+    return " ".join((text or "").lower().split())
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of read-only float32 vectors with hit / miss / eviction counters."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(
+        self,
+        texts: List[str],
+        embed: Callable[[List[str]], List[np.ndarray]],
+        model: str = MODEL_NAME,
+    ) -> List[np.ndarray]:
+        keys = [(model, normalize_text(t)) for t in texts]
+        found: Dict[Tuple[str, str], np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vec
+        # Each distinct missing text is embedded once, in a single batch
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            vectors = embed([text for _, text in missing])
+            with self._lock:
+                for key, vec in zip(missing, vectors):
+                    vec = np.asarray(vec, dtype=np.float32).ravel()
+                    vec.setflags(write=False)
+                    found[key] = vec
+                    self._entries[key] = vec
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = EmbeddingCache()
+_embedder: Optional[Callable[[List[str]], List[np.ndarray]]] = None
+_embedder_lock = threading.Lock()
+
+
+def _get_embedder() -> Callable[[List[str]], List[np.ndarray]]:
+    global _embedder
+    if _embedder is not None:
+        return _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            try:
+                import sentence_transformers  # noqa: F401
+                from app.returns.services.embedding_service import get_embedding_service
+                _embedder = lambda texts: list(get_embedding_service().embed_texts(texts))
+            except Exception:
+                from chromadb.utils import embedding_functions
+                fn = embedding_functions.DefaultEmbeddingFunction()
+                _embedder = lambda texts: list(fn(texts))
+    return _embedder
+
+
+def embed_queries(texts: List[str]) -> List[np.ndarray]:
+    """Embeddings for texts, served from the cache where possible. Raises if no embedder is installed."""
+    if not texts:
+        return []
+    return _cache.get_many(texts, _get_embedder())
+
+
+def embed_query(text: str) -> np.ndarray:
+    return embed_queries([text])[0]
+
+
+def get_embedding_cache_stats() -> Dict[str, float]:
+    return _cache.stats()
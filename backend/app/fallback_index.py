@@ -0,0 +1,127 @@
+"""
+Precomputed lookups for the rule-based chat fallback (ai_service._intelligent_fallback).
+Built once per catalog version, so a fallback reply no longer sorts or scans the catalog:
+rating-ordered lists (global, per category and per fallback keyword) with a price-sorted
+copy for budget queries, the trending list, and id / name lookups for "add to cart".
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from app.data_store import load_products, get_catalog_version
+from app.models import Product
+
+# Words the fallback treats as product searches (matched as substrings, so "phone" finds headphones)
+SEARCH_KEYWORDS = ("phone", "shirt", "shoes", "laptop", "watch", "bag", "dress", "jeans", "electronics", "fashion")
+# Size of the trending list the fallback filters by budget / category
+TRENDING_SIZE = 30
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class RankedProducts:
+    """Products best-rated first (cheaper first on ties), plus a price-sorted copy for budgets."""
+
+    def __init__(self, products: List[Product], positions: Dict[str, int]):
+        self._pos = positions
+        self.rated = sorted(products, key=lambda p: (-p.rating, p.price))
+        self._by_price = sorted(products, key=lambda p: p.price)
+        self._prices = [p.price for p in self._by_price]
+
+    def __len__(self) -> int:
+        return len(self.rated)
+
+    def top(self, k: int, budget: Optional[float] = None) -> List[Product]:
+        """Best-rated k products priced at most budget (same order as sorting the filtered list)."""
+        if budget is None:
+            return self.rated[:k]
+        affordable = bisect_right(self._prices, budget)
+        if affordable == 0:
+            return []
+        # Walking the rated list finds a hit every ~len/affordable products; when the budget
+        # is selective it is cheaper to rank just the affordable prefix of the price order.
+        if k * len(self.rated) <= affordable * affordable:
+            out = []
+            for p in self.rated:
+                if p.price <= budget:
+                    out.append(p)
+                    if len(out) == k:
+                        break
+            return out
+        return heapq.nsmallest(k, self._by_price[:affordable], key=lambda p: (-p.rating, p.price, self._pos[p.id]))
+
+
+class FallbackIndex:
+    def __init__(self, products: List[Product]):
+        positions = {p.id: i for i, p in enumerate(products)}
+        self._pos = positions
+        by_cat: Dict[str, List[Product]] = {}
+        for p in products:
+            by_cat.setdefault(p.category, []).append(p)
+        self.categories: List[Tuple[str, str]] = [(cat, cat.lower()) for cat in by_cat]
+        self.all = RankedProducts(products, positions)
+        self.by_category = {cat: RankedProducts(ps, positions) for cat, ps in by_cat.items()}
+        names = [(p, (p.name or "").lower(), (p.category or "").lower()) for p in products]
+        self.by_keyword = {
+            word: RankedProducts([p for p, name, cat in names if word in name or word in cat], positions)
+            for word in SEARCH_KEYWORDS
+        }
+        self.trending = sorted(products, key=lambda p: (-p.rating, -p.price))[:TRENDING_SIZE]
+        self.best_rated = sorted(products, key=lambda p: -p.rating)[:4]
+        self._by_id = {p.id.lower(): p for p in products}
+        # First word of each name -> [(lowercased name, product)] in catalog order
+        self._by_first_word: Dict[str, List[Tuple[str, Product]]] = {}
+        for p, name, _ in names:
+            words = _WORD_RE.findall(name)
+            if words:
+                self._by_first_word.setdefault(words[0], []).append((name, p))
+
+    def match_category(self, msg_lower: str) -> Optional[str]:
+        for cat, cat_lower in self.categories:
+            if cat_lower in msg_lower:
+                return cat
+        return None
+
+    def top_for_keywords(self, words: List[str], k: int, budget: Optional[float] = None) -> List[Product]:
+        """Best-rated k products matching any of the keywords (the top k of a union is within each word's top k)."""
+        lists = [self.by_keyword[w].top(k, budget) for w in words if w in self.by_keyword]
+        if len(lists) == 1:
+            return lists[0]
+        merged = {p.id: p for plist in lists for p in plist}
+        return heapq.nsmallest(k, merged.values(), key=lambda p: (-p.rating, p.price, self._pos[p.id]))
+
+    def find_mentioned(self, msg_lower: str) -> Optional[Product]:
+        """First product (catalog order) whose name or id appears in the message."""
+        best = None
+        for word in set(_WORD_RE.findall(msg_lower)):
+            p = self._by_id.get(word)
+            if p is not None and (best is None or self._pos[p.id] < self._pos[best.id]):
+                best = p
+            for name, p in self._by_first_word.get(word, ()):
+                if best is not None and self._pos[p.id] >= self._pos[best.id]:
+                    break
+                if name in msg_lower:
+                    best = p
+                    break
+        return best
+
+
+# Index for the loaded catalog, rebuilt when the catalog version changes
+_index: Optional[FallbackIndex] = None
+_index_version = -1
+_lock = threading.Lock()
+
+
+def get_fallback_index() -> FallbackIndex:
+    """Return the fallback index for the current catalog, building it if the catalog changed."""
+    global _index, _index_version
+    version = get_catalog_version()
+    if _index is not None and _index_version == version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = FallbackIndex(load_products())
+            _index_version = version
+    return _index
@@ -0,0 +1,249 @@
+"""
+Local fast path for agent-intent parsing (cancel_order | reorder_last | book_at_store |
+deliver_cart | none) so most chat turns skip the gpt-4o-mini call in _parse_agent_intent.
+Compiled patterns find explicit action requests; a small multinomial Naive Bayes model,
+trained at import on the hand-written examples below, has to agree before an action is
+accepted locally. Actions are destructive, so a message with an action cue that also has a
+negation or hedge ("don't cancel", "maybe later") or names something other than the order or
+cart ("cancel my subscription", "send me recommendations"), or qualifies it in a way the
+local action can't honour ("ship it to my office", "cancel the order for the shoes"), is
+never decided locally.
+Anything else that mentions an action cue is escalated to the LLM.
+"""
+import math
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Messages without any of these can't be an agent action
+_CUE_RE = re.compile(
+    r"\b(cancel\w*|stop|re-?order\w*|repeat\w*|again|last order|previous order|same order|last time|"
+    r"store|shop|pick ?up|pickup|collect|book\w*|deliver\w*|ship\w*|send|home delivery|doorstep)\b"
+)
+# Explicit imperative forms, one list per intent
+_PATTERNS: Dict[str, List[re.Pattern]] = {
+    "cancel_order": [
+        re.compile(r"^(please |pls |kindly )?(cancel|stop)\b(?!.*\b(how|policy|can i|charges?|fee)\b)"),
+        re.compile(r"\b(i want to|i wanna|i'd like to|want to|need to|please|go ahead and) cancel\b"),
+        re.compile(r"\bcancel (my|the|this|that) (last |latest |recent |previous )?order\b(?!.*\?)"),
+        re.compile(r"\bcancel (order )?ord-[a-z0-9]+\b"),
+    ],
+    "reorder_last": [
+        re.compile(r"^(please )?re-?order\b"),
+        re.compile(r"\b(repeat|redo) (my |the )?(last|previous|latest) order\b"),
+        re.compile(r"\b(order|buy) (it |that |the same )?again\b"),
+        re.compile(r"\b(take|get) (me )?my (last|previous) order( again)?\b"),
+        re.compile(r"\bsame (order|items) as (last time|before)\b"),
+    ],
+    "book_at_store": [
+        re.compile(r"\bbook (me )?(it|this|these|them|that|my cart|the cart|my order|my items|everything)\b.*\b(at|in|from) (the )?(store|shop)\b"),
+        re.compile(r"\b(store|in-store|shop) pick ?up\b"),
+        re.compile(r"\b(i'?ll|i will|let me|i'd like to|want to) (pick (it |this |them )?up|collect)\b"),
+        re.compile(r"\bpick (it |this |them |these )?up (at|from) (the )?(store|shop)\b"),
+        re.compile(r"\breserve (it|this|these|them|that|my cart|the cart|my items|everything)\b.*\b(store|shop)\b"),
+    ],
+    "deliver_cart": [
+        re.compile(r"^(please )?(deliver|ship|send)\b(?!.*\b(how|when|charges?|time|days|policy)\b)"),
+        re.compile(r"\b(deliver|ship|send) (it|this|these|them|my cart|the cart|my order)( to me| home| to my (home|address))?\b(?!.*\?)"),
+        re.compile(r"\bhome delivery (please|for this|for my cart)\b"),
+        re.compile(r"\bi want (home )?delivery\b"),
+        re.compile(r"\bdeliver(ed)? to my (home|address|doorstep)\b"),
+    ],
+}
+# Questions about a topic are FAQ, not actions ("how do I cancel an order?")
+_QUESTION_RE = re.compile(
+    r"^(how|what|why|when|where|which|is|are|does|do|can|could|will|would|should)\b|\?\s*$"
+)
+# Negations and hedges: "don't cancel my order", "never mind", "order it again later maybe"
+_NEGATION_RE = re.compile(
+    r"\b(not|no|never|nope|don'?t|doesn'?t|didn'?t|won'?t|wouldn'?t|shouldn'?t|can'?t|cannot|nevermind|never mind|"
+    r"maybe|perhaps|possibly|might|later|someday|sometime|if|unless|hold off|wait|not sure|thinking|considering)\b"
+)
+# Things an action verb can point at that are not the order or the cart
+_OTHER_OBJECT_RE = re.compile(
+    r"\b(subscriptions?|emails?|newsletters?|notifications?|alerts?|membership|account|table|appointment|slot|"
+    r"recommendations?|suggestions?|messages?|sms|otp|link|invoice|receipt|photos?|pictures?|reviews?|"
+    r"feedback|complaint|request|return|refund|exchange|reservation|booking|gift ?card|card|payment)\b"
+)
+# What each action has to refer to before it is taken locally
+_OBJECT_RE: Dict[str, re.Pattern] = {
+    "cancel_order": re.compile(
+        r"\b(cancel|stop) ((my|the|this|that) )?((last|latest|recent|previous|current) )?(order|purchase)\b|"
+        r"\bcancel (order )?ord-[a-z0-9]+\b|"
+        r"\bcancel (it|this|that)( please| now| for me)?\W*$"
+    ),
+    "book_at_store": re.compile(r"\b(store|shop)\b"),
+    "deliver_cart": re.compile(
+        r"\b(deliver|ship|send)( me)? (it|this|these|them|that|my cart|the cart|my order|the order|my items|everything)\b|"
+        r"\bhome delivery\b|\bi want (home )?delivery\b|\bdeliver(ed)? to my (home|address|doorstep)\b"
+    ),
+}
+# Qualifiers the local actions can't honour: a delivery goes to the profile address and a
+# cancel takes the last order (or the ORD id given), so another destination or recipient,
+# or an order picked by its contents or several orders, is left to the LLM
+_QUALIFIER_RE: Dict[str, re.Pattern] = {
+    "cancel_order": re.compile(
+        r"\b(orders|both|all|every|each|too|also|one before|other|another|older|first|second|third)\b|"
+        r"\band (the|my|this|that) (one|order)\b|"
+        r"\border (for|of|with|from|containing|that|which|where)\b"
+    ),
+    "deliver_cart": re.compile(
+        r"\b(to|for|at) (?!(me|home|my (home|house|address|doorstep|cart)|this|these|it|them)\b)\w+|"
+        r"\b(different|another|other|new|office|work|friend|someone|somebody|gift|mom|dad|sister|brother|wife|husband)\b"
+    ),
+}
+_ORDER_ID_RE = re.compile(r"\bord-[a-z0-9]+\b", re.I)
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+# Labeled examples for the Naive Bayes model (prompt examples plus common phrasings)
+TRAINING_EXAMPLES: List[Tuple[str, str]] = [
+    ("cancel this", "cancel_order"),
+    ("cancel my order", "cancel_order"),
+    ("cancel my last order", "cancel_order"),
+    ("cancel order ORD-1A2B3C4D", "cancel_order"),
+    ("please cancel the order i just placed", "cancel_order"),
+    ("i want to cancel my recent order", "cancel_order"),
+    ("stop my order", "cancel_order"),
+    ("i changed my mind cancel it", "cancel_order"),
+    ("cancel the latest purchase", "cancel_order"),
+    ("take my last order", "reorder_last"),
+    ("reorder", "reorder_last"),
+    ("repeat my last order", "reorder_last"),
+    ("order again", "reorder_last"),
+    ("reorder my previous purchase", "reorder_last"),
+    ("buy the same items again", "reorder_last"),
+    ("same order as last time", "reorder_last"),
+    ("get me my last order again", "reorder_last"),
+    ("i want the same thing again", "reorder_last"),
+    ("book me this at store", "book_at_store"),
+    ("store pickup", "book_at_store"),
+    ("i'll pick up at store", "book_at_store"),
+    ("book it at the store", "book_at_store"),
+    ("i will collect from the shop", "book_at_store"),
+    ("reserve this at the nearest store", "book_at_store"),
+    ("pick it up from store", "book_at_store"),
+    ("book my cart for in store pickup", "book_at_store"),
+    ("deliver me this", "deliver_cart"),
+    ("deliver this product", "deliver_cart"),
+    ("home delivery", "deliver_cart"),
+    ("ship it", "deliver_cart"),
+    ("send it to my home", "deliver_cart"),
+    ("deliver my cart to my address", "deliver_cart"),
+    ("i want home delivery please", "deliver_cart"),
+    ("ship these to me", "deliver_cart"),
+    ("hi", "none"),
+    ("hello there", "none"),
+    ("thanks", "none"),
+    ("show me shoes", "none"),
+    ("recommend a watch under 2000", "none"),
+    ("best running shoes for men", "none"),
+    ("what is your return policy", "none"),
+    ("how do i cancel an order", "none"),
+    ("can i cancel after shipping", "none"),
+    ("how long does delivery take", "none"),
+    ("what are the delivery charges", "none"),
+    ("which stores are open today", "none"),
+    ("is there a store near me", "none"),
+    ("where is my order", "none"),
+    ("track my order", "none"),
+    ("show my wallet balance", "none"),
+    ("order any black shoe mens for me", "none"),
+    ("buy me a red dress", "none"),
+    ("add this to cart", "none"),
+    ("checkout", "none"),
+    ("do you ship internationally", "none"),
+    ("what is the cancellation fee", "none"),
+    ("find me a shirt for a wedding", "none"),
+    ("trending kurtas", "none"),
+    ("tell me about aurapoints", "none"),
+    ("does the shop have this in blue", "none"),
+]
+
+
+class IntentDecision(NamedTuple):
+    intent: str
+    order_id: Optional[str]
+    confidence: float
+    source: str  # "gate" | "pattern" | "model"
+
+
+def _features(text: str) -> List[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayes:
+    """Multinomial NB with add-one smoothing over unigrams + bigrams."""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        self.labels = sorted({label for _, label in examples})
+        self.counts: Dict[str, Dict[str, int]] = {label: {} for label in self.labels}
+        self.totals = {label: 0 for label in self.labels}
+        docs = {label: 0 for label in self.labels}
+        vocab = set()
+        for text, label in examples:
+            docs[label] += 1
+            for f in _features(text):
+                self.counts[label][f] = self.counts[label].get(f, 0) + 1
+                self.totals[label] += 1
+                vocab.add(f)
+        self.vocab_size = len(vocab)
+        n = len(examples)
+        self.log_prior = {label: math.log(docs[label] / n) for label in self.labels}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        feats = _features(text)
+        scores = {}
+        for label in self.labels:
+            denom = self.totals[label] + self.vocab_size
+            counts = self.counts[label]
+            scores[label] = self.log_prior[label] + sum(math.log((counts.get(f, 0) + 1) / denom) for f in feats)
+        top = max(scores.values())
+        exp = {label: math.exp(s - top) for label, s in scores.items()}
+        z = sum(exp.values())
+        return {label: v / z for label, v in exp.items()}
+
+
+_model = NaiveBayes(TRAINING_EXAMPLES)
+
+# Model probability needed to confirm a pattern's action / to rule an action out
+ACTION_CONFIRM_PROB = 0.5
+NONE_ACCEPT_PROB = 0.9
+
+
+def _order_id_for(intent: str, text: str) -> Optional[str]:
+    if intent != "cancel_order":
+        return None
+    m = _ORDER_ID_RE.search(text)
+    return m.group(0).upper() if m else "last"
+
+
+def classify_agent_intent(message: str) -> Optional[IntentDecision]:
+    """
+    Local decision for _parse_agent_intent, or None when the message is ambiguous and
+    should go to the LLM.
+    """
+    text = " ".join((message or "").lower().split())
+    if not text or not _CUE_RE.search(text):
+        return IntentDecision("none", None, 1.0, "gate")
+    if _NEGATION_RE.search(text) or _OTHER_OBJECT_RE.search(text):
+        return None
+    proba = _model.predict_proba(text)
+    matched = [intent for intent, patterns in _PATTERNS.items() if any(p.search(text) for p in patterns)]
+    is_question = bool(_QUESTION_RE.search(text))
+    if len(matched) == 1 and not is_question:
+        intent = matched[0]
+        guard = _OBJECT_RE.get(intent)
+        if guard is not None and not guard.search(text):
+            return None
+        qualifier = _QUALIFIER_RE.get(intent)
+        if qualifier is not None and qualifier.search(text):
+            return None
+        # The model has to agree that this is that action (not a lookalike question)
+        if proba.get(intent, 0.0) >= ACTION_CONFIRM_PROB:
+            return IntentDecision(intent, _order_id_for(intent, text), proba[intent], "pattern")
+        return None
+    if not matched and proba.get("none", 0.0) >= NONE_ACCEPT_PROB:
+        return IntentDecision("none", None, proba["none"], "model")
+    if is_question and not matched and proba.get("none", 0.0) >= ACTION_CONFIRM_PROB:
+        return IntentDecision("none", None, proba["none"], "model")
+    return None
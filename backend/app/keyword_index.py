@@ -0,0 +1,218 @@
+"""
+BM25 inverted index over the product catalog for keyword search.
+Built once per catalog version (load or reload) instead of scanning every product per query.
+Fields are boosted BM25F-style: a term in the name counts more than one in the tags.
+"""
+import heapq
+import math
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional here; the dict path handles every query
+    np = None
+
+from app.data_store import load_products, get_catalog_version
+from app.models import Product
+from app.spell_correct import SymSpell
+
+# Per-field term-frequency weights
+FIELD_BOOSTS = {
+    "name": 3.0,
+    "brand": 2.5,
+    "category": 2.0,
+    "tags": 1.5,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Multi-term queries touching more postings than this accumulate into a numpy vector
+DENSE_ACCUMULATE_MIN = 1024
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_token(token: str) -> str:
+    """Cheap plural folding so 'shoes' matches 'shoe' and 'sneakers' matches 'sneaker'."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        if token.endswith("ies") and len(token) > 4:
+            return token[:-3] + "y"
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (single characters dropped), plural-folded."""
+    return [normalize_token(t) for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1]
+
+
+def _product_fields(p: Product) -> Dict[str, str]:
+    return {
+        "name": p.name or "",
+        "brand": p.brand or "",
+        "category": p.category or "",
+        "tags": " ".join(str(t) for t in (p.tags or [])),
+    }
+
+
+class BM25Index:
+    """
+    Inverted index: term -> postings sorted by precomputed BM25 term weight.
+    Scores are idf * saturated field-weighted tf, so a query only sums postings.
+    """
+
+    def __init__(self, products: List[Product]):
+        self.doc_ids: List[str] = [p.id for p in products]
+        self.doc_of: Dict[str, int] = {pid: doc for doc, pid in enumerate(self.doc_ids)}
+        self.n_docs = len(products)
+        term_freqs: List[Dict[str, float]] = []
+        lengths: List[float] = []
+        for p in products:
+            tf: Dict[str, float] = {}
+            length = 0.0
+            for field, text in _product_fields(p).items():
+                boost = FIELD_BOOSTS[field]
+                for token in tokenize(text):
+                    tf[token] = tf.get(token, 0.0) + boost
+                    length += boost
+            term_freqs.append(tf)
+            lengths.append(length)
+        avg_len = (sum(lengths) / len(lengths)) if lengths else 1.0
+        avg_len = avg_len or 1.0
+
+        raw: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, tf in enumerate(term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avg_len)
+            for term, f in tf.items():
+                raw.setdefault(term, []).append((doc, f * (BM25_K1 + 1) / (f + norm)))
+
+        # term -> (idf, [(weight, doc)] sorted best first)
+        self.postings: Dict[str, Tuple[float, List[Tuple[float, int]]]] = {}
+        # term -> (doc array, weight array) for vectorised accumulation of long lists
+        self._arrays: Dict[str, tuple] = {}
+        # term -> {doc: weight}, built on first use, for scoring a given set of documents
+        self._weights: Dict[str, Dict[int, float]] = {}
+        self._speller: Optional[SymSpell] = None
+        for term, plist in raw.items():
+            df = len(plist)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            weighted = sorted(((idf * w, doc) for doc, w in plist), key=lambda x: (-x[0], x[1]))
+            self.postings[term] = (idf, weighted)
+            if np is not None and df > DENSE_ACCUMULATE_MIN // 4:
+                self._arrays[term] = _to_arrays(weighted)
+
+    def vocabulary(self) -> Dict[str, int]:
+        """term -> document frequency."""
+        return {term: len(plist) for term, (_, plist) in self.postings.items()}
+
+    def speller(self) -> SymSpell:
+        """Deletion dictionary over this index's vocabulary (built on first use)."""
+        if self._speller is None:
+            self._speller = SymSpell(self.vocabulary())
+        return self._speller
+
+    def expand_terms(self, terms: List[str]) -> List[str]:
+        """Replace tokens missing from the vocabulary with their closest spellings."""
+        out: List[str] = []
+        for term in terms:
+            if term in self.postings:
+                out.append(term)
+            else:
+                out.extend(self.speller().correct(term))
+        return list(dict.fromkeys(out))
+
+    def search(
+        self, query: str, top_k: int = 15, fuzzy: bool = True, candidates: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return [(product_id, score)] best first. Misspelled terms are corrected when fuzzy.
+        With candidates, only those product ids are scored (cost grows with the candidate
+        set, not with the catalog).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if fuzzy:
+            terms = self.expand_terms(terms)
+        if candidates is not None:
+            return self.search_candidates(terms, candidates, top_k)
+        return self.search_terms(terms, top_k)
+
+    def search_candidates(self, terms: List[str], candidates: Iterable[str], top_k: int = 15) -> List[Tuple[str, float]]:
+        terms = [t for t in terms if t in self.postings]
+        if not terms or top_k <= 0:
+            return []
+        weights = []
+        for term in terms:
+            w = self._weights.get(term)
+            if w is None:
+                w = self._weights[term] = {doc: weight for weight, doc in self.postings[term][1]}
+            weights.append(w)
+        scores: Dict[int, float] = {}
+        for pid in candidates:
+            doc = self.doc_of.get(pid)
+            if doc is None or doc in scores:
+                continue
+            score = sum(w.get(doc, 0.0) for w in weights)
+            if score > 0:
+                scores[doc] = score
+        best = heapq.nlargest(top_k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [(self.doc_ids[doc], score) for doc, score in best]
+
+    def search_terms(self, terms: List[str], top_k: int = 15) -> List[Tuple[str, float]]:
+        terms = [t for t in terms if t in self.postings]
+        if not terms or top_k <= 0:
+            return []
+        if len(terms) == 1:
+            # Postings are already sorted by weight: top-k is a prefix
+            return [(self.doc_ids[doc], score) for score, doc in self.postings[terms[0]][1][:top_k]]
+        lists = [self.postings[t][1] for t in terms]
+        if np is not None and sum(len(plist) for plist in lists) > DENSE_ACCUMULATE_MIN:
+            return self._dense_top_k(terms, top_k)
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for plist in lists:
+            for weight, doc in plist:
+                scores[doc] = get(doc, 0.0) + weight
+        best = heapq.nlargest(top_k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [(self.doc_ids[doc], score) for doc, score in best]
+
+    def _dense_top_k(self, terms: List[str], top_k: int) -> List[Tuple[str, float]]:
+        """Accumulate long postings lists into a dense score vector, then partial-sort."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in terms:
+            arrays = self._arrays.get(term)
+            if arrays is None:
+                arrays = self._arrays[term] = _to_arrays(self.postings[term][1])
+            scores[arrays[0]] += arrays[1]
+        k = min(top_k, self.n_docs)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[scores[candidates] > 0]
+        # Best score first, ties by catalog order
+        order = np.lexsort((candidates, -scores[candidates]))
+        return [(self.doc_ids[int(doc)], float(scores[doc])) for doc in candidates[order]]
+
+
+def _to_arrays(plist: List[Tuple[float, int]]) -> tuple:
+    return (
+        np.fromiter((doc for _, doc in plist), dtype=np.int32, count=len(plist)),
+        np.fromiter((w for w, _ in plist), dtype=np.float32, count=len(plist)),
+    )
+
+
+# Index for the loaded catalog, rebuilt when the catalog version changes
+_index: Optional[BM25Index] = None
+_index_version = -1
+_lock = threading.Lock()
+
+
+def get_keyword_index() -> BM25Index:
+    """Return the BM25 index for the current catalog, building it if the catalog changed."""
+    global _index, _index_version
+    version = get_catalog_version()
+    if _index is not None and _index_version == version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = BM25Index(load_products())
+            _index_version = version
+    return _index
@@ -0,0 +1,637 @@
+"""
+Shared gateway for every OpenAI chat call (chat assistant, recommendations, returns agents).
+Per model it enforces:
+- a concurrency limit with priority lanes: interactive calls (chat) are admitted before
+  background ones (returns processing), and background calls never take the last
+  LLM_INTERACTIVE_RESERVED slots;
+- token buckets on requests per minute and tokens per minute (estimated from the prompt
+  and max_tokens, corrected with the reported usage);
+- coalescing: identical non-streaming requests already in flight share one upstream call;
+- a circuit breaker: after LLM_BREAKER_FAILURES consecutive upstream failures (or one
+  auth failure) calls fail fast with CircuitOpenError, so callers fall back to their local
+  paths without a network wait. After a cool-down one probe call is let through
+  (half-open); success closes the breaker, failure re-opens it with a longer cool-down.
+Per-call latency, queueing, token usage and breaker state are kept for /metrics/llm.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+import anyio
+
+from app.chat_history import count_tokens
+from app.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_INTERACTIVE_RESERVED,
+    LLM_MODEL_LIMITS,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_COOLDOWN,
+    LLM_BREAKER_MAX_COOLDOWN,
+)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_LANE_PRIORITY = {INTERACTIVE: 0, BACKGROUND: 1}
+
+# Prompt tokens charged per image part (gpt-4o high detail, 512px tiles)
+IMAGE_TOKENS = 765
+DEFAULT_MAX_TOKENS = 500
+LATENCY_SAMPLES = 1024
+
+try:
+    from openai import AsyncOpenAI, OpenAI
+    _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) if OPENAI_API_KEY else None
+    _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) if OPENAI_API_KEY else None
+except Exception:
+    _client = None
+    _async_client = None
+
+
+class CircuitOpenError(RuntimeError):
+    """The model's circuit breaker is open; the call was not sent."""
+
+
+def get_openai_client():
+    """Shared blocking OpenAI client (None without an API key)."""
+    return _client
+
+
+def get_async_openai_client():
+    """Shared async OpenAI client, used for streaming on the event loop."""
+    return _async_client
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class _Slots:
+    """Concurrency limit shared by threads and the event loop, admitting waiters by lane priority."""
+
+    def __init__(self, limit: int, reserved: int):
+        self.limit = max(1, limit)
+        self.background_limit = max(1, self.limit - max(0, reserved))
+        self.in_use = 0
+        self.background_in_use = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _admissible(self, priority: int) -> bool:
+        if self.in_use >= self.limit:
+            return False
+        return priority == 0 or self.background_in_use < self.background_limit
+
+    def _take(self, priority: int) -> None:
+        self.in_use += 1
+        if priority:
+            self.background_in_use += 1
+
+    def _enqueue(self, priority: int, loop=None) -> Optional[_Waiter]:
+        """Take a slot at once (None) or queue a waiter. Caller holds the lock."""
+        if self._admissible(priority) and not self._waiters:
+            self._take(priority)
+            return None
+        waiter = _Waiter(priority, next(self._seq), loop)
+        heapq.heappush(self._waiters, waiter)
+        return waiter
+
+    def _grant_waiters(self) -> None:
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            if not self._admissible(waiter.priority):
+                return
+            heapq.heappop(self._waiters)
+            self._take(waiter.priority)
+            waiter.granted = True
+            waiter.wake()
+
+    def acquire(self, priority: int) -> None:
+        with self._lock:
+            waiter = self._enqueue(priority)
+        if waiter is not None:
+            waiter.event.wait()
+
+    async def aacquire(self, priority: int) -> None:
+        with self._lock:
+            waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                if not waiter.granted:
+                    waiter.cancelled = True
+                    raise
+            self.release(priority)
+            raise
+
+    def release(self, priority: int) -> None:
+        with self._lock:
+            self.in_use -= 1
+            if priority:
+                self.background_in_use -= 1
+            self._grant_waiters()
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(1 for w in self._waiters if not w.cancelled)
+
+
+class _TokenBucket:
+    """Refills at rate_per_minute up to one minute's worth; reservations may overdraw and wait."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.capacity = max(rate_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount now; returns the seconds to wait before the reservation is covered."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def adjust(self, amount: float) -> None:
+        """Give back (negative) or charge extra (positive) tokens once the real usage is known."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def _is_upstream_failure(e: BaseException) -> bool:
+    """Outages, overload, rate limits and bad keys trip the breaker; bad requests don't."""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        return type(e).__module__.startswith(("openai", "httpx")) or isinstance(e, (TimeoutError, ConnectionError))
+    return status >= 500 or status in (401, 403, 408, 429)
+
+
+class _CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = LLM_BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self.trips = 0
+        self.short_circuited = 0
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go upstream now (in half-open state: only the single probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def available(self) -> bool:
+        """Cheap check for callers: False while open and cooling down."""
+        return self.state == self.CLOSED or time.monotonic() - self.opened_at >= self.cooldown
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = LLM_BREAKER_COOLDOWN
+            self._probe_in_flight = False
+
+    def failure(self, e: BaseException) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {str(e)[:200]}"
+            auth = getattr(e, "status_code", None) in (401, 403)
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, LLM_BREAKER_MAX_COOLDOWN)
+            elif self.failures < LLM_BREAKER_FAILURES and not auth:
+                return
+            if auth:
+                # A bad key won't fix itself within seconds
+                self.cooldown = LLM_BREAKER_MAX_COOLDOWN
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The probe ended without an upstream verdict (e.g. cancelled); let another through."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == self.OPEN else 0.0
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "short_circuited": self.short_circuited,
+                "retry_in_s": round(retry_in, 1),
+                "last_error": self.last_error,
+            }
+
+
+class _ModelState:
+    def __init__(self, model: str):
+        limits = LLM_MODEL_LIMITS.get(model, {})
+        self.model = model
+        self.slots = _Slots(int(limits.get("concurrency", LLM_MAX_CONCURRENCY)), LLM_INTERACTIVE_RESERVED)
+        self.requests = _TokenBucket(float(limits.get("rpm", LLM_REQUESTS_PER_MINUTE)))
+        self.tokens = _TokenBucket(float(limits.get("tpm", LLM_TOKENS_PER_MINUTE)))
+        self.breaker = _CircuitBreaker()
+        self.lock = threading.Lock()
+        self.calls = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.errors = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.queue_waits = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, lane: str, queued_s: float, latency_s: Optional[float], prompt: int, completion: int, error: bool):
+        with self.lock:
+            self.calls[lane] = self.calls.get(lane, 0) + 1
+            self.queue_waits.append(queued_s)
+            if error:
+                self.errors += 1
+            else:
+                self.latencies.append(latency_s)
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+
+
+_models: Dict[str, _ModelState] = {}
+_models_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _state(model: str) -> _ModelState:
+    state = _models.get(model)
+    if state is None:
+        with _models_lock:
+            state = _models.get(model)
+            if state is None:
+                state = _models[model] = _ModelState(model)
+    return state
+
+
+def llm_available(model: str) -> bool:
+    """False while the model's circuit breaker is open: callers should take their local path."""
+    return _state(model).breaker.available()
+
+
+def _fail_fast(state: _ModelState) -> None:
+    """Raise before queueing when the breaker is open and still cooling down."""
+    if not state.breaker.available():
+        state.breaker.allow()  # counts the short-circuit
+        raise CircuitOpenError(f"LLM circuit open for {state.model}")
+
+
+def _check_breaker(state: _ModelState) -> None:
+    if not state.breaker.allow():
+        raise CircuitOpenError(f"LLM circuit open for {state.model}")
+
+
+def _outcome(state: _ModelState, error: Optional[BaseException]) -> None:
+    """Feed a finished upstream call to the breaker."""
+    if error is None:
+        state.breaker.success()
+    elif _is_upstream_failure(error):
+        state.breaker.failure(error)
+    else:
+        # Caller errors (bad request, cancellation) say nothing about the upstream's health
+        state.breaker.release_probe()
+
+
+def estimate_prompt_tokens(messages: List[dict]) -> int:
+    total = 0
+    for m in messages:
+        content = m.get("content") or ""
+        total += 4
+        if isinstance(content, str):
+            total += count_tokens(content)
+        else:
+            for part in content:
+                if part.get("type") == "text":
+                    total += count_tokens(part.get("text") or "")
+                else:
+                    total += IMAGE_TOKENS
+    return total
+
+
+def _usage(response) -> tuple:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+def _lane(lane: str) -> str:
+    return lane if lane in _LANE_PRIORITY else INTERACTIVE
+
+
+def _reserve_rate(state: _ModelState, estimate: int) -> float:
+    wait = max(state.requests.reserve(1), state.tokens.reserve(estimate))
+    if wait > 0:
+        with state.lock:
+            state.rate_limited += 1
+    return wait
+
+
+def _wait_rate(state: _ModelState, estimate: int) -> None:
+    """Sleep off the rate limit after _check_breaker; an interrupted wait gives the probe back."""
+    wait = _reserve_rate(state, estimate)
+    if wait <= 0:
+        return
+    try:
+        time.sleep(wait)
+    except BaseException:
+        # No upstream call was made, so there is no verdict for the breaker
+        state.breaker.release_probe()
+        raise
+
+
+async def _await_rate(state: _ModelState, estimate: int) -> None:
+    wait = _reserve_rate(state, estimate)
+    if wait <= 0:
+        return
+    try:
+        await asyncio.sleep(wait)
+    except BaseException:
+        # Cancelled while waiting (client went away): the probe must not stay taken
+        state.breaker.release_probe()
+        raise
+
+
+def _call(client, state: _ModelState, lane: str, messages: List[dict], kwargs: Dict[str, Any]):
+    priority = _LANE_PRIORITY[lane]
+    prompt_estimate = estimate_prompt_tokens(messages)
+    estimate = prompt_estimate + int(kwargs.get("max_tokens") or DEFAULT_MAX_TOKENS)
+    t0 = time.perf_counter()
+    state.slots.acquire(priority)
+    try:
+        _check_breaker(state)
+        _wait_rate(state, estimate)
+        queued = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=state.model, messages=messages, **kwargs)
+        except BaseException as e:
+            _outcome(state, e)
+            state.record(lane, queued, None, 0, 0, True)
+            raise
+        _outcome(state, None)
+        usage = _usage(response) or (prompt_estimate, 0)
+        state.tokens.adjust(sum(usage) - estimate)
+        state.record(lane, queued, time.perf_counter() - t1, usage[0], usage[1], False)
+        return response
+    finally:
+        state.slots.release(priority)
+
+
+def _coalesce_key(model: str, messages: List[dict], kwargs: Dict[str, Any], client) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "kwargs": kwargs}, sort_keys=True, default=str)
+    return f"{id(client)}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def chat_completion(model: str, messages: List[dict], lane: str = INTERACTIVE, client=None, coalesce: bool = True, **kwargs):
+    """
+    Blocking chat.completions.create through the gateway. client defaults to the shared
+    client (pass an agent's own wrapped client to keep its tracing). Raises like the SDK;
+    RuntimeError when no client is configured.
+    """
+    client = client or _client
+    if client is None:
+        raise RuntimeError("OpenAI client not configured")
+    state = _state(model)
+    lane = _lane(lane)
+    _fail_fast(state)
+    if not coalesce:
+        return _call(client, state, lane, messages, kwargs)
+    key = _coalesce_key(model, messages, kwargs, client)
+    with _inflight_lock:
+        leader = _inflight.get(key)
+        if leader is None:
+            future = _inflight[key] = Future()
+    if leader is not None:
+        with state.lock:
+            state.coalesced += 1
+        return leader.result()
+    try:
+        response = _call(client, state, lane, messages, kwargs)
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+class _StreamMeter:
+    """Counts completion text of a stream (streams report no usage) and upstream errors."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.error: Optional[BaseException] = None
+
+    def add(self, chunk) -> None:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                self.parts.append(delta)
+
+    def tokens(self) -> int:
+        return count_tokens("".join(self.parts))
+
+
+def _finish_stream(state, lane, queued, t1, prompt_estimate, estimate, meter, opened):
+    # A stream that opened and read without upstream errors is a success, even if the caller stopped early
+    if opened or meter.error is not None:
+        _outcome(state, meter.error)
+    else:
+        state.breaker.release_probe()
+    completion = meter.tokens()
+    state.tokens.adjust(prompt_estimate + completion - estimate)
+    state.record(lane, queued, time.perf_counter() - t1, prompt_estimate, completion, meter.error is not None)
+
+
+@contextmanager
+def chat_completion_stream(model: str, messages: List[dict], lane: str = INTERACTIVE, client=None, **kwargs):
+    """Blocking streaming call: `with chat_completion_stream(...) as chunks: for chunk in chunks: ...`"""
+    client = client or _client
+    if client is None:
+        raise RuntimeError("OpenAI client not configured")
+    state = _state(model)
+    lane = _lane(lane)
+    priority = _LANE_PRIORITY[lane]
+    prompt_estimate = estimate_prompt_tokens(messages)
+    estimate = prompt_estimate + int(kwargs.get("max_tokens") or DEFAULT_MAX_TOKENS)
+    meter = _StreamMeter()
+    _fail_fast(state)
+    t0 = time.perf_counter()
+    state.slots.acquire(priority)
+    stream = None
+    try:
+        _check_breaker(state)
+        _wait_rate(state, estimate)
+        queued = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        try:
+            try:
+                stream = client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+            except Exception as e:
+                meter.error = e
+                raise
+
+            def chunks():
+                try:
+                    for chunk in stream:
+                        meter.add(chunk)
+                        yield chunk
+                except Exception as e:
+                    meter.error = e
+                    raise
+
+            yield chunks()
+        finally:
+            if stream is not None:
+                stream.close()
+            _finish_stream(state, lane, queued, t1, prompt_estimate, estimate, meter, stream is not None)
+    finally:
+        state.slots.release(priority)
+
+
+@asynccontextmanager
+async def achat_completion_stream(model: str, messages: List[dict], lane: str = INTERACTIVE, client=None, **kwargs):
+    """
+    Async streaming call on the shared AsyncOpenAI client:
+    `async with achat_completion_stream(...) as chunks: async for chunk in chunks: ...`
+    Leaving the block (also by cancellation) closes the upstream stream and frees the slot.
+    """
+    client = client or _async_client
+    if client is None:
+        raise RuntimeError("OpenAI client not configured")
+    state = _state(model)
+    lane = _lane(lane)
+    priority = _LANE_PRIORITY[lane]
+    prompt_estimate = estimate_prompt_tokens(messages)
+    estimate = prompt_estimate + int(kwargs.get("max_tokens") or DEFAULT_MAX_TOKENS)
+    meter = _StreamMeter()
+    _fail_fast(state)
+    t0 = time.perf_counter()
+    await state.slots.aacquire(priority)
+    stream = None
+    try:
+        _check_breaker(state)
+        await _await_rate(state, estimate)
+        queued = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        try:
+            try:
+                stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+            except Exception as e:
+                meter.error = e
+                raise
+
+            async def chunks():
+                try:
+                    async for chunk in stream:
+                        meter.add(chunk)
+                        yield chunk
+                except Exception as e:
+                    meter.error = e
+                    raise
+
+            yield chunks()
+        finally:
+            if stream is not None:
+                # Shielded: this also runs while the caller's task is being cancelled
+                with anyio.CancelScope(shield=True):
+                    await stream.close()
+            _finish_stream(state, lane, queued, t1, prompt_estimate, estimate, meter, stream is not None)
+    finally:
+        state.slots.release(priority)
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+
+
+def get_llm_metrics() -> dict:
+    """Per-model call counts, queueing, latency percentiles (ms), token usage and breaker state."""
+    out = {}
+    for model, state in list(_models.items()):
+        with state.lock:
+            latencies = list(state.latencies)
+            waits = list(state.queue_waits)
+            out[model] = {
+                "calls": dict(state.calls),
+                "errors": state.errors,
+                "coalesced": state.coalesced,
+                "rate_limited": state.rate_limited,
+                "in_flight": state.slots.in_use,
+                "queued": state.slots.queued(),
+                "concurrency_limit": state.slots.limit,
+                "prompt_tokens": state.prompt_tokens,
+                "completion_tokens": state.completion_tokens,
+                "latency_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95), "p99": _percentile(latencies, 0.99)},
+                "queue_ms": {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)},
+                "breaker": state.breaker.snapshot(),
+            }
+    return out
@@ -3,9 +3,9 @@ AuraShop Backend - AI Shopping Assistant API
 REST + event tracking + recommendations + chat
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from app.config import CORS_ORIGINS
 from app.models import (
@@ -31,11 +31,25 @@ from app.data_store import (
     clear_cart,
     get_session_context,
 )
-from app.ai_service import get_recommendations, chat as ai_chat, chat_stream as ai_chat_stream
+from app.rag_store import (
+    get_sync_status as get_rag_sync_status,
+    search_products_hybrid_debug,
+)
+from app.embedding_cache import get_embedding_cache_stats
+from app.llm_gateway import get_llm_metrics
+from app.product_search import search_catalog
+from app.warmup import run_warmup, get_readiness
+from app.autocomplete import suggest as search_suggest
+from app.cart_suggestions import get_cart_suggestions
+from app.ai_service import get_recommendations, chat as ai_chat, achat_stream as ai_achat_stream
+from app.stream_chunker import sse_frames
+from app.chat_socket import serve_chat_socket
 from app.order_service import (
     create_order,
     get_order,
     get_user_orders,
+    get_user_orders_page,
+    get_orders_by_status,
     update_order_status,
     verify_pickup_qr,
     complete_pickup,
@@ -77,15 +91,18 @@ from app.wallet_service import (
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     import asyncio
-    try:
-        load_products()
-    except Exception:
-        pass
+    # Heavy subsystems warm concurrently in the background; /ready reports progress
+    warmup_task = asyncio.create_task(run_warmup())
     try:
         yield
     except asyncio.CancelledError:
         # Normal during uvicorn --reload; re-raise so shutdown runs
         raise
+    finally:
+        warmup_task.cancel()
+        # Commit queued order/coupon/wallet writes and checkpoint the commit log
+        from app.persistence import shutdown as persistence_shutdown
+        persistence_shutdown()
 
 
 app = FastAPI(
@@ -108,6 +125,31 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness for load balancers: 503 until the warm-up has finished."""
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/rag/sync-status")
+def rag_sync_status():
+    """Progress of the background Chroma sync (products + FAQ)."""
+    return get_rag_sync_status()
+
+
+@app.get("/metrics/embeddings")
+def embedding_cache_metrics():
+    """Query embedding cache size and hit rate."""
+    return get_embedding_cache_stats()
+
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    """LLM gateway calls, queueing, latency and token usage per model."""
+    return get_llm_metrics()
+
+
 @app.get("/categories")
 def list_categories():
     """Return all product categories for filtering."""
@@ -138,6 +180,55 @@ def list_products(
         return {"products": []}
 
 
+@app.get("/search")
+def search_endpoint(
+    q: str = Query("", description="Search text; empty browses the catalog"),
+    category: str | None = Query(None),
+    min_price: float | None = Query(None),
+    max_price: float | None = Query(None),
+    min_rating: float | None = Query(None),
+    color: str | None = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(24, ge=1, le=100),
+):
+    """Ranked, paginated product search with facet counts and highlighted matches."""
+    return search_catalog(
+        q,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        min_rating=min_rating,
+        color=color,
+        page=page,
+        page_size=page_size,
+    )
+
+
+@app.get("/search/hybrid")
+def search_hybrid_endpoint(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(15, le=50),
+    debug: bool = Query(False, description="Include per-retriever hits and timings"),
+):
+    """Hybrid (semantic + keyword) product search fused with reciprocal rank fusion."""
+    out = search_products_hybrid_debug(q, top_k=limit)
+    if debug:
+        return out
+    return {"results": out["results"]}
+
+
+@app.get("/search/suggest")
+def search_suggest_endpoint(
+    q: str = Query("", description="Partial query typed so far"),
+    limit: int = Query(8, le=20),
+):
+    """Type-ahead completions: product names, brands, categories and popular searches."""
+    try:
+        return {"query": q, "suggestions": search_suggest(q, limit=limit)}
+    except Exception:
+        return {"query": q, "suggestions": []}
+
+
 @app.get("/products/{product_id}/availability")
 def product_availability(
     product_id: str,
@@ -200,14 +291,16 @@ def chat_endpoint(body: ChatRequest):
     return result
 
 
-def _sse_stream(session_id: str, message: str, history: list, context: dict | None = None):
-    import json
-    for chunk in ai_chat_stream(session_id=session_id, message=message, history=history, context=context):
-        yield f"data: {json.dumps(chunk)}\n\n"
+async def _sse_stream(session_id: str, message: str, history: list, context: dict | None = None):
+    # StreamingResponse cancels this generator when the client disconnects; achat_stream
+    # then closes the upstream OpenAI stream instead of paying for the rest of it.
+    # Deltas are coalesced into fewer frames, with heartbeats during long pauses.
+    async for frame in sse_frames(ai_achat_stream(session_id=session_id, message=message, history=history, context=context)):
+        yield frame
 
 
 @app.post("/chat/stream")
-def chat_stream_endpoint(body: ChatRequest):
+async def chat_stream_endpoint(body: ChatRequest):
     return StreamingResponse(
         _sse_stream(body.session_id, body.message, body.history or [], body.context),
         media_type="text/event-stream",
@@ -215,6 +308,12 @@ def chat_stream_endpoint(body: ChatRequest):
     )
 
 
+@app.websocket("/ws/chat")
+async def chat_socket_endpoint(websocket: WebSocket):
+    """Chat over one WebSocket: many conversations per connection, replies streamed as /chat/stream events."""
+    await serve_chat_socket(websocket)
+
+
 @app.post("/auth/send-otp")
 def auth_send_otp_endpoint(body: SendOtpRequest):
     """Generate OTP for email and print it in the backend terminal. No password."""
@@ -298,6 +397,26 @@ def get_session_cart(session_id: str):
     return {"cart": products}
 
 
+@app.get("/cart/suggestions")
+def cart_suggestions(
+    session_id: str = Query(..., description="Session ID whose cart to score"),
+    product_ids: str | None = Query(None, description="Comma-separated cart product IDs (overrides session cart)"),
+    limit: int = Query(6, ge=1, le=20),
+):
+    """Frequently-bought-together suggestions for the cart, mined from order history."""
+    cart_ids = [p.strip() for p in product_ids.split(",") if p.strip()] if product_ids else get_cart(session_id)
+    try:
+        suggestions = get_cart_suggestions(cart_ids, limit=limit)
+    except Exception:
+        return {"suggestions": []}
+    out = []
+    for s in suggestions:
+        p = get_product(s["product_id"])
+        if p:
+            out.append({**s, "product": p.model_dump()})
+    return {"suggestions": out}
+
+
 @app.post("/session/{session_id}/cart/clear")
 def clear_cart_endpoint(session_id: str):
     """Clear all items from cart."""
@@ -397,10 +516,30 @@ def get_order_detail(order_id: str):
 
 
 @app.get("/users/{user_id}/orders")
-def get_user_order_list(user_id: str):
-    """Get all orders for a user."""
-    orders = get_user_orders(user_id)
-    return {"orders": [o.model_dump() for o in orders]}
+def get_user_order_list(
+    user_id: str,
+    limit: int | None = Query(None, ge=1, le=100, description="Page size; all orders when omitted"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+):
+    """Get a user's orders, newest first. With limit, pages through them by cursor."""
+    if limit is None:
+        orders = get_user_orders(user_id)
+        return {"orders": [o.model_dump() for o in orders]}
+    try:
+        orders, next_cursor = get_user_orders_page(user_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"orders": [o.model_dump() for o in orders], "next_cursor": next_cursor}
+
+
+@app.get("/orders")
+def list_orders_by_status(status: str = Query(..., description="e.g. ready_for_pickup"), limit: int = Query(50, ge=1, le=200)):
+    """Orders currently in a status, most recently changed first (admin/store use)."""
+    try:
+        order_status = OrderStatus(status)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    return {"orders": [o.model_dump() for o in get_orders_by_status(order_status, limit)]}
 
 
 class UpdateStatusRequest(BaseModel):
@@ -1,52 +1,81 @@
 """
 Order management and QR code generation for store pickup.
-Orders are persisted to data/orders.json so they survive server restarts.
+Orders are persisted to a SQLite store (data/orders.db, see order_store) so they survive
+server restarts; an existing data/orders.json is migrated into it on first start. Writes go
+through the group-commit log (persistence); placing an order waits for its commit.
+Every order is still loaded into memory at startup and read from there (with the user,
+status and QR indexes below); the store is only written to and read back on start.
 """
-import json
 import uuid
 import hashlib
+import threading
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from app.models import Order, OrderStatus, OrderItem, DeliveryMethod, UserProfile
+from app.config import ORDERS_FILE
+from app.order_store import OrderStore
+from app.persistence import get_commit_log, persist, wait_durable
+from app.user_context import touch_user
 
-ORDERS_PATH = Path(__file__).resolve().parent.parent / "data" / "orders.json"
+# Legacy JSON file (migration source); the SQLite database sits next to it
+ORDERS_PATH = Path(ORDERS_FILE) if ORDERS_FILE else Path(__file__).resolve().parent.parent / "data" / "orders.json"
+ORDERS_DB_PATH = ORDERS_PATH.with_suffix(".db")
 
-# In-memory storage (loaded from file on first access)
+# In-memory storage (loaded from the store on first access)
 _orders: Dict[str, Order] = {}
 _user_profiles: Dict[str, UserProfile] = {}
 _orders_loaded = False
+_load_lock = threading.Lock()
+_store: Optional[OrderStore] = None
+# Secondary indexes, maintained on every write: user_id -> order ids oldest first (append-only,
+# so positions are stable page cursors), status -> order ids (dict as an ordered set), QR -> order id
+_by_user: Dict[str, List[str]] = {}
+_by_status: Dict[OrderStatus, Dict[str, None]] = {}
+_by_qr: Dict[str, str] = {}
 
 
 def _load_orders() -> None:
-    global _orders, _orders_loaded
+    global _orders_loaded, _store
     if _orders_loaded:
         return
-    _orders_loaded = True
-    if not ORDERS_PATH.exists():
-        return
+    with _load_lock:
+        if _orders_loaded:
+            return
+        try:
+            _store = OrderStore(ORDERS_DB_PATH, legacy_json=ORDERS_PATH)
+            # Registering replays orders committed to the log but not yet written to the store
+            get_commit_log().register("order", _apply_orders, _store.checkpoint)
+            for order in _store.iter_all():
+                _orders[order.id] = order
+        except Exception as e:
+            print(f"Order store unavailable ({ORDERS_DB_PATH}), orders are kept in memory only: {e}")
+        for order in sorted(_orders.values(), key=lambda o: o.created_at or ""):
+            _index_order(order)
+        _orders_loaded = True
+
+
+def _index_order(order: Order) -> None:
+    _by_user.setdefault(order.user_id, []).append(order.id)
+    _by_status.setdefault(order.status, {})[order.id] = None
+    if order.qr_code:
+        _by_qr[order.qr_code] = order.id
+
+
+def _apply_orders(records: dict) -> None:
+    _store.put_many(Order.model_validate(data) for data in records.values())
+
+
+def _save_order(order: Order):
+    """Queue a created or changed order for the next group commit; returns the commit future."""
+    if _store is None:
+        return None
     try:
-        with open(ORDERS_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        for o in data.get("orders", []):
-            order = Order(**o)
-            _orders[order.id] = order
-    except Exception:
-        pass
-
-
-def _save_orders() -> None:
-    ORDERS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        with open(ORDERS_PATH, "w", encoding="utf-8") as f:
-            json.dump(
-                {"orders": [o.model_dump() for o in _orders.values()]},
-                f,
-                indent=2,
-                default=str,
-            )
-    except Exception:
-        pass
+        return persist("order", order.id, order.model_dump(mode="json"))
+    except Exception as e:
+        print(f"Failed to save order {order.id}: {e}")
+        return None
 
 
 def generate_qr_code_data(order_id: str, total: float, store_location: str = "") -> str:
@@ -105,7 +134,16 @@ def create_order(
         updated_at=now,
     )
     _orders[order_id] = order
-    _save_orders()
+    _index_order(order)
+    committed = _save_order(order)
+    touch_user(user_id)
+
+    # Feed the frequently-bought-together rules incrementally
+    try:
+        from app.cart_suggestions import record_order
+        record_order(order)
+    except Exception:
+        pass
     
     # Add pending AuraPoints immediately
     try:
@@ -114,7 +152,10 @@ def create_order(
         print(f"✓ Added pending AuraPoints for order {order_id}")
     except Exception as e:
         print(f"Failed to add pending points for order {order_id}: {e}")
-    
+
+    # Checkout returns once the order itself is committed (the points are write-behind)
+    if committed is not None:
+        wait_durable(committed, f"Order {order_id}")
     return order
 
 
@@ -124,11 +165,40 @@ def get_order(order_id: str) -> Optional[Order]:
     return _orders.get(order_id)
 
 
+def iter_orders() -> List[Order]:
+    """Snapshot of all orders (used to mine purchase history)."""
+    _load_orders()
+    return list(_orders.values())
+
+
 def get_user_orders(user_id: str) -> List[Order]:
     """Get all orders for a user, newest first."""
     _load_orders()
-    user_orders = [o for o in _orders.values() if o.user_id == user_id]
-    return sorted(user_orders, key=lambda o: o.created_at or "", reverse=True)
+    return [_orders[oid] for oid in reversed(_by_user.get(user_id, []))]
+
+
+def get_user_orders_page(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Order], Optional[str]]:
+    """
+    One page of a user's orders, newest first. cursor is the next_cursor of the previous
+    page; orders placed in between do not shift later pages. Raises ValueError on a bad cursor.
+    """
+    _load_orders()
+    ids = _by_user.get(user_id, [])
+    end = len(ids)
+    if cursor:
+        end = int(cursor)
+        if not 0 <= end <= len(ids):
+            raise ValueError("invalid cursor")
+    start = max(0, end - limit)
+    page = [_orders[oid] for oid in reversed(ids[start:end])]
+    return page, (str(start) if start > 0 else None)
+
+
+def get_orders_by_status(status: OrderStatus, limit: Optional[int] = None) -> List[Order]:
+    """Orders currently in a status, the most recent to enter it first."""
+    _load_orders()
+    ids = reversed(_by_status.get(status, {}))
+    return [_orders[oid] for oid in islice(ids, limit)]
 
 
 def update_order_status(order_id: str, status: OrderStatus) -> Optional[Order]:
@@ -140,7 +210,18 @@ def update_order_status(order_id: str, status: OrderStatus) -> Optional[Order]:
         order.status = status
         order.updated_at = datetime.utcnow().isoformat()
         _orders[order_id] = order
-        _save_orders()
+        if old_status != status:
+            _by_status.get(old_status, {}).pop(order_id, None)
+            _by_status.setdefault(status, {})[order_id] = None
+        _save_order(order)
+        touch_user(order.user_id)
+
+        if status == OrderStatus.CANCELLED and old_status != status:
+            try:
+                from app.cart_suggestions import forget_order
+                forget_order(order)
+            except Exception:
+                pass
         
         # Activate pending AuraPoints when order is completed
         if status in [OrderStatus.DELIVERED, OrderStatus.PICKED_UP] and old_status != status:
@@ -193,9 +274,9 @@ def verify_pickup_qr(qr_code: str) -> Optional[Order]:
             return None
     
     # Fall back to old format for backward compatibility
-    for order in _orders.values():
-        if order.qr_code == qr_code and order.delivery_method == DeliveryMethod.STORE_PICKUP:
-            return order
+    order = _orders.get(_by_qr.get(qr_code, ""))
+    if order and order.delivery_method == DeliveryMethod.STORE_PICKUP:
+        return order
     
     return None
 
@@ -232,6 +313,7 @@ def create_or_update_profile(
             existing.addresses = addresses
         if preferred_stores is not None:
             existing.preferred_stores = preferred_stores
+        touch_user(user_id)
         return existing
     else:
         profile = UserProfile(
@@ -244,6 +326,7 @@ def create_or_update_profile(
             created_at=datetime.utcnow().isoformat(),
         )
         _user_profiles[user_id] = profile
+        touch_user(user_id)
         return profile
 
 
@@ -0,0 +1,149 @@
+"""
+SQLite order store (WAL mode): one row per order, so placing or updating an order writes
+that row only instead of re-serializing every order ever placed into orders.json.
+Searchable fields (user_id, status, qr_code, created_at) are indexed columns; the full
+Order is kept as JSON next to them, so the Order model can change without migrations.
+On first open an existing orders.json is imported in one transaction (the JSON file is
+left in place as a backup) and PRAGMA user_version records that the migration ran.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from app.models import Order
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    qr_code TEXT,
+    created_at TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_user_created ON orders (user_id, created_at);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status);
+CREATE INDEX IF NOT EXISTS orders_qr_code ON orders (qr_code) WHERE qr_code IS NOT NULL;
+"""
+
+_UPSERT = (
+    "INSERT INTO orders (id, user_id, status, qr_code, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, status = excluded.status, qr_code = excluded.qr_code, "
+    "created_at = excluded.created_at, updated_at = excluded.updated_at, data = excluded.data"
+)
+
+
+def _row(order: Order) -> tuple:
+    return (
+        order.id,
+        order.user_id,
+        order.status.value,
+        order.qr_code,
+        order.created_at or "",
+        order.updated_at or "",
+        order.model_dump_json(),
+    )
+
+
+class OrderStore:
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection shared by the request threads; writes are serialized by _lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL survives an application crash; only an OS crash can lose the last commits
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json: Optional[Path]) -> None:
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Statement by statement: executescript would commit the open transaction
+                for statement in filter(str.strip, _SCHEMA.split(";")):
+                    self._conn.execute(statement)
+                imported = self._import_json(legacy_json) if legacy_json else 0
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if imported:
+            print(f"✓ Migrated {imported} orders from {legacy_json} to {self.path}")
+
+    def _import_json(self, legacy_json: Path) -> int:
+        if not legacy_json.exists():
+            return 0
+        try:
+            with open(legacy_json, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping order migration, could not read {legacy_json}: {e}")
+            return 0
+        rows = []
+        for o in data.get("orders", []):
+            try:
+                rows.append(_row(Order(**o)))
+            except Exception as e:
+                print(f"Skipping unreadable order {o.get('id')} in {legacy_json}: {e}")
+        self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def put(self, order: Order) -> None:
+        """Insert or replace one order (its own transaction)."""
+        row = _row(order)
+        with self._lock:
+            self._conn.execute(_UPSERT, row)
+
+    def put_many(self, orders: Iterable[Order]) -> None:
+        rows = [_row(o) for o in orders]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(_UPSERT, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, order_id: str) -> Optional[Order]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return Order.model_validate_json(row[0]) if row else None
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Order]:
+        """Every order in insertion order, read in batches."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, data FROM orders WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, data in rows:
+                yield Order.model_validate_json(data)
+
+    def checkpoint(self) -> None:
+        """Copy the WAL into the database file and sync it to disk."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
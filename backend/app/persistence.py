@@ -0,0 +1,335 @@
+"""
+Group-commit, write-behind persistence shared by order_service, coupon_service and wallet_service.
+The services keep their state in memory and hand every mutation to the commit log:
+submit() queues (kind, key, value) and returns a Future. One writer thread takes whatever is
+queued (waiting up to PERSIST_COMMIT_INTERVAL_MS for more, at most PERSIST_COMMIT_MAX_BATCH
+writes), appends the batch to data/commit.log as JSON lines and fsyncs once; that is the
+commit point, and the batch's futures resolve. The batch is then applied to the stores
+(orders.db through order_store, everything else to the state.db document table), one
+transaction per kind, with repeated writes to a key collapsed to the last one.
+Callers that must not lose a write (checkout, wallet top-ups and payments) wait on the
+future; the rest do not. Once the log passes PERSIST_CHECKPOINT_BYTES the stores are synced
+to disk and the log is truncated. On start the log is replayed into the stores, so commits
+that were acknowledged but not yet applied survive a crash. PERSIST_GROUP_COMMIT=0 commits
+every write on its own in the calling thread (one fsync each).
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    ORDERS_FILE,
+    PERSIST_CHECKPOINT_BYTES,
+    PERSIST_COMMIT_INTERVAL_MS,
+    PERSIST_COMMIT_MAX_BATCH,
+    PERSIST_GROUP_COMMIT,
+)
+
+# Everything sits next to the order store (load tests point ORDERS_FILE at a scratch directory)
+DATA_DIR = Path(ORDERS_FILE).parent if ORDERS_FILE else Path(__file__).resolve().parent.parent / "data"
+COMMIT_LOG_PATH = DATA_DIR / "commit.log"
+STATE_DB_PATH = DATA_DIR / "state.db"
+# How long a durable write may wait for its commit before the caller gives up
+DURABLE_WAIT_S = 5.0
+
+_FLUSH = object()
+_STOP = object()
+
+
+class StateStore:
+    """SQLite (WAL) table of JSON documents by (kind, key): coupon usage, wallets, reward flags."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # The commit log is the durable copy; the store only has to be synced at checkpoints
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (kind TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (kind, key)) WITHOUT ROWID"
+        )
+
+    def load(self, kind: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data FROM docs WHERE kind = ?", (kind,)).fetchall()
+        return {key: json.loads(data) for key, data in rows}
+
+    def put_many(self, kind: str, records: Dict[str, Any]) -> None:
+        """Upsert documents in one transaction; a None value deletes the key."""
+        upserts = [(kind, key, json.dumps(value)) for key, value in records.items() if value is not None]
+        deletes = [(kind, key) for key, value in records.items() if value is None]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO docs (kind, key, data) VALUES (?, ?, ?) ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data",
+                    upserts,
+                )
+                self._conn.executemany("DELETE FROM docs WHERE kind = ? AND key = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+
+class CommitLog:
+    def __init__(
+        self,
+        path: Path,
+        group_commit: bool = PERSIST_GROUP_COMMIT,
+        interval_ms: float = PERSIST_COMMIT_INTERVAL_MS,
+        max_batch: int = PERSIST_COMMIT_MAX_BATCH,
+        checkpoint_bytes: int = PERSIST_CHECKPOINT_BYTES,
+    ):
+        self.path = path
+        self.group_commit = group_commit
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.checkpoint_bytes = checkpoint_bytes
+        self._appliers: Dict[str, Tuple[Callable[[Dict[str, Any]], None], Optional[Callable[[], None]]]] = {}
+        # Records read back from the log, waiting for their kind to be registered
+        self._replay: Dict[str, Dict[str, Any]] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.commits = 0
+        self.writes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._read_back()
+        self._log = open(path, "a", encoding="utf-8")
+        self._log_bytes = self._log.tell()
+
+    def _read_back(self) -> None:
+        if not self.path.exists():
+            return
+        n = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line: that batch was never acknowledged
+                    break
+                self._replay.setdefault(record["k"], {})[record["id"]] = record["v"]
+                n += 1
+        if n:
+            print(f"✓ Replaying {n} writes from {self.path}")
+
+    def register(self, kind: str, apply: Callable[[Dict[str, Any]], None], sync: Optional[Callable[[], None]] = None) -> None:
+        """
+        Route a kind's batches to apply({key: value}); sync() makes applied writes durable
+        (called before the log is truncated). Log records of that kind from before a crash
+        are applied here, so register before loading the kind's state from its store.
+        """
+        with self._lock:
+            self._appliers[kind] = (apply, sync)
+            pending = self._replay.pop(kind, None)
+        if pending:
+            apply(pending)
+
+    def submit(self, kind: str, key: str, value: Any) -> Future:
+        """Queue one write (value must be JSON-serializable; None deletes). Resolves once committed."""
+        future: Future = Future()
+        item = (kind, key, value, future)
+        if not self.group_commit:
+            with self._lock:
+                self._commit([item])
+            return future
+        self._ensure_writer()
+        self._queue.put(item)
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is committed and applied."""
+        if not self.group_commit or self._thread is None:
+            return True
+        future: Future = Future()
+        self._queue.put((_FLUSH, None, None, future))
+        try:
+            future.result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        """Commit what is queued, sync the stores and truncate the log."""
+        if self._thread is not None:
+            self._queue.put((_STOP, None, None, None))
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._checkpoint()
+            self._log.close()
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="commit-log", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch and batch[-1][0] not in (_FLUSH, _STOP):
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1][0] is _STOP
+            markers = [item for item in batch if item[0] in (_FLUSH, _STOP)]
+            writes = [item for item in batch if item[0] not in (_FLUSH, _STOP)]
+            with self._lock:
+                if writes:
+                    self._commit(writes)
+            for _, _, _, future in markers:
+                if future is not None:
+                    future.set_result(True)
+            if stop:
+                return
+
+    def _commit(self, writes: List[tuple]) -> None:
+        """Append a batch to the log with one fsync, acknowledge it, then apply it to the stores."""
+        data = "".join(json.dumps({"k": kind, "id": key, "v": value}, default=str) + "\n" for kind, key, value, _ in writes)
+        try:
+            self._log.write(data)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        except Exception as e:
+            print(f"Commit log write failed ({len(writes)} writes): {e}")
+            for *_, future in writes:
+                future.set_exception(e)
+            return
+        self._log_bytes += len(data)
+        self.commits += 1
+        self.writes += len(writes)
+        for *_, future in writes:
+            future.set_result(True)
+
+        by_kind: Dict[str, Dict[str, Any]] = {}
+        for kind, key, value, _ in writes:
+            by_kind.setdefault(kind, {})[key] = value
+        for kind, records in by_kind.items():
+            if kind not in self._appliers:
+                # Still in the log; applied when the kind registers
+                self._replay.setdefault(kind, {}).update(records)
+                continue
+            self._apply(kind, records)
+        if self._log_bytes >= self.checkpoint_bytes:
+            self._checkpoint()
+
+    def _apply(self, kind: str, records: Dict[str, Any]) -> bool:
+        """
+        Apply a registered kind's records together with any of its earlier writes that failed
+        to apply; a newer value for a key supersedes the failed one, so a retry never puts
+        an old value back.
+        """
+        pending = self._replay.pop(kind, None)
+        if pending:
+            records = {**pending, **records}
+        try:
+            self._appliers[kind][0](records)
+            return True
+        except Exception as e:
+            print(f"Failed to apply {len(records)} {kind} writes (kept in the commit log): {e}")
+            self._replay[kind] = records
+            return False
+
+    def _checkpoint(self) -> None:
+        """Sync every store, then start the log over (keeping records not applied yet)."""
+        for kind in [k for k in self._replay if k in self._appliers]:
+            self._apply(kind, {})
+        try:
+            for _, sync in self._appliers.values():
+                if sync is not None:
+                    sync()
+        except Exception as e:
+            print(f"Checkpoint skipped, a store could not be synced: {e}")
+            return
+        self._log.flush()
+        self._log.truncate(0)
+        self._log_bytes = 0
+        if self._replay:
+            data = "".join(
+                json.dumps({"k": kind, "id": key, "v": value}, default=str) + "\n"
+                for kind, records in self._replay.items() for key, value in records.items()
+            )
+            self._log.write(data)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._log_bytes = len(data)
+
+
+_commit_log: Optional[CommitLog] = None
+_state_store: Optional[StateStore] = None
+_init_lock = threading.Lock()
+
+
+def get_commit_log() -> CommitLog:
+    global _commit_log
+    if _commit_log is None:
+        with _init_lock:
+            if _commit_log is None:
+                _commit_log = CommitLog(COMMIT_LOG_PATH)
+    return _commit_log
+
+
+def get_state_store() -> StateStore:
+    global _state_store
+    if _state_store is None:
+        with _init_lock:
+            if _state_store is None:
+                _state_store = StateStore(STATE_DB_PATH)
+    return _state_store
+
+
+def open_state(kind: str) -> Dict[str, Any]:
+    """Register a state.db kind with the commit log (replaying it after a crash) and load it."""
+    store = get_state_store()
+    get_commit_log().register(kind, lambda records: store.put_many(kind, records), store.checkpoint)
+    return store.load(kind)
+
+
+def persist(kind: str, key: str, value: Any) -> Future:
+    return get_commit_log().submit(kind, key, value)
+
+
+def wait_durable(future: Optional[Future], what: str) -> bool:
+    """Block until a write is committed; False (and a log line) if it failed or timed out."""
+    if future is None:
+        return False
+    try:
+        future.result(DURABLE_WAIT_S)
+        return True
+    except Exception as e:
+        print(f"{what} is not durable yet: {e!r}")
+        return False
+
+
+def shutdown() -> None:
+    """Commit pending writes and checkpoint (server shutdown)."""
+    global _commit_log
+    if _commit_log is not None:
+        _commit_log.close()
+        _commit_log = None
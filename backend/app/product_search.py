@@ -0,0 +1,183 @@
+"""
+Server-side product search for the search page: hybrid ranking (rag_store), the /products
+filters, facet counts and name highlighting in one response.
+The full ranked + filtered list is cached per (query, filters, catalog version), so
+requesting page 2, 3, ... only slices the cached list.
+"""
+import html
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.data_store import load_products, get_product, get_catalog_version
+from app.keyword_index import get_keyword_index, normalize_token, tokenize
+from app.models import Product
+from app.rag_store import search_products_hybrid_debug
+
+# Most results a query ranks (keyword candidates; semantic adds up to 50 more)
+SEARCH_MAX_RESULTS = 1000
+SEARCH_CACHE_SIZE = 256
+PRICE_BUCKETS = [(0, 500), (500, 1000), (1000, 2000), (2000, 5000), (5000, None)]
+RATING_BUCKETS = [4.0, 3.0, 2.0]
+FACET_TOP = 20
+
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _matches(p: Product, filters: Dict[str, Any], skip: Optional[str] = None) -> bool:
+    """True if p passes every filter except the one named skip (for disjunctive facets)."""
+    if skip != "category" and filters.get("category") and p.category != filters["category"]:
+        return False
+    if skip != "price":
+        if filters.get("min_price") is not None and p.price < filters["min_price"]:
+            return False
+        if filters.get("max_price") is not None and p.price > filters["max_price"]:
+            return False
+    if skip != "rating" and filters.get("min_rating") is not None and p.rating < filters["min_rating"]:
+        return False
+    if skip != "color" and filters.get("color"):
+        color = filters["color"].lower()
+        if color not in (c.lower() for c in p.colors):
+            return False
+    return True
+
+
+def _count_top(values: List[str]) -> List[Dict[str, Any]]:
+    counts: Dict[str, int] = {}
+    for v in values:
+        if v:
+            counts[v] = counts.get(v, 0) + 1
+    ranked = sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:FACET_TOP]
+    return [{"value": v, "count": n} for v, n in ranked]
+
+
+def _facets(matched: List[Product], filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Facet counts over the query's matches. Each facet ignores its own filter, so the
+    category facet still lists the other categories after one is selected.
+    """
+    by_category = [p for p in matched if _matches(p, filters, skip="category")]
+    by_color = [p for p in matched if _matches(p, filters, skip="color")]
+    by_price = [p for p in matched if _matches(p, filters, skip="price")]
+    by_rating = [p for p in matched if _matches(p, filters, skip="rating")]
+    brands = [p for p in matched if _matches(p, filters)]
+    price = []
+    for lo, hi in PRICE_BUCKETS:
+        n = sum(1 for p in by_price if p.price >= lo and (hi is None or p.price < hi))
+        if n:
+            price.append({"min": lo, "max": hi, "count": n})
+    return {
+        "category": _count_top([p.category for p in by_category]),
+        "brand": _count_top([p.brand or "" for p in brands]),
+        "color": _count_top([c for p in by_color for c in p.colors]),
+        "price": price,
+        "rating": [
+            {"min": r, "count": sum(1 for p in by_rating if p.rating >= r)}
+            for r in RATING_BUCKETS
+        ],
+    }
+
+
+def highlight(text: str, terms: set) -> str:
+    """HTML-escaped text with words whose normalized token is a query term wrapped in <mark>."""
+    if not terms or not text:
+        return html.escape(text or "")
+    out = []
+    word = []
+
+    def flush():
+        if word:
+            w = "".join(word)
+            token = normalize_token(w.lower())
+            out.append(f"<mark>{html.escape(w)}</mark>" if token in terms else html.escape(w))
+            word.clear()
+
+    for ch in text:
+        if ch.isalnum() or ch == "_":
+            word.append(ch)
+        else:
+            flush()
+            out.append(html.escape(ch))
+    flush()
+    return "".join(out)
+
+
+def _ranked(query: str) -> Tuple[List[Tuple[Product, float, List[str]]], set]:
+    """[(product, score, sources)] best first for query (catalog order when query is empty)."""
+    if not tokenize(query):
+        return [(p, 0.0, []) for p in load_products()], set()
+    terms = set(get_keyword_index().expand_terms(list(dict.fromkeys(tokenize(query)))))
+    hybrid = search_products_hybrid_debug(query, top_k=SEARCH_MAX_RESULTS, keyword_depth=SEARCH_MAX_RESULTS)
+    out = []
+    for r in hybrid["results"]:
+        p = get_product(r["product_id"])
+        if p:
+            out.append((p, r["score"], r["sources"]))
+    return out, terms
+
+
+def _search_uncached(query: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+    ranked, terms = _ranked(query)
+    matched = [p for p, _, _ in ranked]
+    hits = [(p, score, sources) for p, score, sources in ranked if _matches(p, filters)]
+    return {"hits": hits, "facets": _facets(matched, filters), "terms": terms}
+
+
+def search_catalog(
+    query: str = "",
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    color: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 24,
+) -> Dict[str, Any]:
+    """
+    One page of search results with facets.
+    Returns { query, total, page, page_size, pages, results: [{ product, score, sources,
+    highlights: {name, brand} }], facets: { category, brand, color, price, rating } }.
+    """
+    query = " ".join((query or "").split())
+    filters = {
+        "category": category,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_rating": min_rating,
+        "color": color,
+    }
+    key = (query.lower(), tuple(sorted(filters.items())), get_catalog_version())
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+    if entry is None:
+        entry = _search_uncached(query, filters)
+        with _cache_lock:
+            _cache[key] = entry
+            while len(_cache) > SEARCH_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    hits = entry["hits"]
+    terms = entry["terms"]
+    page = max(page, 1)
+    start = (page - 1) * page_size
+    results = []
+    for p, score, sources in hits[start:start + page_size]:
+        results.append({
+            "product": p.model_dump(),
+            "score": round(score, 6),
+            "sources": sources,
+            "highlights": {"name": highlight(p.name, terms), "brand": highlight(p.brand or "", terms)},
+        })
+    return {
+        "query": query,
+        "total": len(hits),
+        "page": page,
+        "page_size": page_size,
+        "pages": math.ceil(len(hits) / page_size) if page_size else 0,
+        "results": results,
+        "facets": entry["facets"],
+    }
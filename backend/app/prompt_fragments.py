@@ -0,0 +1,100 @@
+"""
+Reusable chat prompt fragments.
+Catalog fragments (products grouped by category, the sampled product list, categories)
+are built once per catalog version. Session fragments (session context, cart items and
+summary, user summary) are rebuilt only when the session's events, cart or profile change.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Tuple
+
+from app.data_store import (
+    load_products,
+    get_product,
+    get_categories,
+    get_catalog_version,
+    get_session_context,
+    get_session_version,
+)
+from app.models import Product
+
+# Products per category in the sampled prompt list, and its overall size
+SAMPLE_PER_CATEGORY = 10
+SAMPLE_SIZE = 100
+SESSION_CACHE_MAX = 2000
+
+
+class CatalogFragments(NamedTuple):
+    by_cat: Dict[str, List[Product]]
+    product_list: str
+    categories: List[str]
+
+
+class SessionFragments(NamedTuple):
+    context: dict
+    cart_items: List[Product]
+    cart_total: float
+    cart_summary: str
+    user_context: str
+
+
+_catalog: Tuple[int, CatalogFragments] = (-1, None)
+_sessions: "OrderedDict[str, Tuple[Tuple[int, int], SessionFragments]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _build_catalog_fragments() -> CatalogFragments:
+    products = load_products()
+    by_cat: Dict[str, List[Product]] = {}
+    for p in products:
+        by_cat.setdefault(p.category, []).append(p)
+    sampled = []
+    for cat_products in by_cat.values():
+        sampled.extend(cat_products[:SAMPLE_PER_CATEGORY])
+    sampled = (sampled + products)[:SAMPLE_SIZE]
+    product_list = "\n".join(
+        [f"- {p.id}: {p.name}, ₹{p.price}, {p.category}, {p.rating}⭐" for p in sampled]
+    )
+    return CatalogFragments(by_cat, product_list, get_categories())
+
+
+def get_catalog_fragments() -> CatalogFragments:
+    global _catalog
+    version = get_catalog_version()
+    cached_version, fragments = _catalog
+    if cached_version == version:
+        return fragments
+    with _lock:
+        if _catalog[0] != version:
+            _catalog = (version, _build_catalog_fragments())
+        return _catalog[1]
+
+
+def _build_session_fragments(session_id: str) -> SessionFragments:
+    from app.ai_service import _build_user_summary
+    context = get_session_context(session_id)
+    cart_items = [p for p in (get_product(pid) for pid in context.get("cart_ids", [])) if p]
+    cart_total = sum(p.price for p in cart_items)
+    cart_summary = ""
+    if cart_items:
+        cart_summary = f"Cart ({len(cart_items)} items, ₹{cart_total}): " + ", ".join([f"{p.name} (₹{p.price})" for p in cart_items[:3]])
+        if len(cart_items) > 3:
+            cart_summary += f" +{len(cart_items)-3} more"
+    return SessionFragments(context, cart_items, cart_total, cart_summary, _build_user_summary(context))
+
+
+def get_session_fragments(session_id: str) -> SessionFragments:
+    """Context, cart and user summary for a session; cached until the session changes."""
+    key = (get_session_version(session_id), get_catalog_version())
+    with _lock:
+        cached = _sessions.get(session_id)
+        if cached is not None and cached[0] == key:
+            _sessions.move_to_end(session_id)
+            return cached[1]
+    fragments = _build_session_fragments(session_id)
+    with _lock:
+        _sessions[session_id] = (key, fragments)
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > SESSION_CACHE_MAX:
+            _sessions.popitem(last=False)
+    return fragments
@@ -0,0 +1,164 @@
+"""
+Attribute index for chat quick-order (ai_service._select_products_for_quick_order).
+Built once per catalog version. Products are numbered best-first (rating desc, then cheaper,
+then catalog order), and every attribute value maps to a bitset (a Python int) over those
+numbers. A selection is an AND of bitsets, and the best matches are its lowest set bits,
+so no per-turn filtering of the catalog is needed.
+Category, color and product type match as substrings (as the chat parser expects); gender
+is inferred from the name and tags; sizes come from Product.sizes.
+"""
+import re
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
+
+from app.data_store import load_products, get_catalog_version
+from app.models import Product
+
+# Values the quick-order parser produces, indexed up front (others are indexed on first use)
+QUICK_ORDER_CATEGORIES = ("Footwear", "Clothing", "Accessories", "Electronics")
+QUICK_ORDER_COLORS = ("black", "white", "blue", "red", "green", "gray", "brown", "navy", "beige")
+QUICK_ORDER_TYPES = ("casual", "formal", "sports")
+# Name / tag words that mark a product's gender (unisex products match both)
+GENDER_WORDS = {
+    "men": ("men", "mens", "man", "male", "boys", "boy"),
+    "women": ("women", "womens", "woman", "female", "girls", "girl", "ladies"),
+}
+# Price-sorted products are grouped into blocks with a cumulative bitset each, so a budget
+# bitset is one prefix plus the few products of a single block
+PRICE_BLOCK = 256
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _to_mask(positions, n: int) -> int:
+    """Bitset with the given bit positions set (built as bytes; OR-ing big ints one by one is quadratic)."""
+    buf = bytearray((n + 7) // 8)
+    for i in positions:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _iter_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class QuickOrderIndex:
+    def __init__(self, products: List[Product]):
+        self.ranked = sorted(products, key=lambda p: (-p.rating, p.price))
+        n = len(self.ranked)
+        self._fields = [
+            {
+                "category": (p.category or "").lower(),
+                "name": (p.name or "").lower(),
+                "colors": [c.lower() for c in (p.colors or [])],
+                "tags": " ".join(p.tags or []).lower(),
+            }
+            for p in self.ranked
+        ]
+        self._n = n
+        self.in_stock = _to_mask((i for i, p in enumerate(self.ranked) if getattr(p, "in_stock", True)), n)
+
+        genders: Dict[str, List[int]] = {g: [] for g in GENDER_WORDS}
+        sizes: Dict[str, List[int]] = {}
+        for i, (p, f) in enumerate(zip(self.ranked, self._fields)):
+            words = set(_WORD_RE.findall(f["name"].replace("'s", "s") + " " + f["tags"]))
+            unisex = "unisex" in words
+            for gender, markers in GENDER_WORDS.items():
+                if unisex or words.intersection(markers):
+                    genders[gender].append(i)
+            for s in p.sizes or []:
+                for token in set(_WORD_RE.findall(str(s).lower())):
+                    sizes.setdefault(token, []).append(i)
+        self.gender = {g: _to_mask(positions, n) for g, positions in genders.items()}
+        self.size = {s: _to_mask(positions, n) for s, positions in sizes.items()}
+
+        self._category: Dict[str, int] = {}
+        self._color: Dict[str, int] = {}
+        self._type: Dict[str, int] = {}
+        self._mask_lock = threading.Lock()
+        for c in QUICK_ORDER_CATEGORIES:
+            self.category_mask(c)
+        for c in QUICK_ORDER_COLORS:
+            self.color_mask(c)
+        for t in QUICK_ORDER_TYPES:
+            self.type_mask(t)
+
+        # Price-sorted ranks and cumulative bitsets per block of PRICE_BLOCK products
+        self._by_price = sorted(range(n), key=lambda i: self.ranked[i].price)
+        self._prices = [self.ranked[i].price for i in self._by_price]
+        self._price_prefix = [0]
+        for start in range(0, n, PRICE_BLOCK):
+            self._price_prefix.append(self._price_prefix[-1] | _to_mask(self._by_price[start:start + PRICE_BLOCK], n))
+
+    def _cached_mask(self, cache: Dict[str, int], value: str, match) -> int:
+        mask = cache.get(value)
+        if mask is None:
+            mask = _to_mask((i for i, f in enumerate(self._fields) if match(f)), self._n)
+            with self._mask_lock:
+                cache[value] = mask
+        return mask
+
+    def category_mask(self, category: str) -> int:
+        c = category.lower()
+        return self._cached_mask(self._category, c, lambda f: c in f["category"] or c in f["name"])
+
+    def color_mask(self, color: str) -> int:
+        c = color.lower()
+        return self._cached_mask(self._color, c, lambda f: any(c in x for x in f["colors"]) or c in f["name"])
+
+    def type_mask(self, product_type: str) -> int:
+        t = product_type.lower()
+        return self._cached_mask(self._type, t, lambda f: t in f["name"] or t in f["category"] or t in f["tags"])
+
+    def budget_mask(self, budget_max: float) -> int:
+        """Bitset of products priced at most budget_max."""
+        count = bisect_right(self._prices, budget_max)
+        block = count // PRICE_BLOCK
+        return self._price_prefix[block] | _to_mask(self._by_price[block * PRICE_BLOCK:count], self._n)
+
+    def select(self, attrs: Dict[str, Any], limit: int = 1) -> List[Product]:
+        """
+        Best-first products matching the quick-order attributes: category, color, budget,
+        stock and type must match; gender and size narrow the choice when any product has them.
+        """
+        mask = self.in_stock
+        if attrs.get("category"):
+            mask &= self.category_mask(attrs["category"])
+        if attrs.get("color"):
+            mask &= self.color_mask(attrs["color"])
+        if attrs.get("budget_max") is not None:
+            mask &= self.budget_mask(attrs["budget_max"])
+        if attrs.get("product_type"):
+            mask &= self.type_mask(attrs["product_type"])
+        for preferred in (self.gender.get(attrs.get("gender") or ""), self.size.get(str(attrs.get("size") or ""))):
+            if preferred and mask & preferred:
+                mask &= preferred
+        out: List[Product] = []
+        for i in _iter_bits(mask):
+            out.append(self.ranked[i])
+            if len(out) >= limit:
+                break
+        return out
+
+
+# Index for the loaded catalog, rebuilt when the catalog version changes
+_index: Optional[QuickOrderIndex] = None
+_index_version = -1
+_lock = threading.Lock()
+
+
+def get_quick_order_index() -> QuickOrderIndex:
+    """Return the quick-order index for the current catalog, building it if the catalog changed."""
+    global _index, _index_version
+    version = get_catalog_version()
+    if _index is not None and _index_version == version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = QuickOrderIndex(load_products())
+            _index_version = version
+    return _index
@@ -2,23 +2,34 @@
 RAG vector store: product and FAQ embeddings for semantic search.
 Uses ChromaDB. If ChromaDB is not installed or fails, all functions return empty/safe
 results so the rest of the app keeps working (keyword fallback in ai_service).
+Collections are kept in sync with products.json / faq.json by an incremental background
+sync (content hash per document), so catalog edits never require deleting data/chroma_db.
 """
+import hashlib
 import json
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
-from app.data_store import load_products, get_product
+import numpy as np
+
+from app.config import VECTOR_SEARCH_BACKEND
+from app.data_store import load_products, get_product, get_catalog_version
+from app.embedding_cache import embed_query
+from app.keyword_index import BM25Index, get_keyword_index, tokenize
 from app.models import Product
 
 # Lazy init - avoid import errors if chromadb not installed
 _chroma_client = None
 _products_collection = None
 _faq_collection = None
-_products_indexed = False
-_faq_indexed = False
 _rag_available = None
 
+FAQ_PATH = Path(__file__).resolve().parent.parent / "data" / "faq.json"
+
 def _rag_available_check() -> bool:
     global _rag_available
     if _rag_available is not None:
@@ -57,100 +68,274 @@ def _product_to_document(p: Product) -> str:
     return " ".join(parts).strip()
 
 
+def _get_products_collection():
+    global _products_collection
+    if _products_collection is None:
+        client = _get_client()
+        if client is None:
+            return None
+        try:
+            _products_collection = client.get_or_create_collection(name="aurashop_products", metadata={"description": "products"})
+        except Exception:
+            return None
+    return _products_collection
+
+
+def _get_faq_collection():
+    global _faq_collection
+    if _faq_collection is None:
+        client = _get_client()
+        if client is None:
+            return None
+        try:
+            _faq_collection = client.get_or_create_collection(name="aurashop_faq", metadata={"description": "faq"})
+        except Exception:
+            return None
+    return _faq_collection
+
+
 def _ensure_products_index() -> bool:
-    global _products_collection, _products_indexed
-    if _products_indexed and _products_collection is not None:
-        return True
-    client = _get_client()
-    if client is None:
-        _products_indexed = True
+    """Collection handle for queries; kicks off a background sync if the catalog changed."""
+    if _get_products_collection() is None:
         return False
-    try:
-        name = "aurashop_products"
-        _products_collection = client.get_or_create_collection(name=name, metadata={"description": "products"})
-    except Exception:
-        _products_indexed = True
+    start_background_sync()
+    return True
+
+
+def _ensure_faq_index() -> bool:
+    if not FAQ_PATH.exists() or _get_faq_collection() is None:
         return False
-    products = load_products()
-    if not _products_indexed and products:
+    start_background_sync()
+    return True
+
+
+# ---------- Incremental sync ----------
+# Each Chroma document carries a content_hash in its metadata. A sync upserts only ids whose
+# hash changed (in batches of SYNC_BATCH_SIZE) and deletes ids no longer in the source.
+
+SYNC_BATCH_SIZE = 128
+_SYNC_PAGE_SIZE = 1000
+
+_sync_lock = threading.Lock()
+_sync_thread_lock = threading.Lock()
+_sync_thread: Optional[threading.Thread] = None
+_synced_catalog_version = -1
+_synced_faq_mtime: Optional[float] = None
+_sync_status: Dict[str, Any] = {
+    "state": "idle",
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+    "collections": {},
+}
+
+
+def _content_hash(document: str, metadata: Dict[str, Any]) -> str:
+    payload = json.dumps([document, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _product_items() -> List[Tuple[str, str, Dict[str, Any]]]:
+    return [
+        (p.id, _product_to_document(p), {
+            "product_id": p.id,
+            "name": (p.name or "")[:200],
+            "category": p.category or "",
+            "price": float(p.price),
+            "rating": float(p.rating),
+        })
+        for p in load_products()
+    ]
+
+
+def _faq_items() -> List[Tuple[str, str, Dict[str, Any]]]:
+    try:
+        with open(FAQ_PATH, "r", encoding="utf-8") as f:
+            faq_list = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(faq_list, list):
+        return []
+    items = []
+    for i, item in enumerate(faq_list):
+        q = item.get("q") or item.get("question") or ""
+        a = item.get("a") or item.get("answer") or ""
+        items.append((f"faq_{i}", f"{q} {a}", {"question": q[:300], "answer": a[:500]}))
+    return items
+
+
+def _stored_hashes(collection) -> Dict[str, str]:
+    """id -> content_hash for everything currently in the collection (paged)."""
+    out: Dict[str, str] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=_SYNC_PAGE_SIZE, offset=offset)
+        ids = page.get("ids") or []
+        metadatas = page.get("metadatas") or [None] * len(ids)
+        for pid, meta in zip(ids, metadatas):
+            out[pid] = (meta or {}).get("content_hash", "")
+        if len(ids) < _SYNC_PAGE_SIZE:
+            return out
+        offset += len(ids)
+
+
+def _sync_collection(name: str, collection, items: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+    progress = {"total": len(items), "unchanged": 0, "to_upsert": 0, "upserted": 0, "to_delete": 0, "deleted": 0, "done": False}
+    _sync_status["collections"][name] = progress
+    stored = _stored_hashes(collection)
+    changed = []
+    for item_id, document, metadata in items:
+        h = _content_hash(document, metadata)
+        if stored.get(item_id) == h:
+            progress["unchanged"] += 1
+        else:
+            changed.append((item_id, document, {**metadata, "content_hash": h}))
+    wanted = {item_id for item_id, _, _ in items}
+    removed = [item_id for item_id in stored if item_id not in wanted]
+    progress["to_upsert"] = len(changed)
+    progress["to_delete"] = len(removed)
+    for i in range(0, len(changed), SYNC_BATCH_SIZE):
+        batch = changed[i:i + SYNC_BATCH_SIZE]
+        collection.upsert(
+            ids=[b[0] for b in batch],
+            documents=[b[1] for b in batch],
+            metadatas=[b[2] for b in batch],
+        )
+        progress["upserted"] += len(batch)
+    for i in range(0, len(removed), SYNC_BATCH_SIZE):
+        batch = removed[i:i + SYNC_BATCH_SIZE]
+        collection.delete(ids=batch)
+        progress["deleted"] += len(batch)
+    progress["done"] = True
+
+
+def _faq_mtime() -> Optional[float]:
+    try:
+        return FAQ_PATH.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _source_versions() -> Tuple[int, Optional[float]]:
+    return get_catalog_version(), _faq_mtime()
+
+
+def _sync_needed() -> bool:
+    return (_synced_catalog_version, _synced_faq_mtime) != _source_versions()
+
+
+def sync_collections() -> Dict[str, Any]:
+    """Bring the product and FAQ collections in line with products.json / faq.json (blocking)."""
+    global _synced_catalog_version, _synced_faq_mtime
+    with _sync_lock:
+        version, faq_mtime = _source_versions()
+        _sync_status.update(
+            state="running",
+            started_at=datetime.utcnow().isoformat(),
+            finished_at=None,
+            error=None,
+            attempted=(version, faq_mtime),
+            collections={},
+        )
         try:
-            count = _products_collection.count()
-            if count == 0:
-                ids = []
-                documents = []
-                metadatas = []
-                for p in products:
-                    ids.append(p.id)
-                    documents.append(_product_to_document(p))
-                    metadatas.append({
-                        "product_id": p.id,
-                        "name": (p.name or "")[:200],
-                        "category": p.category,
-                        "price": float(p.price),
-                        "rating": float(p.rating),
-                    })
-                _products_collection.add(ids=ids, documents=documents, metadatas=metadatas)
-        except Exception:
-            pass
-        _products_indexed = True
-    return _products_collection is not None
+            products = _get_products_collection()
+            if products is not None:
+                _sync_collection("products", products, _product_items())
+            faq = _get_faq_collection() if faq_mtime is not None else None
+            if faq is not None:
+                _sync_collection("faq", faq, _faq_items())
+            _synced_catalog_version = version
+            _synced_faq_mtime = faq_mtime
+            _sync_status["state"] = "done"
+        except Exception as e:
+            _sync_status.update(state="error", error=str(e))
+        _sync_status["finished_at"] = datetime.utcnow().isoformat()
+    return get_sync_status()
 
 
-def _ensure_faq_index() -> bool:
-    global _faq_collection, _faq_indexed
-    if _faq_indexed and _faq_collection is not None:
-        return True
-    FAQ_PATH = Path(__file__).resolve().parent.parent / "data" / "faq.json"
-    if not FAQ_PATH.exists():
-        _faq_indexed = True
+def start_background_sync(force: bool = False) -> bool:
+    """Run sync_collections on a daemon thread unless one is running or nothing changed."""
+    global _sync_thread
+    if not _rag_available_check():
         return False
-    client = _get_client()
-    if client is None:
-        _faq_indexed = True
+    if _sync_thread is not None and _sync_thread.is_alive():
         return False
-    try:
-        name = "aurashop_faq"
-        _faq_collection = client.get_or_create_collection(name=name, metadata={"description": "faq"})
-    except Exception:
-        _faq_indexed = True
+    if not force and not _sync_needed():
         return False
-    try:
-        count = _faq_collection.count()
-        if count == 0:
-            with open(FAQ_PATH, "r", encoding="utf-8") as f:
-                faq_list = json.load(f)
-            if not isinstance(faq_list, list):
-                faq_list = []
-            ids_faq = []
-            documents_faq = []
-            metadatas_faq = []
-            for i, item in enumerate(faq_list):
-                q = item.get("q") or item.get("question") or ""
-                a = item.get("a") or item.get("answer") or ""
-                doc = f"{q} {a}"
-                ids_faq.append(f"faq_{i}")
-                documents_faq.append(doc)
-                metadatas_faq.append({"question": q[:300], "answer": a[:500]})
-            if ids_faq:
-                _faq_collection.add(ids=ids_faq, documents=documents_faq, metadatas=metadatas_faq)
-    except Exception:
-        pass
-    _faq_indexed = True
-    return _faq_collection is not None
+    # A failed sync is retried automatically only once the source changes again
+    if not force and _sync_status["state"] == "error" and _sync_status.get("attempted") == _source_versions():
+        return False
+    with _sync_thread_lock:
+        if _sync_thread is not None and _sync_thread.is_alive():
+            return False
+        _sync_thread = threading.Thread(target=sync_collections, name="chroma-sync", daemon=True)
+        _sync_thread.start()
+    return True
+
+
+def get_sync_status() -> Dict[str, Any]:
+    """Progress of the last / current sync: state, timestamps, per-collection counts."""
+    status = dict(_sync_status)
+    status["collections"] = {name: dict(c) for name, c in _sync_status["collections"].items()}
+    return status
 
 
-def search_products_semantic(query: str, top_k: int = 15) -> List[Dict[str, Any]]:
-    """Semantic search over products. Returns list of { product_id, distance, metadata }. Empty on error."""
+def _query_input(query: str, query_embedding: Optional[np.ndarray]) -> Dict[str, Any]:
+    """Chroma query argument: a cached embedding when available, raw text otherwise."""
+    if query_embedding is None:
+        try:
+            query_embedding = embed_query(query)
+        except Exception:
+            return {"query_texts": [query]}
+    return {"query_embeddings": [np.asarray(query_embedding, dtype=np.float32).tolist()]}
+
+
+def _chroma_where(category: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> Optional[Dict[str, Any]]:
+    clauses: List[Dict[str, Any]] = []
+    if category is not None:
+        clauses.append({"category": category})
+    if min_price is not None:
+        clauses.append({"price": {"$gte": float(min_price)}})
+    if max_price is not None:
+        clauses.append({"price": {"$lte": float(max_price)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def search_products_semantic(
+    query: str,
+    top_k: int = 15,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    query_embedding: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Semantic search over products, optionally pre-filtered by category / price range.
+    Returns list of { product_id, distance, metadata }. Empty on error.
+    Served by Chroma unless VECTOR_SEARCH_BACKEND opts in to the in-process vector index
+    ("auto" or "numpy"). Pass query_embedding to skip embedding.
+    """
+    if VECTOR_SEARCH_BACKEND != "chroma":
+        from app.vector_index import search_vectors
+        hits = search_vectors(
+            query, top_k=top_k, category=category, min_price=min_price, max_price=max_price,
+            query_embedding=query_embedding,
+        )
+        if hits is not None or VECTOR_SEARCH_BACKEND == "numpy":
+            return hits or []
     if not _rag_available_check():
         return []
     try:
-        _ensure_products_index()
-        if _products_collection is None:
+        if not _ensure_products_index():
             return []
+        where = _chroma_where(category, min_price, max_price)
         results = _products_collection.query(
-            query_texts=[query],
+            **_query_input(query, query_embedding),
             n_results=min(top_k, 50),
             include=["metadatas", "distances"],
+            **({"where": where} if where else {}),
         )
         if not results or not results.get("ids") or not results["ids"][0]:
             return []
@@ -165,50 +350,102 @@ def search_products_semantic(query: str, top_k: int = 15) -> List[Dict[str, Any]
 
 
 def search_products_keyword(query: str, products: Optional[List[Product]] = None, top_k: int = 15) -> List[str]:
-    """Keyword match on name, category, tags. Returns list of product_ids."""
+    """Keyword match on name, brand, category, tags (BM25). Returns list of product_ids."""
+    catalog = load_products()
     if products is None:
-        products = load_products()
-    words = re.findall(r"\w+", query.lower())
-    if not words:
+        products = catalog
+    if not tokenize(query):
         return [p.id for p in products[:top_k]]
-    scored = []
-    for p in products:
-        text = f"{p.name} {p.category} {' '.join(p.tags)}".lower()
-        score = sum(1 for w in words if w in text)
-        if score > 0:
-            scored.append((p.id, score))
-    scored.sort(key=lambda x: -x[1])
-    return [pid for pid, _ in scored[:top_k]]
+    if products is catalog:
+        return [pid for pid, _ in get_keyword_index().search(query, top_k=top_k)]
+    if all(get_product(p.id) is p for p in products):
+        # A subset of the catalog: score just its products in the prebuilt index
+        return [pid for pid, _ in get_keyword_index().search(query, top_k=top_k, candidates=[p.id for p in products])]
+    # Products that are not (or no longer) in the catalog get a throwaway index
+    return [pid for pid, _ in BM25Index(products).search(query, top_k=top_k)]
 
 
-def search_products_hybrid(query: str, top_k: int = 15) -> List[Dict[str, Any]]:
-    """Merge semantic + keyword results, dedupe, return up to top_k."""
-    semantic = search_products_semantic(query, top_k=top_k)
-    keyword_ids = search_products_keyword(query, top_k=top_k)
-    seen = set()
-    out = []
-    for s in semantic:
+# Reciprocal rank fusion: score(d) = sum over retrievers of 1 / (RRF_K + rank)
+RRF_K = 60
+# Each retriever returns this many candidates per requested result before fusion
+HYBRID_CANDIDATE_FACTOR = 2
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+
+def _timed(fn, *args, **kwargs) -> Tuple[Any, float, Optional[str]]:
+    t = time.perf_counter()
+    try:
+        result, error = fn(*args, **kwargs), None
+    except Exception as e:
+        result, error = [], str(e)
+    return result, (time.perf_counter() - t) * 1000, error
+
+
+def search_products_hybrid_debug(query: str, top_k: int = 15, keyword_depth: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Semantic and keyword retrieval run concurrently, fused with reciprocal rank fusion.
+    Returns { results, retrievers: {semantic, keyword}, timings_ms } where each result is
+    { product_id, score, distance, metadata, sources } and each retriever lists its
+    ranked hits with native scores. keyword_depth lets callers that page through long
+    result lists take more BM25 candidates than the semantic side's 50.
+    """
+    t0 = time.perf_counter()
+    depth = min(max(top_k, 1) * HYBRID_CANDIDATE_FACTOR, 50)
+    semantic_future = _search_pool.submit(_timed, search_products_semantic, query, depth)
+    keyword_future = _search_pool.submit(_timed, lambda: get_keyword_index().search(query, top_k=keyword_depth or depth))
+    semantic, semantic_ms, semantic_error = semantic_future.result()
+    keyword, keyword_ms, keyword_error = keyword_future.result()
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for rank, s in enumerate(semantic, start=1):
         pid = s.get("product_id") or s.get("id")
-        if pid and pid not in seen:
-            seen.add(pid)
-            out.append({"product_id": pid, "distance": s.get("distance", 0), "metadata": s.get("metadata", {})})
-    for kid in keyword_ids:
-        if kid not in seen and len(out) < top_k:
-            seen.add(kid)
-            out.append({"product_id": kid, "distance": 999, "metadata": {}})
-    return out[:top_k]
+        if not pid:
+            continue
+        entry = fused.setdefault(pid, {"product_id": pid, "score": 0.0, "distance": None, "metadata": {}, "sources": []})
+        entry["score"] += 1.0 / (RRF_K + rank)
+        entry["distance"] = s.get("distance")
+        entry["metadata"] = s.get("metadata", {})
+        entry["sources"].append("semantic")
+    for rank, (pid, _) in enumerate(keyword, start=1):
+        entry = fused.setdefault(pid, {"product_id": pid, "score": 0.0, "distance": None, "metadata": {}, "sources": []})
+        entry["score"] += 1.0 / (RRF_K + rank)
+        entry["sources"].append("keyword")
+    results = sorted(fused.values(), key=lambda e: -e["score"])[:top_k]
+
+    return {
+        "results": results,
+        "retrievers": {
+            "semantic": {
+                "hits": [{"product_id": s.get("product_id"), "rank": i, "distance": s.get("distance")} for i, s in enumerate(semantic, start=1)],
+                "error": semantic_error,
+            },
+            "keyword": {
+                "hits": [{"product_id": pid, "rank": i, "score": round(score, 4)} for i, (pid, score) in enumerate(keyword, start=1)],
+                "error": keyword_error,
+            },
+        },
+        "timings_ms": {
+            "semantic": round(semantic_ms, 2),
+            "keyword": round(keyword_ms, 2),
+            "total": round((time.perf_counter() - t0) * 1000, 2),
+        },
+    }
+
+
+def search_products_hybrid(query: str, top_k: int = 15) -> List[Dict[str, Any]]:
+    """Semantic + keyword results fused by reciprocal rank; up to top_k { product_id, score, distance, metadata, sources }."""
+    return search_products_hybrid_debug(query, top_k=top_k)["results"]
 
 
-def search_faq(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+def search_faq(query: str, top_k: int = 3, query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
     """Semantic search over FAQ. Returns list of { question, answer, distance }. Empty on error."""
     if not _rag_available_check():
         return []
     try:
-        _ensure_faq_index()
-        if _faq_collection is None:
+        if not _ensure_faq_index():
             return []
         results = _faq_collection.query(
-            query_texts=[query],
+            **_query_input(query, query_embedding),
             n_results=min(top_k, 10),
             include=["metadatas", "distances"],
         )
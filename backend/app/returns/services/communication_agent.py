@@ -6,6 +6,7 @@ import json
 import logging
 from typing import Optional
 from openai import OpenAI
+from app.llm_gateway import BACKGROUND, chat_completion, llm_available
 from app.returns.schemas import CommunicationAgentOutput, ResolutionAgentOutput
 from app.returns.config import settings
 
@@ -62,8 +63,10 @@ class CommunicationAgent:
     
     @classmethod
     def is_available(cls) -> bool:
-        """Check if GPT-4o is available (API key is set)."""
-        return settings.openai_api_key is not None and settings.openai_api_key.strip() != ""
+        """Check if GPT-4o is available (API key is set and the model's circuit breaker is closed)."""
+        if not settings.openai_api_key or not settings.openai_api_key.strip():
+            return False
+        return llm_available("gpt-4o")
     
     @staticmethod
     @track(name="communication_agent_generate", type="llm", project_name=settings.opik_project_name if OPIK_AVAILABLE else None, flush=True)
@@ -180,7 +183,9 @@ class CommunicationAgent:
                             f"{decision_guidance}"
                         )
                         
-                        response = client.chat.completions.create(
+                        response = chat_completion(
+                            client=client,
+                            lane=BACKGROUND,
                             model="gpt-4o",  # Use gpt-4o explicitly
                             messages=[
                                 {"role": "system", "content": system_prompt},
@@ -2,18 +2,23 @@
 Embedding service for semantic similarity calculations.
 Model is lazy-loaded on first use to avoid slow startup and reload issues.
 """
+import threading
 import numpy as np
 from typing import List
 
 # Lazy singleton: avoid loading SentenceTransformer at import time (prevents
 # slow startup and asyncio.CancelledError during uvicorn --reload).
 _embedding_service_instance = None
+# Startup warm-up and first requests may race to load the model; load it once
+_embedding_service_lock = threading.Lock()
 
 
 def get_embedding_service() -> "EmbeddingService":
     global _embedding_service_instance
     if _embedding_service_instance is None:
-        _embedding_service_instance = EmbeddingService()
+        with _embedding_service_lock:
+            if _embedding_service_instance is None:
+                _embedding_service_instance = EmbeddingService()
     return _embedding_service_instance
 
 
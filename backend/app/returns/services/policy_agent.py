@@ -6,9 +6,11 @@ import json
 import logging
 from typing import List, Tuple, Optional
 from app.chroma_client import get_chroma_client
+from app.embedding_cache import embed_query
 from app.returns.schemas import PolicyAgentOutput, VisionAgentOutput
 from app.returns.config import settings
 from openai import OpenAI
+from app.llm_gateway import BACKGROUND, chat_completion, llm_available
 
 # Import OPIK tracking if available
 try:
@@ -65,8 +67,10 @@ class PolicyAgent:
     
     @classmethod
     def is_available(cls) -> bool:
-        """Check if GPT-4o is available (API key is set)."""
-        return settings.openai_api_key is not None and settings.openai_api_key.strip() != ""
+        """Check if GPT-4o is available (API key is set and the model's circuit breaker is closed)."""
+        if not settings.openai_api_key or not settings.openai_api_key.strip():
+            return False
+        return llm_available(settings.openai_model)
     
     @staticmethod
     def match_policy(
@@ -96,16 +100,25 @@ class PolicyAgent:
         
         chroma_client = get_chroma_client()
         
+        # Embed once (shared cache); both lookups reuse the vector
+        try:
+            query_embedding = embed_query(query_text)
+        except Exception as e:
+            logger.warning(f"[PolicyAgent] Query embedding unavailable, Chroma will embed: {e}")
+            query_embedding = None
+        
         policy_matches = chroma_client.get_cosine_similarity_scores(
             query_text=query_text,
             product_category=product_category,
-            n_results=n_results
+            n_results=n_results,
+            query_embedding=query_embedding
         )
         
         policy_details = chroma_client.query_policies(
             query_text=query_text,
             product_category=product_category,
-            n_results=n_results
+            n_results=n_results,
+            query_embedding=query_embedding
         )
         
         matched_policy_ids = [match[0] for match in policy_matches]
@@ -242,7 +255,9 @@ Be precise: If policies say damage is NOT covered, the decision is REJECT. If po
 
             logger.info("[PolicyAgent] Calling GPT-4o for multi-policy synthesis and interpretation")
             
-            response = client.chat.completions.create(
+            response = chat_completion(
+                client=client,
+                lane=BACKGROUND,
                 model=settings.openai_model,
                 messages=[
                     {
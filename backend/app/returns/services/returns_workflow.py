@@ -16,7 +16,8 @@ from app.returns.services.vision_agent import VisionAgent
 from app.returns.services.policy_agent import PolicyAgent
 from app.returns.services.resolution_agent import ResolutionAgent
 from app.returns.services.communication_agent import CommunicationAgent
-from app.returns.services.embedding_service import get_embedding_service
+from app.returns.services.embedding_service import EmbeddingService
+from app.embedding_cache import embed_queries
 from app.returns.config import settings
 
 # Set up logger
@@ -360,11 +361,9 @@ def description_comparison_node(state: ReturnProcessingState) -> ReturnProcessin
         user_description = return_data.description
         openai_description = vision_output.image_description
         
-        # Use embedding similarity only (no GPT-4o); lazy-load model on first use
-        embedding_svc = get_embedding_service()
-        user_embedding = embedding_svc.embed_text(user_description)
-        openai_embedding = embedding_svc.embed_text(openai_description)
-        similarity = embedding_svc.cosine_similarity(user_embedding, openai_embedding)
+        # Use embedding similarity only (no GPT-4o); both texts embedded in one cached batch
+        user_embedding, openai_embedding = embed_queries([user_description, openai_description])
+        similarity = EmbeddingService.cosine_similarity(user_embedding, openai_embedding)
         similarity = max(0.0, min(1.0, similarity))
         
         logger.info(f"[Description Comparison] Similarity: {similarity:.2%}")
@@ -7,6 +7,7 @@ import os
 import logging
 from typing import List, Optional, Dict
 from openai import OpenAI
+from app.llm_gateway import BACKGROUND, chat_completion, llm_available
 from app.returns.schemas import VisionAgentOutput
 from app.returns.config import settings
 
@@ -63,8 +64,10 @@ class VisionAgent:
     
     @classmethod
     def is_available(cls) -> bool:
-        """Check if GPT-4o Vision is available (API key is set)."""
-        return settings.openai_api_key is not None and settings.openai_api_key.strip() != ""
+        """Check if GPT-4o Vision is available (API key is set and the model's circuit breaker is closed)."""
+        if not settings.openai_api_key or not settings.openai_api_key.strip():
+            return False
+        return llm_available("gpt-4o")
     
     @staticmethod
     @track(name="vision_agent_analyze", type="llm", project_name=settings.opik_project_name if OPIK_AVAILABLE else None, flush=True)
@@ -213,7 +216,9 @@ class VisionAgent:
             ]
             
             logger.info(f"[OpenAI API] Sending request to GPT-4o Vision API...")
-            response = client.chat.completions.create(
+            response = chat_completion(
+                client=client,
+                lane=BACKGROUND,
                 model="gpt-4o",  # Use gpt-4o explicitly for vision
                 messages=messages,
                 max_tokens=500,
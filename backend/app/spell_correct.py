@@ -0,0 +1,103 @@
+"""
+Typo tolerance for keyword search: SymSpell-style symmetric deletion dictionary.
+Every vocabulary word is indexed under its deletion variants (up to MAX_EDIT_DISTANCE
+deletes of its first PREFIX_LENGTH characters), so a misspelled query token is corrected
+by generating its own deletes and looking them up - no scan over the vocabulary.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+MAX_EDIT_DISTANCE = 2
+# Only the first N characters generate deletes; bounds memory for long words
+PREFIX_LENGTH = 7
+# Tokens shorter than this are never corrected (too ambiguous)
+MIN_CORRECTABLE_LENGTH = 4
+
+
+def max_distance_for(term: str) -> int:
+    """Allowed edits grow with word length: 1 for 4-5 chars, 2 beyond."""
+    if len(term) < MIN_CORRECTABLE_LENGTH:
+        return 0
+    return 1 if len(term) <= 5 else MAX_EDIT_DISTANCE
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal-string-alignment distance (Levenshtein + adjacent transposition).
+    Returns max_distance + 1 as soon as the distance is known to exceed the bound.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+
+class SymSpell:
+    """Deletion dictionary over a word -> frequency vocabulary."""
+
+    def __init__(self, vocabulary: Dict[str, int]):
+        self.vocabulary = {w: f for w, f in vocabulary.items() if w.isalpha()}
+        self.deletes: Dict[str, List[str]] = {}
+        for word in self.vocabulary:
+            for d in _deletes(word[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                self.deletes.setdefault(d, []).append(word)
+
+    def lookup(self, term: str, max_distance: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Candidate corrections for term: [(word, distance, frequency)] sorted by
+        distance then frequency. Exact vocabulary hits return distance 0.
+        """
+        if term in self.vocabulary:
+            return [(term, 0, self.vocabulary[term])]
+        if max_distance is None:
+            max_distance = max_distance_for(term)
+        if max_distance <= 0 or not term.isalpha():
+            return []
+        prefix = term[:PREFIX_LENGTH]
+        found: Dict[str, int] = {}
+        for d in _deletes(prefix, max_distance):
+            for word in self.deletes.get(d, ()):
+                if word in found:
+                    continue
+                found[word] = edit_distance(term, word, max_distance)
+        out = [(w, dist, self.vocabulary[w]) for w, dist in found.items() if dist <= max_distance]
+        out.sort(key=lambda x: (x[1], -x[2], x[0]))
+        return out
+
+    def correct(self, term: str, max_candidates: int = 2) -> List[str]:
+        """Closest vocabulary words for term (all at the best distance, most frequent first)."""
+        candidates = self.lookup(term)
+        if not candidates:
+            return []
+        best = candidates[0][1]
+        return [w for w, dist, _ in candidates if dist == best][:max_candidates]
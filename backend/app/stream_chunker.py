@@ -0,0 +1,129 @@
+"""
+Adaptive chunking of streamed chat events (ai_service.achat_stream) for the wire.
+LLM deltas are often a single token; sending each as its own SSE frame means thousands of
+tiny writes per response. coalesce_events merges consecutive {"content": ...} deltas and
+flushes when the oldest buffered delta is CHAT_STREAM_FLUSH_MS old, the buffer reaches
+CHAT_STREAM_FLUSH_BYTES, or a delta ends a sentence. The first delta goes out at once so
+time to first token is unchanged, and every other event (the done event with product_ids
+and actions) passes through as is, after any buffered text. While the model is silent
+for CHAT_STREAM_HEARTBEAT_S it yields None, which sse_frames turns into a comment line
+that keeps proxies from timing out the connection (clients ignore lines without "data:").
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+import anyio
+
+from app.config import CHAT_STREAM_FLUSH_BYTES, CHAT_STREAM_FLUSH_MS, CHAT_STREAM_HEARTBEAT_S
+
+SENTENCE_ENDS = (".", "!", "?", "\n")
+# Events the producer may run ahead of a slow consumer
+_QUEUE_SIZE = 256
+_END = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def coalesce_events(
+    events: AsyncIterator[dict],
+    flush_ms: float = CHAT_STREAM_FLUSH_MS,
+    flush_bytes: int = CHAT_STREAM_FLUSH_BYTES,
+    heartbeat_s: float = CHAT_STREAM_HEARTBEAT_S,
+) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield events with content deltas merged, and None as a heartbeat during long pauses.
+    flush_ms=0 passes every delta through on its own. If the consumer stops early, the
+    source generator is cancelled (achat_stream then closes the upstream LLM stream).
+    """
+    loop = asyncio.get_running_loop()
+    window = flush_ms / 1000.0
+    queue: asyncio.Queue = asyncio.Queue(_QUEUE_SIZE)
+
+    async def produce():
+        # The source runs in one task for its whole life (its async context managers
+        # must enter and exit in the same task); the consumer waits on the queue.
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(_Failed(e))
+            return
+        finally:
+            # Cancelled while waiting on a full queue, the source is parked at a yield:
+            # close it here or its upstream stream stays open until garbage collection.
+            await events.aclose()
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    parts = []
+    size = 0
+    held_since = 0.0
+    first = True
+    last_sent = loop.time()
+    try:
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                deadline = held_since + window if parts else last_sent + heartbeat_s
+                try:
+                    # asyncio.timeout_at arms a timer on this task (wait_for would start a task per wait)
+                    async with asyncio.timeout_at(deadline):
+                        item = await queue.get()
+                except TimeoutError:
+                    if parts:
+                        yield {"content": "".join(parts)}
+                        parts, size = [], 0
+                    else:
+                        yield None
+                    last_sent = loop.time()
+                    continue
+
+            if isinstance(item, dict) and item.keys() == {"content"}:
+                delta = item["content"]
+                if not parts:
+                    held_since = loop.time()
+                parts.append(delta)
+                size += len(delta.encode("utf-8"))
+                if first or window <= 0 or size >= flush_bytes or delta.rstrip(" ").endswith(SENTENCE_ENDS):
+                    first = False
+                    yield {"content": "".join(parts)}
+                    parts, size = [], 0
+                    last_sent = loop.time()
+                continue
+
+            if parts:
+                yield {"content": "".join(parts)}
+                parts, size = [], 0
+            if item is _END:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+            last_sent = loop.time()
+    finally:
+        if not producer.done():
+            producer.cancel()
+            # Let the source close its upstream stream. Shielded, and through asyncio.wait
+            # rather than `await producer`: a cancellation of this task (which Starlette
+            # repeats until the response task exits) would otherwise be forwarded to the
+            # producer and interrupt that cleanup.
+            with anyio.CancelScope(shield=True):
+                await asyncio.wait([producer])
+
+
+async def sse_frames(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """SSE wire format for coalesce_events: data frames plus heartbeat comments."""
+    chunks = coalesce_events(events)
+    try:
+        async for event in chunks:
+            if event is None:
+                yield ": ping\n\n"
+            else:
+                yield f"data: {json.dumps(event)}\n\n"
+    finally:
+        await chunks.aclose()
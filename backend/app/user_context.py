@@ -0,0 +1,109 @@
+"""
+Per-user context snapshot for chat and recommendations: profile, recent orders, order
+categories and wallet summary. Cached until the user's orders, wallet or profile change
+(order_service / wallet_service call touch_user) and at most USER_SNAPSHOT_TTL seconds,
+since wallet points expire with time. Cart contents are per session and come from
+prompt_fragments.get_session_fragments, which cart mutations invalidate.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from app.data_store import get_product, get_catalog_version
+
+# Wallet points expire by the clock, so snapshots are rebuilt at least this often
+USER_SNAPSHOT_TTL = 60.0
+USER_CACHE_MAX = 5000
+
+_user_versions: Dict[str, int] = {}
+
+
+class UserSnapshot(NamedTuple):
+    profile: object  # Optional[UserProfile]
+    profile_name: str
+    profile_address: Optional[str]
+    orders: list  # List[Order], newest first
+    orders_info: List[dict]  # latest 3, as shown to the LLM
+    order_categories: List[str]
+    wallet_info: dict
+
+
+_snapshots: "OrderedDict[str, tuple]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def touch_user(user_id: str) -> None:
+    """Call after any change to the user's orders, wallet or profile."""
+    if user_id:
+        with _lock:
+            _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+
+
+def get_user_version(user_id: str) -> int:
+    return _user_versions.get(user_id, 0)
+
+
+def _build_snapshot(user_id: str) -> UserSnapshot:
+    from app.order_service import get_user_orders, get_user_profile
+    from app.wallet_service import get_wallet_summary
+
+    profile = None
+    profile_name = "there"
+    profile_address = None
+    try:
+        profile = get_user_profile(user_id)
+        if profile and profile.name:
+            profile_name = profile.name
+        if profile and getattr(profile, "addresses", None):
+            addrs = profile.addresses if isinstance(profile.addresses, list) else []
+            if addrs:
+                profile_address = addrs[0]
+    except Exception:
+        pass
+
+    orders = []
+    orders_info = []
+    order_categories: List[str] = []
+    try:
+        orders = get_user_orders(user_id)
+        for order in orders[:3]:
+            orders_info.append({
+                "id": order.id, "total": order.total, "status": order.status.value,
+                "items_count": len(order.items)
+            })
+        for o in orders[:20]:
+            for item in getattr(o, "items", []) or []:
+                pid = getattr(item, "product_id", None)
+                p = get_product(pid) if pid else None
+                if p and p.category and p.category not in order_categories:
+                    order_categories.append(p.category)
+    except Exception:
+        pass
+
+    wallet_info = {"balance": 0, "pending_points": 0, "total_earned": 0}
+    try:
+        ws = get_wallet_summary(user_id)
+        wallet_info = {**wallet_info, **{k: ws.get(k, 0) for k in ["balance", "pending_points", "total_earned", "expiring_soon"]}}
+    except Exception:
+        pass
+
+    return UserSnapshot(profile, profile_name, profile_address, orders, orders_info, order_categories[:10], wallet_info)
+
+
+def get_user_snapshot(user_id: str) -> UserSnapshot:
+    """Snapshot of the user's profile, orders and wallet; a dict lookup while nothing changed."""
+    key = (get_user_version(user_id), get_catalog_version())
+    now = time.monotonic()
+    with _lock:
+        cached = _snapshots.get(user_id)
+        if cached is not None and cached[0] == key and now - cached[1] < USER_SNAPSHOT_TTL:
+            _snapshots.move_to_end(user_id)
+            return cached[2]
+    snapshot = _build_snapshot(user_id)
+    with _lock:
+        _snapshots[user_id] = (key, now, snapshot)
+        _snapshots.move_to_end(user_id)
+        while len(_snapshots) > USER_CACHE_MAX:
+            _snapshots.popitem(last=False)
+    return snapshot
@@ -0,0 +1,378 @@
+"""
+In-process vector index for semantic product search.
+Product embeddings (all-MiniLM-L6-v2 via EmbeddingService) are computed once per catalog,
+saved under data/vector_index/ as .npy and memory-mapped back; a query is one dot product
+over the normalized matrix, optionally pre-filtered by category and price.
+Catalogs of VECTOR_HNSW_MIN_SIZE products or more are served from an HNSW graph instead
+(when hnswlib is installed). Opt-in via VECTOR_SEARCH_BACKEND=auto or numpy (Chroma
+serves semantic search by default). If sentence-transformers is missing,
+get_vector_index() returns None and rag_store falls back to Chroma.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import VECTOR_HNSW_MIN_SIZE, VECTOR_INDEX_DTYPE
+from app.data_store import get_catalog_version, get_product, load_products
+from app.embedding_cache import embed_query
+from app.models import Product
+from app.rag_store import _product_to_document
+
+INDEX_DIR = Path(__file__).resolve().parent.parent / "data" / "vector_index"
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 256
+# int8 rows are widened to float32 this many at a time when scoring
+SCORE_BLOCK_ROWS = 4096
+# HNSW search breadth: ef = max(HNSW_EF_MIN, HNSW_EF_FACTOR * k)
+HNSW_EF_MIN = 64
+HNSW_EF_FACTOR = 4
+
+
+def catalog_fingerprint(ids: Sequence[str], documents: Sequence[str]) -> str:
+    """Content hash of the embedded text; a stored index is reused only if it matches."""
+    h = hashlib.sha1(MODEL_NAME.encode("utf-8"))
+    for pid, doc in zip(ids, documents):
+        h.update(pid.encode("utf-8"))
+        h.update(b"\0")
+        h.update(doc.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: row ~= q * scale."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.round(matrix / scales[:, None]).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def _write_atomic(path: Path, write: Callable[[Any], None]) -> None:
+    """Write through a temp file and rename over path, so readers see the old or the new file."""
+    # A unique temp name: several workers may save the same index at once
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False) as f:
+        try:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+class VectorIndex:
+    """
+    Row i of vectors is the unit-length embedding of ids[i] (int8 rows carry a scale).
+    Category and price arrays are aligned with rows so filters are numpy masks.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        categories: List[str],
+        prices: Sequence[float],
+        scales: Optional[np.ndarray] = None,
+        fingerprint: str = "",
+    ):
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.scales = scales
+        self.fingerprint = fingerprint
+        self.category_names = sorted(set(categories))
+        code_of = {c: i for i, c in enumerate(self.category_names)}
+        self.category_codes = np.fromiter((code_of[c] for c in categories), dtype=np.int32, count=len(categories))
+        self.prices = np.asarray(prices, dtype=np.float32)
+        self._hnsw = None
+        if len(self.ids) >= VECTOR_HNSW_MIN_SIZE:
+            self._hnsw = _build_hnsw(self._float_rows(None))
+
+    @classmethod
+    def build(
+        cls,
+        products: List[Product],
+        embed: Callable[[List[str]], np.ndarray],
+        dtype: str = "float32",
+    ) -> "VectorIndex":
+        ids = [p.id for p in products]
+        documents = [_product_to_document(p) for p in products]
+        chunks = [embed(documents[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(documents), EMBED_BATCH_SIZE)]
+        matrix = _normalize_rows(np.vstack(chunks)) if chunks else np.zeros((0, 0), dtype=np.float32)
+        scales = None
+        if dtype == "int8" and len(matrix):
+            matrix, scales = _quantize(matrix)
+        return cls(
+            ids,
+            matrix,
+            [p.category or "" for p in products],
+            [float(p.price) for p in products],
+            scales=scales,
+            fingerprint=catalog_fingerprint(ids, documents),
+        )
+
+    def save(self, directory: Path = INDEX_DIR) -> None:
+        """
+        Array files are named after the fingerprint and dtype and never rewritten in place:
+        a live index (or one another thread just loaded) may be memory-mapping the previous
+        ones. Each file is written to a temp name, synced and renamed; meta.json, which names
+        the files to load, is replaced last, then arrays it no longer names are removed.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.fingerprint[:16]}-{self.vectors.dtype}"
+        files = {"vectors_file": f"vectors-{stem}.npy"}
+        if self.scales is not None:
+            files["scales_file"] = f"scales-{stem}.npy"
+        _write_atomic(directory / files["vectors_file"], lambda f: np.save(f, np.asarray(self.vectors)))
+        if self.scales is not None:
+            _write_atomic(directory / files["scales_file"], lambda f: np.save(f, self.scales))
+        meta = {
+            "model": MODEL_NAME,
+            "dtype": str(self.vectors.dtype),
+            "fingerprint": self.fingerprint,
+            **files,
+            "ids": self.ids,
+            "categories": [self.category_names[c] for c in self.category_codes],
+            "prices": self.prices.tolist(),
+        }
+        _write_atomic(directory / "meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        for path in directory.glob("*.npy"):
+            if path.name not in files.values():
+                try:
+                    # Unlinking leaves existing memory maps of the file valid
+                    path.unlink()
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, directory: Path = INDEX_DIR) -> Optional["VectorIndex"]:
+        """Memory-map a saved index; None if missing or inconsistent."""
+        try:
+            with open(directory / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(directory / meta.get("vectors_file", "vectors.npy"), mmap_mode="r")
+            scales = None
+            if vectors.dtype == np.int8:
+                scales = np.load(directory / meta.get("scales_file", "scales.npy"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("model") != MODEL_NAME or len(meta.get("ids", [])) != vectors.shape[0]:
+            return None
+        if scales is not None and len(scales) != vectors.shape[0]:
+            return None
+        return cls(meta["ids"], vectors, meta["categories"], meta["prices"], scales=scales, fingerprint=meta["fingerprint"])
+
+    def _float_rows(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        mat = self.vectors if rows is None else self.vectors[rows]
+        if self.scales is None:
+            return np.asarray(mat, dtype=np.float32)
+        scales = self.scales if rows is None else self.scales[rows]
+        return mat.astype(np.float32) * scales[:, None]
+
+    def filter_rows(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Optional[np.ndarray]:
+        """Row numbers passing the metadata filters, or None when no filter is set."""
+        if category is None and min_price is None and max_price is None:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        if category is not None:
+            try:
+                mask &= self.category_codes == self.category_names.index(category)
+            except ValueError:
+                return np.zeros(0, dtype=np.int64)
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        return np.flatnonzero(mask)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 15,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """[(row, cosine similarity)] best first."""
+        if top_k <= 0 or not self.ids:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(q))
+        if norm == 0:
+            return []
+        q = q / norm
+        rows = self.filter_rows(category, min_price, max_price)
+        if rows is not None and len(rows) == 0:
+            return []
+        # Selective filters are cheaper to scan exactly than to walk the graph with a filter
+        if self._hnsw is not None and (rows is None or len(rows) >= VECTOR_HNSW_MIN_SIZE):
+            return self._search_hnsw(q, top_k, rows)
+        scores = self._scores(q, rows)
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in best]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def _scores(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        mat = self.vectors if rows is None else self.vectors[rows]
+        if self.scales is None:
+            return mat @ q
+        # int8 @ float32 has no BLAS path; widen block by block instead of all at once
+        scores = np.empty(len(mat), dtype=np.float32)
+        for i in range(0, len(mat), SCORE_BLOCK_ROWS):
+            scores[i:i + SCORE_BLOCK_ROWS] = mat[i:i + SCORE_BLOCK_ROWS].astype(np.float32) @ q
+        return scores * (self.scales if rows is None else self.scales[rows])
+
+    def _search_hnsw(self, q: np.ndarray, top_k: int, rows: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        k = min(top_k, len(self.ids) if rows is None else len(rows))
+        self._hnsw.set_ef(max(HNSW_EF_MIN, HNSW_EF_FACTOR * k))
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[rows] = True
+        labels, distances = self._hnsw.knn_query(
+            q, k=k, filter=(lambda label: bool(allowed[label])) if allowed is not None else None
+        )
+        # hnswlib "ip" space reports 1 - dot
+        return [(int(label), 1.0 - float(d)) for label, d in zip(labels[0], distances[0])]
+
+
+def _build_hnsw(matrix: np.ndarray):
+    try:
+        import hnswlib
+    except Exception:
+        return None
+    index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+    index.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+    index.add_items(matrix, np.arange(len(matrix)))
+    return index
+
+
+_embeddings_available: Optional[bool] = None
+
+
+def embeddings_available() -> bool:
+    global _embeddings_available
+    if _embeddings_available is None:
+        try:
+            import sentence_transformers  # noqa: F401
+            _embeddings_available = True
+        except Exception:
+            _embeddings_available = False
+    return _embeddings_available
+
+
+def _embed_documents(documents: List[str]) -> np.ndarray:
+    from app.returns.services.embedding_service import get_embedding_service
+    return get_embedding_service().embed_texts(documents)
+
+
+# Index for the loaded catalog, reloaded / rebuilt when the catalog version changes
+_index: Optional[VectorIndex] = None
+_index_version = -1
+_lock = threading.Lock()
+# Catalog version whose build last failed, when, and how long to wait before trying again
+_failed_version = -1
+_failed_at = 0.0
+_retry_after = 0.0
+BUILD_RETRY_MIN_S = 60.0
+BUILD_RETRY_MAX_S = 3600.0
+
+
+def _load_or_build(products: List[Product]) -> VectorIndex:
+    ids = [p.id for p in products]
+    fingerprint = catalog_fingerprint(ids, [_product_to_document(p) for p in products])
+    stored = VectorIndex.load()
+    if stored is not None and stored.fingerprint == fingerprint and str(stored.vectors.dtype) == VECTOR_INDEX_DTYPE:
+        return stored
+    index = VectorIndex.build(products, _embed_documents, dtype=VECTOR_INDEX_DTYPE)
+    try:
+        index.save()
+    except OSError:
+        pass
+    return index
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """
+    Vector index for the current catalog; None if embeddings are unavailable or the build
+    failed. A failed build is not retried for that catalog version until the backoff
+    (BUILD_RETRY_MIN_S, doubling up to BUILD_RETRY_MAX_S) has passed, so semantic queries
+    don't re-embed the catalog in the request path after every failure.
+    """
+    global _index, _index_version, _failed_version, _failed_at, _retry_after
+    if not embeddings_available():
+        return None
+    version = get_catalog_version()
+    if _index is not None and _index_version == version:
+        return _index
+    if _failed_version == version and time.monotonic() - _failed_at < _retry_after:
+        return None
+    with _lock:
+        if _index is None or _index_version != version:
+            if _failed_version == version and time.monotonic() - _failed_at < _retry_after:
+                return None
+            try:
+                index = _load_or_build(load_products())
+            except Exception as e:
+                _retry_after = min(_retry_after * 2, BUILD_RETRY_MAX_S) if _failed_version == version else BUILD_RETRY_MIN_S
+                _failed_version, _failed_at = version, time.monotonic()
+                print(f"Vector index build failed for catalog version {version} (retry in {_retry_after:.0f}s): {e}")
+                return None
+            _index, _index_version = index, version
+    return _index
+
+
+def search_vectors(
+    query: str,
+    top_k: int = 15,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    query_embedding: Optional[np.ndarray] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Semantic product search in-process. Same shape as rag_store.search_products_semantic:
+    [{ product_id, distance, metadata }], distance being squared L2 between unit vectors
+    (as Chroma reports it). None when the index is unavailable.
+    """
+    index = get_vector_index()
+    if index is None:
+        return None
+    try:
+        if query_embedding is None:
+            query_embedding = embed_query(query)
+        hits = index.search(query_embedding, top_k, category=category, min_price=min_price, max_price=max_price)
+    except Exception:
+        return None
+    out = []
+    for row, similarity in hits:
+        pid = index.ids[row]
+        p = get_product(pid)
+        meta = {"product_id": pid}
+        if p:
+            meta.update({"name": (p.name or "")[:200], "category": p.category, "price": float(p.price), "rating": float(p.rating)})
+        out.append({"product_id": pid, "distance": max(0.0, 2.0 - 2.0 * similarity), "metadata": meta})
+    return out
@@ -2,15 +2,22 @@
 Aura Wallet Service - AuraPoints rewards system.
 Customers earn 5-7% AuraPoints on purchases, valid for 1 month.
 Spin wheel / scratch reward after order: 0, 1, 2, 3, or 10 points (weighted).
+Wallets live in memory and are persisted through the group-commit log (state.db); top-ups
+and payments wait for their commit, reward bookkeeping is write-behind.
 """
 import random
+import threading
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from app.models import Wallet, WalletTransaction
+from app.persistence import open_state, persist, wait_durable
+from app.user_context import touch_user
 
-# In-memory wallet storage
+# In-memory wallet storage (loaded from the store on first access)
 _wallets: Dict[str, Wallet] = {}
+_wallets_loaded = False
+_load_lock = threading.Lock()
 
 # Orders that already used their spin (one spin per order)
 _spin_used_order_ids: set = set()
@@ -25,8 +32,42 @@ AURAPOINTS_THRESHOLD = 1000  # Threshold for higher points
 AURAPOINTS_VALIDITY_DAYS = 30  # 1 month validity
 
 
+def _load_wallets() -> None:
+    global _wallets_loaded
+    if _wallets_loaded:
+        return
+    with _load_lock:
+        if _wallets_loaded:
+            return
+        try:
+            for user_id, data in open_state("wallet").items():
+                _wallets[user_id] = Wallet(**data)
+            _spin_used_order_ids.update(open_state("spin_used"))
+            _revoked_order_ids.update(open_state("rewards_revoked"))
+        except Exception as e:
+            print(f"Wallet store unavailable, wallets are kept in memory only: {e}")
+        _wallets_loaded = True
+
+
+def _save_wallet(wallet: Wallet):
+    """Queue the wallet for the next group commit; returns the commit future."""
+    try:
+        return persist("wallet", wallet.user_id, wallet.model_dump(mode="json"))
+    except Exception as e:
+        print(f"Failed to save wallet for {wallet.user_id}: {e}")
+        return None
+
+
+def _save_flag(kind: str, order_id: str) -> None:
+    try:
+        persist(kind, order_id, True)
+    except Exception as e:
+        print(f"Failed to save {kind} for order {order_id}: {e}")
+
+
 def get_wallet(user_id: str) -> Wallet:
     """Get or create wallet for user."""
+    _load_wallets()
     if user_id not in _wallets:
         _wallets[user_id] = Wallet(
             user_id=user_id,
@@ -66,6 +107,8 @@ def _clean_expired_cashback(user_id: str):
     if expired_amount > 0:
         wallet.balance = max(0, wallet.balance - expired_amount)
         _wallets[user_id] = wallet
+        _save_wallet(wallet)
+        touch_user(user_id)
 
 
 def calculate_cashback(order_total: float) -> float:
@@ -110,12 +153,15 @@ def add_pending_points(user_id: str, order_id: str, order_total: float) -> Walle
     # Don't add to balance yet (pending)
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    _save_wallet(wallet)
+    touch_user(user_id)
     
     return transaction
 
 
 def activate_pending_points(order_id: str) -> Optional[WalletTransaction]:
     """Activate pending AuraPoints when order is delivered."""
+    _load_wallets()
     # Find the pending transaction for this order
     for user_id, wallet in _wallets.items():
         for txn in wallet.transactions:
@@ -125,6 +171,8 @@ def activate_pending_points(order_id: str) -> Optional[WalletTransaction]:
                 wallet.balance += txn.amount
                 wallet.total_earned += txn.amount
                 _wallets[user_id] = wallet
+                _save_wallet(wallet)
+                touch_user(user_id)
                 return txn
     return None
 
@@ -163,6 +211,8 @@ def add_cashback(user_id: str, order_id: str, order_total: float) -> WalletTrans
     wallet.total_earned += points_amount
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    _save_wallet(wallet)
+    touch_user(user_id)
     
     return transaction
 
@@ -190,6 +240,9 @@ def deduct_from_wallet(user_id: str, amount: float, order_id: str) -> Optional[W
     wallet.total_spent += amount
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    committed = _save_wallet(wallet)
+    touch_user(user_id)
+    wait_durable(committed, f"Wallet payment for order {order_id}")
     
     return transaction
 
@@ -215,6 +268,8 @@ def add_refund(user_id: str, order_id: str, amount: float) -> WalletTransaction:
     wallet.total_earned += amount
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    _save_wallet(wallet)
+    touch_user(user_id)
     
     return transaction
 
@@ -240,6 +295,9 @@ def add_money_to_wallet(user_id: str, amount: float, payment_method: str = "razo
     wallet.total_earned += amount
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    committed = _save_wallet(wallet)
+    touch_user(user_id)
+    wait_durable(committed, f"Wallet top-up for {user_id}")
     
     return transaction
 
@@ -306,6 +364,7 @@ def spin_wheel_result() -> int:
 
 def is_spin_used(order_id: str) -> bool:
     """Check if this order already used its spin."""
+    _load_wallets()
     return order_id in _spin_used_order_ids
 
 
@@ -314,9 +373,11 @@ def add_spin_reward(user_id: str, order_id: str, points_won: int) -> Optional[Wa
     Credit spin wheel / scratch reward to wallet. One spin per order.
     Returns transaction if credited, None if points_won is 0 or already used.
     """
+    _load_wallets()
     if order_id in _spin_used_order_ids:
         return None
     _spin_used_order_ids.add(order_id)
+    _save_flag("spin_used", order_id)
 
     if points_won <= 0:
         return None
@@ -341,6 +402,8 @@ def add_spin_reward(user_id: str, order_id: str, points_won: int) -> Optional[Wa
     wallet.total_earned += points_won
     wallet.transactions.append(transaction)
     _wallets[user_id] = wallet
+    _save_wallet(wallet)
+    touch_user(user_id)
 
     return transaction
 
@@ -352,6 +415,7 @@ def revoke_order_rewards(user_id: str, order_id: str) -> float:
     - AuraPoints (delivery cashback, pending or already activated)
     Returns the total amount revoked. Idempotent: only revokes once per order.
     """
+    _load_wallets()
     if order_id in _revoked_order_ids:
         return 0.0
     wallet = get_wallet(user_id)
@@ -367,6 +431,9 @@ def revoke_order_rewards(user_id: str, order_id: str) -> float:
             txn.status = "cancelled"
     if total_revoke <= 0:
         _revoked_order_ids.add(order_id)
+        _save_flag("rewards_revoked", order_id)
+        _save_wallet(wallet)
+        touch_user(user_id)
         return 0.0
     now = datetime.utcnow()
     revoke_txn = WalletTransaction(
@@ -383,5 +450,8 @@ def revoke_order_rewards(user_id: str, order_id: str) -> float:
     wallet.balance = max(0.0, wallet.balance - total_revoke)
     wallet.transactions.append(revoke_txn)
     _wallets[user_id] = wallet
+    _save_wallet(wallet)
+    touch_user(user_id)
     _revoked_order_ids.add(order_id)
+    _save_flag("rewards_revoked", order_id)
     return total_revoke
@@ -0,0 +1,132 @@
+"""
+Startup warm-up of the lazily initialized subsystems (catalog indexes, Chroma, the
+embedding model, the policy collection, the returns workflow, store stock).
+run_warmup() is started from the lifespan handler and warms every subsystem
+concurrently on worker threads; get_readiness() backs the /ready endpoint.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.config import VECTOR_SEARCH_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+class Unavailable(Exception):
+    """Subsystem's optional dependency is not installed; counts as done, not failed."""
+
+
+def _warm_catalog() -> None:
+    from app.data_store import load_products
+    from app.fallback_index import get_fallback_index
+    from app.keyword_index import get_keyword_index
+    from app.quick_order_index import get_quick_order_index
+    if not load_products():
+        raise RuntimeError("catalog is empty")
+    get_keyword_index().speller()
+    get_fallback_index()
+    get_quick_order_index()
+
+
+def _warm_rag_collections() -> None:
+    from app import rag_store
+    if not rag_store._rag_available_check():
+        raise Unavailable("chromadb not installed")
+    if rag_store._get_products_collection() is None:
+        raise RuntimeError("Chroma client unavailable")
+    rag_store._get_faq_collection()
+    rag_store.start_background_sync()
+
+
+def _warm_embeddings() -> None:
+    from app.embedding_cache import embed_query
+    try:
+        embed_query("warm up")
+    except ImportError as e:
+        raise Unavailable(str(e))
+
+
+def _warm_vector_index() -> None:
+    from app.vector_index import embeddings_available, get_vector_index
+    if VECTOR_SEARCH_BACKEND == "chroma" or not embeddings_available():
+        raise Unavailable("in-process vector search disabled")
+    if get_vector_index() is None:
+        raise RuntimeError("vector index build failed")
+
+
+def _warm_policy_collection() -> None:
+    try:
+        from app.chroma_client import get_chroma_client
+    except ImportError as e:
+        raise Unavailable(str(e))
+    if get_chroma_client().collection is None:
+        raise RuntimeError("policy collection unavailable")
+
+
+def _warm_returns_workflow() -> None:
+    try:
+        import app.returns.services.returns_workflow  # noqa: F401  (compiles the graph on import)
+    except ImportError as e:
+        raise Unavailable(str(e))
+
+
+def _warm_store_stock() -> None:
+    from app.order_service import get_store_stock
+    get_store_stock()
+
+
+# (name, warm function, required for readiness)
+WARMUPS: List[Tuple[str, Callable[[], None], bool]] = [
+    ("catalog", _warm_catalog, True),
+    ("store_stock", _warm_store_stock, True),
+    ("rag_collections", _warm_rag_collections, False),
+    ("embeddings", _warm_embeddings, False),
+    ("vector_index", _warm_vector_index, False),
+    ("policy_collection", _warm_policy_collection, False),
+    ("returns_workflow", _warm_returns_workflow, False),
+]
+
+_status: Dict[str, Dict[str, Any]] = {
+    name: {"state": "pending", "required": required, "seconds": None, "error": None}
+    for name, _, required in WARMUPS
+}
+
+
+def _run(name: str, fn: Callable[[], None]) -> None:
+    entry = _status[name]
+    entry["state"] = "running"
+    t = time.perf_counter()
+    try:
+        fn()
+        entry["state"] = "ready"
+    except Unavailable as e:
+        entry.update(state="unavailable", error=str(e))
+    except Exception as e:
+        entry.update(state="failed", error=str(e))
+    entry["seconds"] = round(time.perf_counter() - t, 3)
+    logger.info("[warmup] %s %s in %.2fs%s", name, entry["state"], entry["seconds"],
+                f" ({entry['error']})" if entry["error"] else "")
+
+
+async def run_warmup() -> None:
+    """Warm every subsystem concurrently; never raises."""
+    t = time.perf_counter()
+    await asyncio.gather(
+        *(asyncio.to_thread(_run, name, fn) for name, fn, _ in WARMUPS),
+        return_exceptions=True,
+    )
+    logger.info("[warmup] finished in %.2fs", time.perf_counter() - t)
+
+
+def get_readiness() -> Dict[str, Any]:
+    """
+    ready once every subsystem has finished warming and the required ones succeeded.
+    Optional subsystems that failed or are not installed don't block traffic (their
+    callers already degrade), but they are reported.
+    """
+    subsystems = {name: dict(entry) for name, entry in _status.items()}
+    finished = all(e["state"] not in ("pending", "running") for e in subsystems.values())
+    required_ok = all(e["state"] == "ready" for e in subsystems.values() if e["required"])
+    return {"ready": finished and required_ok, "subsystems": subsystems}
@@ -0,0 +1,84 @@
+"""
+Benchmark the frequently-bought-together engine on a synthetic order history.
+Run from backend: python scripts/bench_cart_suggestions.py [--orders 1000000]
+Generates skewed baskets over a synthetic catalog (with planted co-purchase pairs),
+feeds them incrementally into AssociationRules, then times cart scoring.
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cart_suggestions import AssociationRules
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    product_ids = [f"P{i:05d}" for i in range(args.products)]
+    category_of = {pid: f"C{rng.randrange(args.categories):02d}" for pid in product_ids}
+    # Zipf-like popularity so a few products dominate, as in real order logs
+    weights = [1.0 / (rank + 1) ** 0.9 for rank in range(args.products)]
+    cum_weights = list(itertools.accumulate(weights))
+    # Planted "bought together" partners: each product has one strong companion
+    partner = {pid: rng.choice(product_ids) for pid in product_ids}
+
+    print(f"Generating and indexing {args.orders:,} orders over {args.products:,} products...")
+    rules = AssociationRules()
+    t0 = time.perf_counter()
+    batch = 10_000
+    done = 0
+    while done < args.orders:
+        n = min(batch, args.orders - done)
+        seeds = rng.choices(product_ids, cum_weights=cum_weights, k=n)
+        for first in seeds:
+            size = 1 + min(int(rng.expovariate(0.6)), 7)
+            basket = [first]
+            if rng.random() < 0.5:
+                basket.append(partner[first])
+            while len(basket) < size:
+                basket.append(rng.choices(product_ids, cum_weights=cum_weights, k=1)[0])
+            rules.add_basket([(pid, category_of[pid]) for pid in basket])
+        done += n
+    build_s = time.perf_counter() - t0
+    stats = rules.stats()
+    print(f"  indexed in {build_s:.1f}s ({args.orders / build_s:,.0f} orders/s, "
+          f"{build_s / args.orders * 1e6:.1f} us/order)")
+    print(f"  {stats}")
+
+    latencies = []
+    hits = 0
+    for _ in range(args.queries):
+        cart = rng.choices(product_ids, cum_weights=cum_weights, k=rng.randint(1, 4))
+        t = time.perf_counter()
+        ranked = rules.score_cart(cart, limit=6)
+        latencies.append((time.perf_counter() - t) * 1e6)
+        if any(r["product_id"] == partner[cart[0]] for r in ranked):
+            hits += 1
+    print(f"Cart scoring over {args.queries:,} carts:")
+    print(f"  p50 {percentile(latencies, 50):.0f} us | p95 {percentile(latencies, 95):.0f} us | "
+          f"p99 {percentile(latencies, 99):.0f} us")
+    print(f"  planted partner of first cart item in top 6: {hits / args.queries:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Prompt size and time-to-first-token for long conversations, with and without history
+compaction (app/chat_history.py).
+Run from backend: python scripts/bench_chat_history.py [--turns 10 40 80] [--prefill-tokens-per-s 5000] [--reply-scale 1]
+Starts scripts/fake_openai_server.py with a prefill rate so TTFT grows with prompt size.
+"before" is the previous behaviour (the last 8 history messages verbatim, no token cap);
+"after" is what /chat/stream now sends.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+MESSAGE = "tell me something nice about your store"
+USER_TURNS = [
+    "I'm looking for running shoes under 4000, something light for daily 5k runs.",
+    "Do you have those in white? Also what about a matching track jacket?",
+    "Which of these has the best rating and how long is delivery to Pune?",
+    "Compare the first two for me, I care about cushioning more than looks.",
+]
+ASSISTANT_TURN = (
+    "Great choice! Here are a few options that fit your budget. **P00012** is a lightweight "
+    "mesh runner at ₹3,499 with a 4.5⭐ rating, ideal for daily 5k runs. **P00045** adds extra "
+    "cushioning and costs ₹3,899, rated 4.3⭐. If you want a matching jacket, **P00107** is a "
+    "breathable track jacket at ₹1,999. Delivery usually takes 3-5 business days, and returns "
+    "are free within 30 days. Want me to add any of these to your cart or show similar items?"
+)
+
+
+def make_history(turns: int, reply_scale: int = 1):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": USER_TURNS[i % len(USER_TURNS)]})
+        history.append({"role": "assistant", "content": " ".join([ASSISTANT_TURN] * reply_scale)})
+    return history
+
+
+async def ttft(client, messages, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        stream = await client.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                samples.append(time.perf_counter() - t)
+                break
+        await stream.close()
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+async def run(args, fake_url):
+    from openai import AsyncOpenAI
+    from app.ai_service import _prepare_stream_turn
+    from app.chat_history import build_history_messages, count_message_tokens, count_tokens, _encoding
+
+    client = AsyncOpenAI(api_key="sk-fake", base_url=f"{fake_url}/v1")
+    print(f"tokenizer: {'tiktoken o200k_base' if _encoding is not None else 'local estimate'}; "
+          f"fake prefill {args.prefill_tokens_per_s:.0f} tokens/s; assistant replies x{args.reply_scale}")
+    print(f"{'turns':>6} | {'before tokens':>13} {'TTFT ms':>8} | {'after tokens':>12} {'TTFT ms':>8} | {'history build':>13}")
+    for turns in args.turns:
+        history = make_history(turns, args.reply_scale)
+        session_id = f"bench-history-{turns}"
+        turn = _prepare_stream_turn(session_id, MESSAGE, history, None)
+        after = turn["messages"]
+        before = [after[0]] + [{"role": h["role"], "content": h["content"]} for h in history[-8:]] + [after[-1]]
+        # Incremental summary: one more exchange after the cached call
+        t = time.perf_counter()
+        build_history_messages(session_id, history + make_history(turns + 1, args.reply_scale)[-2:])
+        incremental_us = (time.perf_counter() - t) * 1e6
+        before_ms = await ttft(client, before, args.runs)
+        after_ms = await ttft(client, after, args.runs)
+        print(f"{turns:>6} | {count_message_tokens(before):>13} {before_ms:>8.0f} | "
+              f"{count_message_tokens(after):>12} {after_ms:>8.0f} | {incremental_us:>10.0f} us")
+    await client.close()
+    print(f"(system prompt alone: {count_tokens(after[0]['content'])} tokens)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[2, 10, 40, 80])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--fake-port", type=int, default=8902)
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=5000)
+    parser.add_argument("--reply-scale", type=int, default=1, help="Repeat each assistant reply this many times (long answers)")
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    os.environ.update(OPENAI_API_KEY="sk-fake", OPENAI_BASE_URL=f"{fake_url}/v1", USE_BUILTIN_CHAT="")
+    proc = subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(args.fake_port),
+        "--first-token-delay", "0.05", "--prefill-tokens-per-s", str(args.prefill_tokens_per_s),
+    ])
+    try:
+        import httpx
+        for _ in range(100):
+            try:
+                httpx.get(f"{fake_url}/stats")
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        asyncio.run(run(args, fake_url))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
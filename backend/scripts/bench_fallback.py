@@ -0,0 +1,131 @@
+"""
+Benchmark the rule-based chat fallback's product lookups: per-message sorts and scans
+(previous _intelligent_fallback) vs the precomputed fallback index.
+Run from backend: python scripts/bench_fallback.py [--products 50000]
+The catalog is scaled up by cloning data/products.json with fresh IDs.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data_store import load_products
+from app.fallback_index import FallbackIndex, SEARCH_KEYWORDS
+
+MESSAGES = [
+    "show me trending products",
+    "best shoes under 1000",
+    "find a watch under 500",
+    "anything under 200",
+    "jeans or shirt below 800",
+    "footwear under 300",
+    "add to cart alisha solid women's cycling shorts",
+    "hello",
+]
+BUDGET_RE = re.compile(r'under\s+₹?(\d+)|below\s+₹?(\d+)|<\s*₹?(\d+)')
+TRENDING_WORDS = ['trending', 'popular', 'best', 'top', 'recommend', 'suggest', 'find', 'search', 'show', 'look for', 'get me']
+
+
+def _budget(msg):
+    m = BUDGET_RE.search(msg)
+    return int(m.group(1) or m.group(2) or m.group(3)) if m else None
+
+
+def old_lookup(msg, products, by_cat):
+    """Product selection of the previous _intelligent_fallback."""
+    if "add to cart" in msg:
+        return next((p for p in products if p.name.lower() in msg or p.id.lower() in msg), None)
+    budget = _budget(msg)
+    matching_category = next((cat for cat in by_cat if cat.lower() in msg), None)
+    search_terms = [w for w in SEARCH_KEYWORDS if w in msg]
+    if any(w in msg for w in TRENDING_WORDS):
+        sorted_products = sorted(products, key=lambda p: (-p.rating, -p.price))[:30]
+        if budget:
+            sorted_products = [p for p in sorted_products if p.price <= budget]
+        if matching_category:
+            sorted_products = [p for p in sorted_products if p.category == matching_category]
+        if sorted_products[:4]:
+            return sorted_products[:4]
+    if matching_category or search_terms or budget:
+        results = products
+        if matching_category:
+            results = by_cat.get(matching_category, [])
+        elif search_terms:
+            results = [p for p in products if any(t in p.name.lower() or t in p.category.lower() for t in search_terms)]
+        if budget:
+            results = [p for p in results if p.price <= budget]
+        return sorted(results, key=lambda p: (-p.rating, p.price))[:4]
+    return sorted(products, key=lambda p: (-p.rating, -p.price))[:4]
+
+
+def new_lookup(msg, index):
+    """Same selection through the fallback index."""
+    if "add to cart" in msg:
+        return index.find_mentioned(msg)
+    budget = _budget(msg)
+    matching_category = index.match_category(msg)
+    search_terms = [w for w in SEARCH_KEYWORDS if w in msg]
+    if any(w in msg for w in TRENDING_WORDS):
+        sorted_products = index.trending
+        if budget:
+            sorted_products = [p for p in sorted_products if p.price <= budget]
+        if matching_category:
+            sorted_products = [p for p in sorted_products if p.category == matching_category]
+        if sorted_products[:4]:
+            return sorted_products[:4]
+    if matching_category or search_terms or budget:
+        if matching_category:
+            return index.by_category[matching_category].top(4, budget or None)
+        if search_terms:
+            return index.top_for_keywords(search_terms, 4, budget or None)
+        return index.all.top(4, budget or None)
+    return index.trending[:4]
+
+
+def scaled_catalog(n):
+    base = load_products()
+    return [base[i % len(base)].model_copy(update={"id": f"X{i:06d}"}) for i in range(n)] if n > len(base) else base
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        for msg in MESSAGES:
+            t = time.perf_counter()
+            fn(msg)
+            samples.append((time.perf_counter() - t) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=0, help="Scale the catalog to this many products")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products = scaled_catalog(args.products)
+    by_cat = {}
+    for p in products:
+        by_cat.setdefault(p.category, []).append(p)
+    t = time.perf_counter()
+    index = FallbackIndex(products)
+    print(f"{len(products)} products, index built in {(time.perf_counter() - t) * 1000:.0f} ms")
+
+    def ids(r):
+        return [p.id for p in r] if isinstance(r, list) else (r.id if r else None)
+
+    mismatches = [m for m in MESSAGES if ids(old_lookup(m, products, by_cat)) != ids(new_lookup(m, index))]
+    print(f"results identical for {len(MESSAGES) - len(mismatches)}/{len(MESSAGES)} messages" + (f" (differ: {mismatches})" if mismatches else ""))
+
+    old_p50, old_p99 = timed(lambda m: old_lookup(m, products, by_cat), max(1, args.repeat // 4))
+    new_p50, new_p99 = timed(lambda m: new_lookup(m, index), args.repeat)
+    print(f"per-message scans   p50 {old_p50:10.1f} us | p99 {old_p99:10.1f} us")
+    print(f"fallback index      p50 {new_p50:10.1f} us | p99 {new_p99:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark checkout throughput with group commit on and off (PERSIST_GROUP_COMMIT).
+Run from backend: python scripts/bench_group_commit.py [--threads 40] [--orders 4000] [--fsync-ms 0]
+Each run places orders from --threads threads (FastAPI's default threadpool size) through
+order_service.create_order, which also credits pending AuraPoints; every fifth checkout
+marks a coupon as used. Off, every write is committed with its own fsync in the request
+thread; on, one writer thread commits whatever has queued. --fsync-ms adds a sleep to
+every fsync to stand in for a slower disk than this machine's. Each mode runs in its own
+process against a temporary data directory.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, os, sys, threading, time
+fsync_ms = float(sys.argv[3])
+if fsync_ms:
+    real_fsync = os.fsync
+    def fsync(fd):
+        real_fsync(fd)
+        time.sleep(fsync_ms / 1000)
+    os.fsync = fsync
+from app import coupon_service, order_service
+from app.models import DeliveryMethod, OrderItem
+from app.persistence import get_commit_log
+
+threads, orders = int(sys.argv[1]), int(sys.argv[2])
+order_service.create_order("warmup", [OrderItem(product_id="P00001", price=10)], DeliveryMethod.HOME_DELIVERY, delivery_address="x")
+log = get_commit_log()
+log.flush()
+commits0, writes0 = log.commits, log.writes
+latencies = []
+counter = iter(range(orders))
+
+def worker():
+    for i in counter:
+        user_id = f"user{i % 2000}"
+        t = time.perf_counter()
+        order_service.create_order(user_id, [OrderItem(product_id="P00001", price=100 + i % 50)], DeliveryMethod.HOME_DELIVERY, delivery_address="x")
+        if i % 5 == 0:
+            coupon_service.mark_coupon_used(user_id, "WELCOME10")
+        latencies.append(time.perf_counter() - t)
+
+t0 = time.perf_counter()
+pool = [threading.Thread(target=worker) for _ in range(threads)]
+for t in pool:
+    t.start()
+for t in pool:
+    t.join()
+elapsed = time.perf_counter() - t0
+log.flush()
+latencies.sort()
+print(json.dumps({
+    "orders_per_s": len(latencies) / elapsed,
+    "p50_ms": latencies[len(latencies) // 2] * 1000,
+    "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    "commits": log.commits - commits0,
+    "writes": log.writes - writes0,
+}))
+"""
+
+
+def run(args, group_commit):
+    with tempfile.TemporaryDirectory(prefix="aurashop-commit-") as data_dir:
+        env = {
+            **os.environ,
+            "ORDERS_FILE": str(Path(data_dir) / "orders.json"),
+            "PERSIST_GROUP_COMMIT": "1" if group_commit else "0",
+            "PYTHONPATH": str(BACKEND_DIR),
+        }
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, str(args.threads), str(args.orders), str(args.fsync_ms)],
+            cwd=str(BACKEND_DIR), env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--orders", type=int, default=4000)
+    parser.add_argument("--fsync-ms", type=float, default=0.0, help="Extra latency per fsync (simulated disk)")
+    args = parser.parse_args()
+
+    print(f"{args.orders} checkouts from {args.threads} threads, fsync +{args.fsync_ms:g} ms")
+    for label, group_commit in (("group commit off", False), ("group commit on", True)):
+        r = run(args, group_commit)
+        print(f"{label:<17} {r['orders_per_s']:7.0f} orders/s | latency p50 {r['p50_ms']:6.2f} ms p99 {r['p99_ms']:7.2f} ms | "
+              f"{r['writes']} writes in {r['commits']} fsyncs ({r['writes'] / max(1, r['commits']):.1f} per commit)")
+
+
+if __name__ == "__main__":
+    main()
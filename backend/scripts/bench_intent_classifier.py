@@ -0,0 +1,110 @@
+"""
+Offline benchmark of the local agent-intent classifier (app/intent_classifier.py).
+Run from backend: python scripts/bench_intent_classifier.py
+The labeled messages below are held out from the classifier's training examples.
+Reports how many turns are decided locally (no LLM call), accuracy of those decisions,
+false actions (an action decided for a message that isn't one), whether negated, hedged
+and non-order requests are left to the LLM, and latency.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.intent_classifier import classify_agent_intent
+
+LABELED = [
+    # cancel_order
+    ("cancel it", "cancel_order"), ("please cancel my order", "cancel_order"),
+    ("cancel order ORD-9F8E7D6C", "cancel_order"), ("i'd like to cancel the last order", "cancel_order"),
+    ("cancel my recent order please", "cancel_order"), ("go ahead and cancel that", "cancel_order"),
+    ("I need to cancel my latest order", "cancel_order"), ("cancel the order", "cancel_order"),
+    # reorder_last
+    ("reorder my last purchase", "reorder_last"), ("repeat the previous order", "reorder_last"),
+    ("order it again", "reorder_last"), ("buy that again", "reorder_last"),
+    ("get me my previous order again", "reorder_last"), ("same items as last time please", "reorder_last"),
+    ("re-order", "reorder_last"), ("redo my last order", "reorder_last"),
+    # book_at_store
+    ("book this at the store", "book_at_store"), ("I'll pick it up from the store", "book_at_store"),
+    ("store pick up please", "book_at_store"), ("let me collect it at the shop", "book_at_store"),
+    ("book my cart at store", "book_at_store"), ("in-store pickup for these", "book_at_store"),
+    ("reserve these at a store", "book_at_store"), ("pick them up at store", "book_at_store"),
+    # deliver_cart
+    ("deliver it", "deliver_cart"), ("ship my cart", "deliver_cart"), ("send these to me", "deliver_cart"),
+    ("please deliver this to my home", "deliver_cart"), ("I want home delivery", "deliver_cart"),
+    ("deliver to my address", "deliver_cart"), ("ship them home", "deliver_cart"),
+    ("home delivery please", "deliver_cart"),
+    # none
+    ("hi there", "none"), ("good morning", "none"), ("thank you so much", "none"),
+    ("show me running shoes", "none"), ("suggest a gift for my sister", "none"),
+    ("best watches under 3000", "none"), ("any good kurtas", "none"), ("what's trending", "none"),
+    ("how do I return a product", "none"), ("what is the refund policy", "none"),
+    ("how can i cancel my order?", "none"), ("can I cancel an order after it ships?", "none"),
+    ("how many days for delivery", "none"), ("do you deliver to bangalore?", "none"),
+    ("what are your store timings", "none"), ("where is your nearest store?", "none"),
+    ("is store pickup free?", "none"), ("track my order", "none"), ("where is my order", "none"),
+    ("what is my wallet balance", "none"), ("tell me about aurapoints", "none"),
+    ("order any black shoe mens for me", "none"), ("buy me a blue shirt", "none"),
+    ("add it to cart", "none"), ("proceed to checkout", "none"),
+    ("show me dresses for a party", "none"), ("is this available in size 9", "none"),
+    ("compare these two phones", "none"), ("which is better", "none"),
+    ("do you have free shipping?", "none"), ("what's the cancellation policy", "none"),
+]
+# Negated, hedged, non-order or qualified requests: taking any action on these is a false action, and
+# they should all be left to the LLM rather than decided locally
+GUARDED = [
+    ("don't cancel my order", "none"), ("never mind, don't deliver it", "none"),
+    ("please send me some shoe recommendations", "none"), ("i want to cancel my subscription to emails", "none"),
+    ("book a table at the shop", "none"), ("I will pick up", "none"), ("order it again later maybe", "none"),
+    ("do not ship it yet", "none"), ("maybe cancel my last order", "none"), ("send me the invoice", "none"),
+    ("cancel my return request", "none"), ("i might pick it up from the store", "none"),
+    # Another destination or recipient, or a specific / several orders
+    ("ship it to my office", "none"), ("deliver this to a different address", "none"),
+    ("send this to my friend", "none"), ("cancel the order for the shoes", "none"),
+    ("cancel my previous order too, and the one before", "none"), ("cancel both orders", "none"),
+]
+LABELED += GUARDED
+
+
+def main():
+    local = correct = false_actions = missed_actions = 0
+    latencies = []
+    wrong = []
+    for _ in range(200):
+        for text, gold in LABELED:
+            t = time.perf_counter()
+            classify_agent_intent(text)
+            latencies.append((time.perf_counter() - t) * 1e6)
+    for text, gold in LABELED:
+        decision = classify_agent_intent(text)
+        if decision is None:
+            continue
+        local += 1
+        if decision.intent == gold:
+            correct += 1
+        else:
+            wrong.append((text, gold, decision.intent, decision.source))
+            if gold == "none":
+                false_actions += 1
+            else:
+                missed_actions += 1
+    n = len(LABELED)
+    guarded_local = [text for text, _ in GUARDED if classify_agent_intent(text) is not None]
+    latencies.sort()
+    print(f"{n} held-out messages ({len(GUARDED)} negated, hedged, non-order or qualified)")
+    print(f"  decided locally        {local}/{n} ({local / n:.0%}); escalated to LLM {n - local}")
+    print(f"  local accuracy         {correct}/{local} ({correct / max(local, 1):.1%})")
+    print(f"  false actions          {false_actions}  | missed actions {missed_actions}")
+    print(f"  guarded decided locally {len(guarded_local)}/{len(GUARDED)} (should be 0)")
+    print(f"  latency                p50 {latencies[len(latencies) // 2]:.0f} us | p99 {latencies[int(len(latencies) * 0.99)]:.0f} us")
+    for text, gold, got, source in wrong:
+        print(f"  wrong: {text!r}: expected {gold}, got {got} ({source})")
+    for text in guarded_local:
+        print(f"  not escalated: {text!r}")
+    if guarded_local or false_actions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark keyword search: old per-query linear scan vs the BM25 inverted index.
+Run from backend: python scripts/bench_keyword_search.py [--products 50000]
+The catalog is scaled up by cloning data/products.json with fresh IDs and shuffled name words.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data_store import load_products
+from app.keyword_index import BM25Index
+
+QUERIES = [
+    "shoes", "running shoes men", "women cycling shorts", "analog watch",
+    "gold plated necklace", "cotton kurta", "leather wallet", "sports shoes",
+    "silver ring", "kids t shirt", "home decor", "bedsheet double",
+]
+
+
+def linear_scan(query, products, top_k=15):
+    """The previous search_products_keyword implementation."""
+    words = re.findall(r"\w+", query.lower())
+    scored = []
+    for p in products:
+        text = f"{p.name} {p.category} {' '.join(p.tags)}".lower()
+        score = sum(1 for w in words if w in text)
+        if score > 0:
+            scored.append((p.id, score))
+    scored.sort(key=lambda x: -x[1])
+    return [pid for pid, _ in scored[:top_k]]
+
+
+def scaled_catalog(n, seed):
+    rng = random.Random(seed)
+    base = load_products()
+    out = []
+    for i in range(n):
+        p = base[i % len(base)]
+        words = p.name.split()
+        rng.shuffle(words)
+        out.append(p.model_copy(update={"id": f"X{i:06d}", "name": " ".join(words)}))
+    return out
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            t = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - t) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products = scaled_catalog(args.products, seed=3)
+    t = time.perf_counter()
+    index = BM25Index(products)
+    print(f"{len(products):,} products, {len(index.postings):,} terms, "
+          f"index built in {time.perf_counter() - t:.2f}s")
+
+    p50, p99 = timed(lambda q: linear_scan(q, products), max(1, args.repeat // 10))
+    print(f"linear scan : p50 {p50:9.0f} us | p99 {p99:9.0f} us")
+    p50, p99 = timed(lambda q: index.search(q, top_k=15), args.repeat)
+    print(f"BM25 index  : p50 {p50:9.0f} us | p99 {p99:9.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Circuit breaker in the LLM gateway during a simulated outage.
+Run from backend: python scripts/bench_llm_breaker.py [--calls 20] [--timeout 2]
+An upstream that accepts connections and never answers stands in for a degraded API:
+every call waits for the client timeout. The breaker should open after
+LLM_BREAKER_FAILURES failures, fail the remaining calls at once, and close again on the
+first successful probe once the upstream (scripts/fake_openai_server.py) is healthy.
+Last, a half-open probe is cancelled while it waits for the rate limit (a client that
+disconnects): the breaker has to let the next call probe instead of staying stuck.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+FAKE_PORT = 8904
+
+os.environ.update(OPENAI_API_KEY="sk-fake", LLM_BREAKER_FAILURES="3", LLM_BREAKER_COOLDOWN="2")
+
+from openai import AsyncOpenAI, OpenAI
+
+from app.llm_gateway import CircuitOpenError, _state, achat_completion_stream, chat_completion, get_llm_metrics
+
+
+def blackhole() -> int:
+    """Accept connections and never respond; returns the port."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(128)
+    held = []
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            held.append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def run_calls(client, n: int, model: str):
+    outcomes = {"ok": 0, "upstream_error": 0, "short_circuited": 0}
+    t = time.perf_counter()
+    for i in range(n):
+        try:
+            chat_completion(model, [{"role": "user", "content": f"hello {i}"}], client=client, coalesce=False, max_tokens=20)
+            outcomes["ok"] += 1
+        except CircuitOpenError:
+            outcomes["short_circuited"] += 1
+        except Exception:
+            outcomes["upstream_error"] += 1
+    return outcomes, time.perf_counter() - t
+
+
+async def cancel_probe_during_rate_wait(model: str) -> str:
+    client = AsyncOpenAI(api_key="sk-fake", base_url=f"http://127.0.0.1:{FAKE_PORT}/v1", max_retries=0)
+    state = _state(model)
+    for _ in range(3):
+        state.breaker.failure(TimeoutError("simulated outage"))
+    await asyncio.sleep(2.1)
+    # Overdraw the request bucket by a minute's worth so the probe waits for the rate limit
+    state.requests.reserve(state.requests.capacity)
+    state.requests.reserve(state.requests.capacity)
+
+    async def call():
+        async with achat_completion_stream(model, [{"role": "user", "content": "hello"}], client=client, max_tokens=20) as chunks:
+            async for _ in chunks:
+                pass
+
+    probe = asyncio.create_task(call())
+    await asyncio.sleep(0.3)
+    probe.cancel()
+    try:
+        await probe
+    except asyncio.CancelledError:
+        pass
+    state.requests.tokens = state.requests.capacity
+    try:
+        await call()
+        outcome = "next call probed upstream"
+    except CircuitOpenError:
+        outcome = "next call short-circuited (probe stuck)"
+    await client.close()
+    return f"{outcome}; breaker {state.breaker.snapshot()['state']}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    down = OpenAI(api_key="sk-fake", base_url=f"http://127.0.0.1:{blackhole()}/v1", timeout=args.timeout, max_retries=0)
+    up = OpenAI(api_key="sk-fake", base_url=f"http://127.0.0.1:{FAKE_PORT}/v1", timeout=args.timeout, max_retries=0)
+    proc = subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(FAKE_PORT), "--first-token-delay", "0.05",
+    ])
+    try:
+        time.sleep(1.5)
+        print(f"outage: {args.calls} calls, upstream hangs, client timeout {args.timeout:.0f}s")
+        print(f"  without breaker (every call waits): ~{args.calls * args.timeout:.0f}s expected")
+        outcomes, took = run_calls(down, args.calls, "gpt-4o-mini")
+        print(f"  with breaker: {took:.1f}s  {outcomes}")
+        print(f"  breaker: {get_llm_metrics()['gpt-4o-mini']['breaker']}")
+
+        outcomes, took = run_calls(down, args.calls, "gpt-4o-mini")
+        print(f"still open: {args.calls} more calls in {took * 1000:.1f} ms  {outcomes}")
+
+        time.sleep(2.1)
+        outcomes, took = run_calls(down, 3, "gpt-4o-mini")
+        print(f"after cool-down, probe fails: {outcomes}; breaker {get_llm_metrics()['gpt-4o-mini']['breaker']['state']}, "
+              f"retry in {get_llm_metrics()['gpt-4o-mini']['breaker']['retry_in_s']}s")
+
+        time.sleep(4.1)
+        outcomes, took = run_calls(up, 5, "gpt-4o-mini")
+        print(f"upstream healthy, after cool-down: {outcomes}; breaker {get_llm_metrics()['gpt-4o-mini']['breaker']['state']}")
+
+        print(f"probe cancelled during rate-limit wait: {asyncio.run(cancel_probe_during_rate_wait('gpt-4o-mini-probe'))}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Exercise the LLM gateway (app/llm_gateway.py) against the fake OpenAI server:
+coalescing of identical concurrent requests, priority lanes under a small concurrency
+limit, token-bucket pacing, and async streams released on cancellation.
+Run from backend: python scripts/bench_llm_gateway.py
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+FAKE_PORT = 8903
+FAKE_URL = f"http://127.0.0.1:{FAKE_PORT}"
+
+os.environ.update(
+    OPENAI_API_KEY="sk-fake",
+    OPENAI_BASE_URL=f"{FAKE_URL}/v1",
+    # Small limits so queueing and pacing show up quickly
+    LLM_MODEL_LIMITS=json.dumps({
+        "gpt-4o-mini": {"concurrency": 4},
+        "gpt-4o": {"concurrency": 16, "rpm": 120},
+    }),
+    LLM_INTERACTIVE_RESERVED="1",
+)
+
+from app.llm_gateway import BACKGROUND, INTERACTIVE, chat_completion, achat_completion_stream, get_llm_metrics
+
+
+def upstream_requests() -> int:
+    return httpx.get(f"{FAKE_URL}/stats").json()["requests"]
+
+
+def ask(text, lane=INTERACTIVE, model="gpt-4o-mini", coalesce=True):
+    t = time.perf_counter()
+    chat_completion(model, [{"role": "user", "content": text}], lane=lane, coalesce=coalesce, max_tokens=50)
+    return time.perf_counter() - t
+
+
+def coalescing():
+    for coalesce in (False, True):
+        before = upstream_requests()
+        with ThreadPoolExecutor(50) as pool:
+            list(pool.map(lambda _: ask("what is the return window?", coalesce=coalesce), range(50)))
+        print(f"  50 identical concurrent calls, coalesce={coalesce!s:5}: {upstream_requests() - before} upstream requests")
+
+
+def priority_lanes():
+    # 4 slots, 1 reserved for interactive; 24 background calls queued before 6 interactive ones
+    with ThreadPoolExecutor(40) as pool:
+        background = [pool.submit(ask, f"bg {i}", BACKGROUND, coalesce=False) for i in range(24)]
+        time.sleep(0.05)
+        interactive = [pool.submit(ask, f"chat {i}", INTERACTIVE, coalesce=False) for i in range(6)]
+        bg = sorted(f.result() for f in background)
+        it = sorted(f.result() for f in interactive)
+    print(f"  background  (24) latency p50 {bg[len(bg) // 2] * 1000:5.0f} ms  max {bg[-1] * 1000:5.0f} ms")
+    print(f"  interactive  (6) latency p50 {it[len(it) // 2] * 1000:5.0f} ms  max {it[-1] * 1000:5.0f} ms (arrived last)")
+
+
+def pacing():
+    # gpt-4o limited to 120 requests/minute; the bucket starts full, then admits 2 per second
+    t = time.perf_counter()
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda i: ask(f"policy {i}", BACKGROUND, model="gpt-4o"), range(130)))
+    print(f"  130 gpt-4o calls at 120 rpm: {time.perf_counter() - t:.1f}s (120 from the full bucket, 10 paced at 2/s)")
+
+
+async def stream_cancellation():
+    async def consume(i):
+        async with achat_completion_stream("gpt-4o-mini", [{"role": "user", "content": f"s{i}"}]) as chunks:
+            async for _ in chunks:
+                pass
+
+    tasks = [asyncio.create_task(consume(i)) for i in range(12)]
+    await asyncio.sleep(0.3)
+    for task in tasks[:8]:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    m = get_llm_metrics()["gpt-4o-mini"]
+    print(f"  12 async streams on 4 slots, 8 cancelled: in_flight {m['in_flight']}, queued {m['queued']} afterwards")
+
+
+def main():
+    proc = subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(FAKE_PORT),
+        "--first-token-delay", "0.1", "--chunks", "10",
+    ])
+    try:
+        for _ in range(100):
+            try:
+                upstream_requests()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        print("coalescing")
+        coalescing()
+        print("priority lanes (gpt-4o-mini, 4 slots, 100 ms calls)")
+        priority_lanes()
+        print("token bucket")
+        pacing()
+        print("async streams")
+        asyncio.run(stream_cancellation())
+        print(json.dumps(get_llm_metrics(), indent=2))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
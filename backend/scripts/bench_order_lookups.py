@@ -0,0 +1,82 @@
+"""
+Benchmark order lookups: scanning every order (previous get_user_orders and old-format
+verify_pickup_qr) vs the user / QR secondary indexes in order_service.
+Run from backend: python scripts/bench_order_lookups.py [--orders 100000] [--users 5000]
+Orders are generated in memory (the order store is not opened).
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import order_service
+from app.models import DeliveryMethod, Order, OrderItem, OrderStatus
+
+
+def scan_user_orders(user_id):
+    """The previous get_user_orders implementation."""
+    user_orders = [o for o in order_service._orders.values() if o.user_id == user_id]
+    return sorted(user_orders, key=lambda o: o.created_at or "", reverse=True)
+
+
+def scan_qr(qr_code):
+    for order in order_service._orders.values():
+        if order.qr_code == qr_code and order.delivery_method == DeliveryMethod.STORE_PICKUP:
+            return order
+    return None
+
+
+def timed(fn, args):
+    samples = []
+    for a in args:
+        t = time.perf_counter()
+        fn(a)
+        samples.append((time.perf_counter() - t) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Keep the benchmark in memory: mark orders as loaded so the store is never opened
+    order_service._orders_loaded = True
+    item = [OrderItem(product_id="P00001", quantity=1, price=49.99)]
+    t = time.perf_counter()
+    for i in range(args.orders):
+        order = Order(
+            id=f"ORD-{i:08X}", user_id=f"user{i % args.users}", items=item, total=49.99,
+            delivery_method=DeliveryMethod.STORE_PICKUP, status=OrderStatus.PENDING,
+            qr_code=f"AURASHOP-PICKUP-{i:08X}",
+            created_at=f"2026-01-01T00:00:00.{i:06d}", updated_at="",
+        )
+        order_service._orders[order.id] = order
+        order_service._index_order(order)
+    print(f"{args.orders} orders, {args.users} users, built and indexed in {time.perf_counter() - t:.1f} s")
+
+    rng = random.Random(7)
+    users = [f"user{rng.randrange(args.users)}" for _ in range(300)]
+    qrs = [f"AURASHOP-PICKUP-{rng.randrange(args.orders):08X}" for _ in range(300)]
+    same = sum([o.id for o in scan_user_orders(u)] == [o.id for o in order_service.get_user_orders(u)] for u in users[:50])
+    same += sum(scan_qr(q) is order_service.verify_pickup_qr(q) for q in qrs[:50])
+    print(f"identical results: {same}/100")
+
+    for label, old, new, sample in (
+        ("get_user_orders", scan_user_orders, order_service.get_user_orders, users),
+        ("old-format QR", scan_qr, order_service.verify_pickup_qr, qrs),
+    ):
+        old_p50, old_p99 = timed(old, sample[:50])
+        new_p50, new_p99 = timed(new, sample)
+        print(f"{label:<16} scan p50 {old_p50:9.1f} us p99 {old_p99:9.1f} us | index p50 {new_p50:6.1f} us p99 {new_p99:6.1f} us")
+    page_p50, _ = timed(lambda u: order_service.get_user_orders_page(u, 10), users)
+    print(f"first page of 10 p50 {page_p50:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
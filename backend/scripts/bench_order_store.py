@@ -0,0 +1,99 @@
+"""
+Benchmark checkout write latency: rewriting the whole orders.json per mutation (previous
+order_service._save_orders) vs one row in the SQLite order store.
+Run from backend: python scripts/bench_order_store.py [--sizes 10000,1000000] [--writes 200]
+Each size starts from a store and a JSON document holding that many existing orders; every
+write places one new order. The JSON rewrite skips model_dump (the order dicts are prebuilt),
+so its numbers are a lower bound. Files go to a temporary directory.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import DeliveryMethod, Order, OrderItem, OrderStatus
+from app.order_store import OrderStore
+
+TEMPLATE = Order(
+    id="ORD-00000000",
+    user_id="user0",
+    items=[OrderItem(product_id="P00001", quantity=1, price=49.99), OrderItem(product_id="P00042", quantity=2, price=19.5)],
+    total=88.99,
+    delivery_method=DeliveryMethod.STORE_PICKUP,
+    status=OrderStatus.PENDING,
+    store_location="AuraShop Downtown",
+    qr_code="ORD-00000000|A1B2C3D4|88.99|Downtown",
+    created_at="2026-01-30T12:58:24.002128",
+    updated_at="2026-01-30T12:58:24.002128",
+)
+
+
+def make_order(i):
+    return TEMPLATE.model_copy(update={"id": f"ORD-{i:08X}", "user_id": f"user{i % 5000}"})
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+
+
+def bench_json(path, n, writes):
+    base = TEMPLATE.model_dump(mode="json")
+    orders = [{**base, "id": f"ORD-{i:08X}", "user_id": f"user{i % 5000}"} for i in range(n)]
+    samples = []
+    for w in range(writes):
+        orders.append({**base, "id": f"ORD-{n + w:08X}"})
+        t = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"orders": orders}, f, indent=2, default=str)
+        samples.append(time.perf_counter() - t)
+    return samples, path.stat().st_size
+
+
+def bench_sqlite(path, n, writes):
+    store = OrderStore(path)
+    batch = 10_000
+    for start in range(0, n, batch):
+        store.put_many(make_order(i) for i in range(start, min(n, start + batch)))
+    samples = []
+    for w in range(writes):
+        order = make_order(n + w)
+        t = time.perf_counter()
+        store.put(order)
+        samples.append(time.perf_counter() - t)
+    # Status updates rewrite the same row
+    updates = []
+    for w in range(writes):
+        order = make_order(n + w).model_copy(update={"status": OrderStatus.CONFIRMED})
+        t = time.perf_counter()
+        store.put(order)
+        updates.append(time.perf_counter() - t)
+    assert store.count() == n + writes
+    store.close()
+    return samples, updates
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,1000000", help="Existing orders, comma separated")
+    parser.add_argument("--writes", type=int, default=200, help="New orders placed per size (SQLite)")
+    parser.add_argument("--json-writes", type=int, default=20, help="Whole-file rewrites timed per size (2 above 100k orders)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="aurashop-orders-") as tmp:
+        for n in (int(s) for s in args.sizes.split(",")):
+            # A rewrite of a million orders takes many seconds; a couple of samples is enough
+            json_writes = args.json_writes if n <= 100_000 else 2
+            json_samples, size = bench_json(Path(tmp) / f"orders_{n}.json", n, json_writes)
+            put, update = bench_sqlite(Path(tmp) / f"orders_{n}.db", n, args.writes)
+            print(f"{n:>9} orders | orders.json rewrite ({size / 1e6:6.1f} MB, {len(json_samples)} writes) "
+                  f"p50 {pct(json_samples, 0.5):9.1f} ms | SQLite insert p50 {pct(put, 0.5):6.3f} ms p99 {pct(put, 0.99):6.3f} ms "
+                  f"| status update p50 {pct(update, 0.5):6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark chat quick-order product selection: sequential list filters over the catalog
+(previous _select_product_for_quick_order) vs the attribute bitset index.
+Run from backend: python scripts/bench_quick_order.py [--products 50000]
+The catalog is scaled up by cloning data/products.json with fresh IDs.
+"""
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data_store import load_products
+from app.quick_order_index import QUICK_ORDER_CATEGORIES, QUICK_ORDER_COLORS, QUICK_ORDER_TYPES, QuickOrderIndex
+
+
+def linear_select(attrs, products):
+    """The previous _select_product_for_quick_order implementation."""
+    category = attrs.get("category")
+    color = attrs.get("color")
+    budget_max = attrs.get("budget_max")
+    product_type = attrs.get("product_type")
+    candidates = list(products)
+    if category:
+        candidates = [p for p in candidates if category.lower() in (p.category or "").lower() or (p.name and category.lower() in p.name.lower())]
+    if color:
+        candidates = [p for p in candidates if (p.colors and any(color in c.lower() for c in p.colors)) or (p.name and color in p.name.lower())]
+    if budget_max is not None:
+        candidates = [p for p in candidates if p.price <= budget_max]
+    candidates = [p for p in candidates if getattr(p, "in_stock", True)]
+    if product_type:
+        candidates = [p for p in candidates if product_type in (p.name or "").lower() or product_type in (p.category or "").lower() or (p.tags and product_type in " ".join(p.tags).lower())]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: (p.rating, -p.price))
+
+
+def scaled_catalog(n):
+    base = load_products()
+    return [base[i % len(base)].model_copy(update={"id": f"X{i:06d}"}) for i in range(n)] if n > len(base) else base
+
+
+def attribute_grid():
+    for category, color, budget, ptype in itertools.product(
+        (None,) + QUICK_ORDER_CATEGORIES, (None, "black", "blue", "white"), (None, 500, 1000, 2000, 999999), (None,) + QUICK_ORDER_TYPES,
+    ):
+        yield {"category": category, "color": color, "budget_max": budget, "product_type": ptype}
+
+
+def timed(fn, attrs_list):
+    samples = []
+    for attrs in attrs_list:
+        t = time.perf_counter()
+        fn(attrs)
+        samples.append((time.perf_counter() - t) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=0, help="Scale the catalog to this many products")
+    args = parser.parse_args()
+
+    products = scaled_catalog(args.products)
+    t = time.perf_counter()
+    index = QuickOrderIndex(products)
+    print(f"{len(products)} products, index built in {(time.perf_counter() - t) * 1000:.0f} ms")
+
+    grid = list(attribute_grid())
+    same = 0
+    for attrs in grid:
+        old = linear_select(attrs, products)
+        new = index.select(attrs, limit=3)
+        same += (old.id if old else None) == (new[0].id if new else None)
+    print(f"best match identical for {same}/{len(grid)} attribute combinations")
+
+    sample = grid[:: max(1, len(grid) // 60)]
+    old_p50, old_p99 = timed(lambda a: linear_select(a, products), sample)
+    new_p50, new_p99 = timed(lambda a: index.select(a, limit=3), grid)
+    print(f"list filters   p50 {old_p50:10.1f} us | p99 {old_p99:10.1f} us")
+    print(f"bitset index   p50 {new_p50:10.1f} us | p99 {new_p99:10.1f} us  (best + 2 alternatives)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark typo correction: recall and latency of the SymSpell deletion dictionary.
+Run from backend: python scripts/bench_spell_correct.py [--typos 5000] [--extra-words 20000]
+The misspelling corpus applies random deletes / inserts / substitutions / transpositions
+to catalog vocabulary words (1 edit, or 2 for words of 6+ chars).
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.keyword_index import get_keyword_index
+from app.spell_correct import SymSpell, max_distance_for
+
+
+def misspell(word, edits, rng):
+    for _ in range(edits):
+        op = rng.choice("dist")
+        i = rng.randrange(len(word))
+        if op == "d" and len(word) > 3:
+            word = word[:i] + word[i + 1:]
+        elif op == "i":
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+        elif op == "s":
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+        elif i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--typos", type=int, default=5_000)
+    parser.add_argument("--extra-words", type=int, default=0, help="Random words added to stress dictionary size")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    vocabulary = dict(get_keyword_index().vocabulary())
+    for _ in range(args.extra_words):
+        w = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        vocabulary.setdefault(w, 1)
+    t = time.perf_counter()
+    speller = SymSpell(vocabulary)
+    build_s = time.perf_counter() - t
+    print(f"vocabulary {len(speller.vocabulary):,} words -> {len(speller.deletes):,} delete keys "
+          f"({sum(len(v) for v in speller.deletes.values()):,} refs), built in {build_s:.2f}s")
+
+    words = [w for w in speller.vocabulary if len(w) >= 4]
+    corpus = []
+    while len(corpus) < args.typos:
+        w = rng.choice(words)
+        edits = 2 if len(w) >= 6 and rng.random() < 0.3 else 1
+        typo = misspell(w, edits, rng)
+        if typo != w and typo not in speller.vocabulary:
+            corpus.append((typo, w))
+
+    top1 = in_candidates = correctable = 0
+    latencies = []
+    for typo, expected in corpus:
+        t = time.perf_counter()
+        candidates = speller.lookup(typo)
+        latencies.append((time.perf_counter() - t) * 1e6)
+        words_found = [c[0] for c in candidates]
+        if max_distance_for(typo) > 0:
+            correctable += 1
+        if words_found[:1] == [expected]:
+            top1 += 1
+        if expected in words_found:
+            in_candidates += 1
+    latencies.sort()
+    n = len(corpus)
+    print(f"{n:,} misspellings ({correctable:,} long enough to correct)")
+    print(f"  top-1 accuracy     {top1 / n:.1%}")
+    print(f"  candidate recall   {in_candidates / n:.1%}")
+    print(f"  lookup latency     p50 {latencies[n // 2]:.0f} us | p95 {latencies[int(n * 0.95)]:.0f} us | "
+          f"p99 {latencies[int(n * 0.99)]:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark /chat/stream frame coalescing against the fake OpenAI server: one SSE frame per
+LLM delta (CHAT_STREAM_FLUSH_MS=0) vs the adaptive chunker, then heartbeats during a long
+model pause.
+Run from backend: python scripts/bench_sse_coalescing.py [--streams 100] [--chunks 300] [--tokens-per-s 100]
+Reports frames and bytes per response, TTFT and total time, and backend CPU per stream
+(from /proc, so Linux only). The reassembled text and the done event must match in both modes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MESSAGE = "tell me something nice about your store"
+
+
+async def _wait_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def one_stream(client, url, i):
+    t0 = time.perf_counter()
+    ttft = None
+    frames = pings = nbytes = 0
+    text, done = [], None
+    body = {"session_id": f"sse-{i}", "message": MESSAGE, "history": []}
+    async with client.stream("POST", url, json=body) as resp:
+        async for line in resp.aiter_lines():
+            nbytes += len(line) + 1
+            if line.startswith(":"):
+                pings += 1
+            if not line.startswith("data:"):
+                continue
+            frames += 1
+            event = json.loads(line[5:])
+            if "content" in event:
+                ttft = ttft or time.perf_counter() - t0
+                text.append(event["content"])
+            if event.get("done"):
+                done = event
+    return {"ttft": ttft, "total": time.perf_counter() - t0, "frames": frames, "pings": pings, "bytes": nbytes,
+            "text": "".join(text), "done": done}
+
+
+def pct(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float("nan")
+
+
+def start(args, port, fake_port, env_extra, fake_extra=()):
+    fake = subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(fake_port),
+        "--chunks", str(args.chunks), "--tokens-per-s", str(args.tokens_per_s), *fake_extra,
+    ])
+    env = {**os.environ, "OPENAI_API_KEY": "sk-fake", "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1", "USE_BUILTIN_CHAT": "", **env_extra}
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL,
+    )
+    asyncio.run(_wait_up(f"http://127.0.0.1:{fake_port}/stats"))
+    asyncio.run(_wait_up(f"http://127.0.0.1:{port}/ready"))
+    return fake, backend
+
+
+async def run_streams(url, n, offset=0):
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        return await asyncio.gather(*(one_stream(client, url, offset + i) for i in range(n)))
+
+
+def measure(args, label, env_extra):
+    fake, backend = start(args, args.port, args.fake_port, env_extra)
+    url = f"http://127.0.0.1:{args.port}/chat/stream"
+    try:
+        time.sleep(2.0)  # let startup warm-up finish before sampling CPU
+        asyncio.run(run_streams(url, 5, offset=90_000))
+        cpu0 = cpu_seconds(backend.pid)
+        results = asyncio.run(run_streams(url, args.streams))
+        cpu = cpu_seconds(backend.pid) - cpu0
+    finally:
+        for p in (backend, fake):
+            p.terminate()
+            p.wait()
+    n = len(results)
+    print(f"{label:<22} frames/response {sum(r['frames'] for r in results) / n:6.1f} | "
+          f"bytes/response {sum(r['bytes'] for r in results) / n:7.0f} | "
+          f"TTFT p50 {pct([r['ttft'] for r in results], 0.5):5.0f} ms | total p50 {pct([r['total'] for r in results], 0.5):5.0f} ms | "
+          f"backend CPU/stream {cpu / n * 1000:5.1f} ms")
+    return results
+
+
+def heartbeat(args):
+    fake, backend = start(args, args.port, args.fake_port, {"CHAT_STREAM_HEARTBEAT_S": "1"}, ("--first-token-delay", "3.5", "--chunks", "5"))
+    try:
+        r = asyncio.run(run_streams(f"http://127.0.0.1:{args.port}/chat/stream", 1))[0]
+    finally:
+        for p in (backend, fake):
+            p.terminate()
+            p.wait()
+    print(f"3.5 s model pause, 1 s heartbeat: {r['pings']} heartbeat comments, then {r['frames']} data frames (done event: {bool(r['done'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=300, help="Deltas per fake completion")
+    parser.add_argument("--tokens-per-s", type=float, default=100)
+    parser.add_argument("--port", type=int, default=8905)
+    parser.add_argument("--fake-port", type=int, default=8906)
+    args = parser.parse_args()
+
+    print(f"{args.streams} concurrent streams, {args.chunks} deltas each at {args.tokens_per_s:.0f} tokens/s")
+    per_delta = measure(args, "one frame per delta", {"CHAT_STREAM_FLUSH_MS": "0"})
+    coalesced = measure(args, "coalesced (default)", {})
+    same = sum(a["text"] == b["text"] and a["done"] == b["done"] for a, b in zip(per_delta, coalesced))
+    print(f"identical text and done event: {same}/{len(per_delta)} streams")
+    heartbeat(args)
+
+
+if __name__ == "__main__":
+    main()
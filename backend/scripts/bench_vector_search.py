@@ -0,0 +1,130 @@
+"""
+Benchmark semantic search: in-process vector index (float32 / int8 / HNSW) vs Chroma.
+Run from backend: python scripts/bench_vector_search.py [--products 50000] [--model]
+Exact float32 dot-product results are the ground truth for recall@k. Without --model
+(or when sentence-transformers is missing) embeddings are synthetic: per-category
+centroids plus noise, 384 dims like all-MiniLM-L6-v2. Chroma / hnswlib rows are
+skipped if those packages are not installed.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import vector_index as vi
+from app.data_store import load_products
+from app.rag_store import _product_to_document
+from app.vector_index import VectorIndex
+
+DIM = 384
+
+
+def scaled_catalog(n, seed):
+    rng = random.Random(seed)
+    base = load_products()
+    out = []
+    for i in range(n):
+        p = base[i % len(base)]
+        words = p.name.split()
+        rng.shuffle(words)
+        out.append(p.model_copy(update={"id": f"X{i:06d}", "name": " ".join(words)}))
+    return out
+
+
+def synthetic_embedder(products, seed):
+    rng = np.random.default_rng(seed)
+    centroids = {c: rng.normal(size=DIM) for c in sorted({p.category for p in products})}
+    vectors = {}
+    for p in products:
+        vectors[_product_to_document(p)] = centroids[p.category] + rng.normal(scale=1.2, size=DIM)
+
+    def embed(documents):
+        return np.vstack([vectors[d] for d in documents]).astype(np.float32)
+    return embed
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def run(name, search, queries, truth, k):
+    hits = 0
+    latencies = []
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        got = search(q)
+        latencies.append((time.perf_counter() - t) * 1e6)
+        hits += len(set(got[:k]) & expected)
+    p50, p99 = percentiles(latencies)
+    print(f"{name:<28}: recall@{k} {hits / (len(queries) * k):6.1%} | p50 {p50:8.0f} us | p99 {p99:8.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=15)
+    parser.add_argument("--model", action="store_true", help="Embed with all-MiniLM-L6-v2 (slow to build)")
+    args = parser.parse_args()
+    k = args.k
+
+    products = scaled_catalog(args.products, seed=5)
+    if args.model and vi.embeddings_available():
+        embed = vi._embed_documents
+    else:
+        embed = synthetic_embedder(products, seed=5)
+    t = time.perf_counter()
+    exact = VectorIndex.build(products, embed, dtype="float32")
+    print(f"{len(products):,} products embedded in {time.perf_counter() - t:.1f}s")
+    q8, scales = vi._quantize(np.asarray(exact.vectors))
+    categories = [exact.category_names[c] for c in exact.category_codes]
+    int8 = VectorIndex(exact.ids, q8, categories, exact.prices, scales=scales)
+
+    rng = np.random.default_rng(9)
+    rows = rng.integers(0, len(products), size=args.queries)
+    queries = [np.asarray(exact.vectors[r]) + rng.normal(scale=0.05, size=DIM).astype(np.float32) for r in rows]
+    truth = [{row for row, _ in exact.search(q, k)} for q in queries]
+    run("numpy float32 (exact)", lambda q: [r for r, _ in exact.search(q, k)], queries, truth, k)
+    run("numpy int8", lambda q: [r for r, _ in int8.search(q, k)], queries, truth, k)
+
+    # Category + price pre-filter
+    cat = categories[int(rows[0])]
+    ftruth = [{row for row, _ in exact.search(q, k, category=cat, max_price=2000)} for q in queries]
+    run("numpy float32 + filter", lambda q: [r for r, _ in exact.search(q, k, category=cat, max_price=2000)], queries, ftruth, k)
+
+    hnsw = vi._build_hnsw(np.asarray(exact.vectors))
+    if hnsw is not None:
+        exact._hnsw = hnsw
+        run("hnswlib", lambda q: [r for r, _ in exact._search_hnsw(q / np.linalg.norm(q), k, None)], queries, truth, k)
+        exact._hnsw = None
+    else:
+        print("hnswlib not installed - skipped")
+
+    try:
+        import chromadb
+    except Exception:
+        print("chromadb not installed - skipped")
+        return
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection("bench_products", metadata={"hnsw:space": "l2"})
+    matrix = np.asarray(exact.vectors)
+    for i in range(0, len(products), 5000):
+        collection.add(
+            ids=[str(j) for j in range(i, min(i + 5000, len(products)))],
+            embeddings=matrix[i:i + 5000].tolist(),
+        )
+
+    def chroma_search(q):
+        res = collection.query(query_embeddings=[(q / np.linalg.norm(q)).tolist()], n_results=k)
+        return [int(x) for x in res["ids"][0]]
+    run("chroma", chroma_search, queries, truth, k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Local OpenAI-compatible stand-in for load tests (no API quota used).
+Run from backend: python scripts/fake_openai_server.py [--port 8901] [--chunks 40] [--chunk-delay 0.02]
+  [--tokens-per-s 50]           decode rate (overrides --chunk-delay)
+  [--prefill-tokens-per-s 5000] adds prompt-size-dependent time to first token, like a real model
+  [--jitter 0.2]                +/- fraction of random variation on every delay
+  [--mode canned|echo]          canned answers shaped for each caller, or echo the last user text
+  [--error-rate 0.05] [--rate-limit-rate 0.05] [--hang-rate 0.01] [--disconnect-rate 0.02]
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8901/v1 and any OPENAI_API_KEY
+(the returns agents' own clients read OPENAI_BASE_URL from the environment too).
+Serves POST /v1/chat/completions (streaming and non-streaming, text and vision message shapes);
+GET /stats reports requests, streams completed / aborted by the client and injected faults;
+POST /control updates any setting at runtime, e.g. {"error_rate": 1.0} to simulate an outage.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+config = {
+    "chunks": 40,
+    "chunk_delay": 0.02,
+    "tokens_per_s": 0.0,
+    "first_token_delay": 0.2,
+    "prefill_tokens_per_s": 0.0,
+    "jitter": 0.0,
+    "mode": "canned",
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "hang_rate": 0.0,
+    "hang_seconds": 60.0,
+    "disconnect_rate": 0.0,
+}
+stats = {
+    "requests": 0,
+    "vision_requests": 0,
+    "streams_started": 0,
+    "streams_completed": 0,
+    "streams_aborted": 0,
+    "active_streams": 0,
+    "faults": {"error": 0, "rate_limit": 0, "hang": 0, "disconnect": 0},
+}
+
+# Prompt tokens charged per image part (gpt-4o high detail)
+IMAGE_TOKENS = 765
+REPLY_WORDS = (
+    "Here are a few picks you might like: P00012 is a comfortable everyday choice, "
+    "P00045 is great value, and P00107 is a customer favourite this week."
+).split()
+_PRODUCT_ID_RE = re.compile(r"\bP\d{3,5}\b")
+
+
+def _parts(messages):
+    """(text of all messages, number of image parts, last user text) for text and vision shapes."""
+    texts, images, last_user = [], 0, ""
+    for m in messages:
+        content = m.get("content") or ""
+        if isinstance(content, list):
+            text = " ".join(p.get("text", "") for p in content if p.get("type") == "text")
+            images += sum(1 for p in content if p.get("type") == "image_url")
+        else:
+            text = str(content)
+        texts.append(text)
+        if m.get("role") == "user":
+            last_user = text
+    return " ".join(texts), images, last_user
+
+
+def _canned(prompt: str, images: int, json_mode: bool) -> str:
+    if "intent parser" in prompt:
+        return '{"intent": "none", "order_id": null}'
+    if "JSON array" in prompt:
+        ids = list(dict.fromkeys(_PRODUCT_ID_RE.findall(prompt)))[:5] or ["P00012"]
+        return json.dumps([{"product_id": pid, "reason": "Good match for your budget", "confidence": 0.8} for pid in ids])
+    if json_mode and images:
+        return json.dumps({
+            "image_matches_product": True,
+            "image_matches_description": True,
+            "validation_issue": "",
+            "identified_product": "the product described",
+            "defect_label": "cracked_screen",
+            "estimated_severity": "moderate",
+            "image_description": "A device with a visible crack across the front panel.",
+            "vision_confidence": 0.86,
+            "probable_cause": "manufacturing",
+            "defect_location": "front panel",
+            "damage_pattern_analysis": "Straight crack without impact marks.",
+        })
+    if json_mode and "policies" in prompt.lower():
+        return json.dumps({
+            "decision": "APPROVE",
+            "applicability": 0.82,
+            "reasoning": "Policy RP-001 covers manufacturing defects reported within 30 days.",
+            "answers": {"defect_covered": "yes", "damage_type_allowed": "yes", "time_window_compliant": "yes", "category_eligible": "yes"},
+        })
+    if json_mode:
+        return json.dumps({"title": "Your return is approved", "body": "Good news! Your return was approved. A pickup will be scheduled shortly."})
+    return " ".join(REPLY_WORDS)
+
+
+def _reply_for(messages, json_mode: bool = False) -> tuple:
+    """(reply text, prompt token estimate)."""
+    prompt, images, last_user = _parts(messages)
+    prompt_tokens = len(prompt) // 4 + images * IMAGE_TOKENS
+    if images:
+        stats["vision_requests"] += 1
+    if config["mode"] == "echo" and not json_mode:
+        return (last_user or "(empty)"), prompt_tokens
+    return _canned(prompt, images, json_mode), prompt_tokens
+
+
+def _vary(seconds: float) -> float:
+    j = config["jitter"]
+    return max(0.0, seconds * (1 + random.uniform(-j, j))) if j else seconds
+
+
+def _first_token_delay(prompt_tokens: int) -> float:
+    delay = config["first_token_delay"]
+    if config["prefill_tokens_per_s"] > 0:
+        delay += prompt_tokens / config["prefill_tokens_per_s"]
+    return _vary(delay)
+
+
+def _chunk_delay() -> float:
+    if config["tokens_per_s"] > 0:
+        return _vary(1.0 / config["tokens_per_s"])
+    return _vary(config["chunk_delay"])
+
+
+def _fault():
+    """Pick an injected fault for this request (or None)."""
+    r = random.random()
+    for name, key in (("error", "error_rate"), ("rate_limit", "rate_limit_rate"), ("hang", "hang_rate"), ("disconnect", "disconnect_rate")):
+        if r < config[key]:
+            stats["faults"][name] += 1
+            return name
+        r -= config[key]
+    return None
+
+
+def _error_response(fault: str) -> JSONResponse:
+    if fault == "rate_limit":
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (injected)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429, headers={"retry-after": "1"},
+        )
+    return JSONResponse({"error": {"message": "The server had an error (injected)", "type": "server_error"}}, status_code=500)
+
+
+def _chunk(cid: str, model: str, delta: dict, finish=None) -> str:
+    payload = {
+        "id": cid,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _stream(cid: str, model: str, text: str, first_token_delay: float, disconnect: bool):
+    words = text.split() or [""]
+    n = config["chunks"] if config["mode"] == "canned" else len(words)
+    stats["streams_started"] += 1
+    stats["active_streams"] += 1
+    completed = False
+    try:
+        await asyncio.sleep(first_token_delay)
+        yield _chunk(cid, model, {"role": "assistant", "content": ""})
+        for i in range(n):
+            if disconnect and i == n // 2:
+                # Injected fault: drop the connection mid-stream
+                raise ConnectionResetError("injected disconnect")
+            yield _chunk(cid, model, {"content": words[i % len(words)] + " "})
+            await asyncio.sleep(_chunk_delay())
+        yield _chunk(cid, model, {}, finish="stop")
+        yield "data: [DONE]\n\n"
+        completed = True
+    finally:
+        stats["active_streams"] -= 1
+        stats["streams_completed" if completed else "streams_aborted"] += 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    model = body.get("model", "gpt-4o-mini")
+    messages = body.get("messages") or []
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    text, prompt_tokens = _reply_for(messages, json_mode)
+    delay = _first_token_delay(prompt_tokens)
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    fault = _fault()
+    if fault == "hang":
+        await asyncio.sleep(config["hang_seconds"])
+    elif fault in ("error", "rate_limit"):
+        await asyncio.sleep(_vary(config["first_token_delay"]))
+        return _error_response(fault)
+    if body.get("stream"):
+        return StreamingResponse(_stream(cid, model, text, delay, fault == "disconnect"), media_type="text/event-stream")
+    completion_tokens = len(text.split())
+    await asyncio.sleep(delay + completion_tokens * _chunk_delay())
+    return {
+        "id": cid,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return {**stats, "config": config}
+
+
+@app.post("/control")
+async def control(request: Request):
+    """Change settings at runtime (unknown keys are ignored)."""
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in config:
+            config[key] = type(config[key])(value)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--chunks", type=int, default=config["chunks"])
+    parser.add_argument("--chunk-delay", type=float, default=config["chunk_delay"])
+    parser.add_argument("--tokens-per-s", type=float, default=config["tokens_per_s"])
+    parser.add_argument("--first-token-delay", type=float, default=config["first_token_delay"])
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=config["prefill_tokens_per_s"])
+    parser.add_argument("--jitter", type=float, default=config["jitter"])
+    parser.add_argument("--mode", choices=["canned", "echo"], default=config["mode"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=config["rate_limit_rate"])
+    parser.add_argument("--hang-rate", type=float, default=config["hang_rate"])
+    parser.add_argument("--hang-seconds", type=float, default=config["hang_seconds"])
+    parser.add_argument("--disconnect-rate", type=float, default=config["disconnect_rate"])
+    args = parser.parse_args()
+    config.update({key: getattr(args, key) for key in config})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline load test of the main user journeys against the fake OpenAI server.
+Run from backend: python scripts/load_test.py [--users 50] [--duration 60] [--mix browse=40,search=30,chat=15,checkout=10,returns=5]
+Closed-loop virtual users each pick a scenario from the weighted mix, run its requests in
+order, think for --think seconds and repeat:
+  browse    GET /categories, /products, /products/{id}, /recommendations
+  search    GET /search/suggest, /search
+  chat      POST /chat/stream (read to the end of the SSE stream)
+  checkout  POST /events (cart_add), GET /session/{id}/cart, POST /orders, GET /orders/{id}
+  returns   POST /orders, POST /returns/ (vision + policy agents on the fake server)
+Reports count, errors, throughput and p50/p95/p99 latency per endpoint.
+Starts scripts/fake_openai_server.py (with any --fake-args, e.g. "--error-rate 0.05 --jitter 0.3")
+and the backend (uvicorn) as subprocesses unless --backend-url / --fake-url point at
+running instances. Orders go to a scratch ORDERS_FILE, so data/orders.json is not touched.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "browse=40,search=30,chat=15,checkout=10,returns=5"
+QUERIES = ["running shoes", "wireless headphones", "cotton shirt", "smart watch", "laptop bag", "blue jeans", "kitchen mixer", "face cream"]
+CHAT_MESSAGES = [
+    "suggest something for a birthday gift under 2000",
+    "what are good shoes for running?",
+    "show me headphones with noise cancelling",
+    "tell me something nice about your store",
+]
+# 1x1 PNG, enough to take the vision path of the returns workflow
+PIXEL_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+
+
+async def _wait_up(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.first_error = {}
+
+    async def call(self, client, name: str, method: str, url: str, ok=(200,), **kwargs):
+        t = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.first_error.setdefault(name, repr(e))
+            return None
+        finally:
+            self.latencies[name].append(time.perf_counter() - t)
+        if resp.status_code not in ok:
+            self.errors[name] += 1
+            self.first_error.setdefault(name, f"HTTP {resp.status_code}: {resp.text[:120]}")
+        return resp
+
+    async def stream(self, client, name: str, url: str, **kwargs):
+        t = time.perf_counter()
+        try:
+            async with client.stream("POST", url, **kwargs) as resp:
+                async for _ in resp.aiter_lines():
+                    pass
+                if resp.status_code != 200:
+                    self.errors[name] += 1
+                    self.first_error.setdefault(name, f"HTTP {resp.status_code}")
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.first_error.setdefault(name, repr(e))
+        finally:
+            self.latencies[name].append(time.perf_counter() - t)
+
+
+class Scenarios:
+    def __init__(self, rec: Recorder, products: list):
+        self.rec = rec
+        self.products = products
+        self.returns_available = True
+
+    def _product(self):
+        return random.choice(self.products)
+
+    async def browse(self, client, user):
+        await self.rec.call(client, "GET /categories", "GET", "/categories")
+        p = self._product()
+        await self.rec.call(client, "GET /products", "GET", "/products", params={"category": p["category"], "limit": 24})
+        await self.rec.call(client, "GET /products/{id}", "GET", f"/products/{p['id']}")
+        await self.rec.call(client, "GET /recommendations", "GET", "/recommendations", params={"session_id": user["session_id"], "limit": 5})
+
+    async def search(self, client, user):
+        q = random.choice(QUERIES)
+        await self.rec.call(client, "GET /search/suggest", "GET", "/search/suggest", params={"q": q[:3]})
+        await self.rec.call(client, "GET /search", "GET", "/search", params={"q": q})
+
+    async def chat(self, client, user):
+        body = {"session_id": user["session_id"], "user_id": user["user_id"], "message": random.choice(CHAT_MESSAGES), "history": user["history"][-12:]}
+        await self.rec.stream(client, "POST /chat/stream", "/chat/stream", json=body)
+        user["history"] += [{"role": "user", "content": body["message"]}, {"role": "assistant", "content": "ok"}]
+
+    async def _order(self, client, user, p):
+        body = {
+            "session_id": user["session_id"],
+            "user_id": user["user_id"],
+            "items": [{"product_id": p["id"], "quantity": 1, "price": p["price"]}],
+            "delivery_method": "home_delivery",
+            "delivery_address": "12 Load Test Road",
+        }
+        resp = await self.rec.call(client, "POST /orders", "POST", "/orders", json=body)
+        return resp.json().get("id") if resp is not None and resp.status_code == 200 else None
+
+    async def checkout(self, client, user):
+        p = self._product()
+        event = {"event_type": "cart_add", "session_id": user["session_id"], "user_id": user["user_id"], "product_id": p["id"]}
+        await self.rec.call(client, "POST /events", "POST", "/events", json=event)
+        await self.rec.call(client, "GET /session/{id}/cart", "GET", f"/session/{user['session_id']}/cart")
+        order_id = await self._order(client, user, p)
+        if order_id:
+            await self.rec.call(client, "GET /orders/{id}", "GET", f"/orders/{order_id}")
+
+    async def returns(self, client, user):
+        p = self._product()
+        order_id = await self._order(client, user, p)
+        if not order_id:
+            return
+        body = {
+            "order_id": order_id,
+            "description": "The screen cracked on its own after two days of normal use.",
+            "damage_type": "FUNCTIONAL",
+            "category": p["category"] or "General",
+            "customer_email": user["user_id"],
+            "media_base64": [{"filename": "defect.png", "mime_type": "image/png", "data": PIXEL_PNG}],
+        }
+        resp = await self.rec.call(client, "POST /returns/", "POST", "/returns/", json=body, ok=(200, 201))
+        if resp is not None and resp.status_code == 404 and resp.json().get("detail") == "Not Found":
+            # Returns module not loaded in this backend (optional dependencies missing)
+            self.returns_available = False
+
+
+async def virtual_user(i, client, scenarios, mix, deadline, think, counts):
+    user = {"session_id": f"load-{i}", "user_id": f"load{i}@example.com", "history": []}
+    names, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights)[0]
+        if name == "returns" and not scenarios.returns_available:
+            await asyncio.sleep(0)
+            continue
+        await getattr(scenarios, name)(client, user)
+        counts[name] += 1
+        if think:
+            await asyncio.sleep(random.uniform(0, 2 * think))
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float("nan")
+
+
+def report(rec: Recorder, wall: float, counts: dict, scenarios: Scenarios):
+    print(f"\nscenarios run in {wall:.1f}s: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+    if not scenarios.returns_available:
+        print("  returns: module not loaded in the backend, scenario skipped")
+    print(f"{'endpoint':<24} {'count':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for name in sorted(rec.latencies):
+        lat = rec.latencies[name]
+        total += len(lat)
+        print(f"{name:<24} {len(lat):>7} {rec.errors[name]:>7} {len(lat) / wall:>8.1f} "
+              f"{pct(lat, 0.5):>8.1f} {pct(lat, 0.95):>8.1f} {pct(lat, 0.99):>8.1f}")
+    print(f"{'total':<24} {total:>7} {sum(rec.errors.values()):>7} {total / wall:>8.1f}")
+    for name, err in rec.first_error.items():
+        print(f"  first error on {name}: {err}")
+
+
+async def run(args, mix):
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.backend_url, timeout=120, limits=limits) as client:
+        products = (await client.get("/products", params={"limit": 200})).json()["products"]
+        if not products:
+            raise RuntimeError("backend returned no products")
+        rec = Recorder()
+        scenarios = Scenarios(rec, products)
+        counts = defaultdict(int)
+        if args.warmup:
+            warm_deadline = time.monotonic() + args.warmup
+            await asyncio.gather(*(virtual_user(i, client, scenarios, mix, warm_deadline, args.think, defaultdict(int)) for i in range(args.users)))
+            rec.latencies.clear()
+            rec.errors.clear()
+            rec.first_error.clear()
+        t = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(virtual_user(i, client, scenarios, mix, deadline, args.think, counts) for i in range(args.users)))
+        report(rec, time.perf_counter() - t, counts, scenarios)
+        stats = (await client.get(f"{args.fake_url}/stats")).json()
+        print(f"fake OpenAI: {stats['requests']} requests ({stats['vision_requests']} vision), faults {stats['faults']}")
+        llm = (await client.get("/metrics/llm")).json()
+        for model, m in llm.items():
+            if isinstance(m, dict) and "breaker" in m:
+                print(f"gateway {model}: breaker {m['breaker']['state']}, in_flight {m.get('in_flight')}, queued {m.get('queued')}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean think time between scenarios (seconds)")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--backend-url", default=None)
+    parser.add_argument("--fake-url", default=None)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--fake-port", type=int, default=8901)
+    parser.add_argument("--fake-args", default="--tokens-per-s 80 --first-token-delay 0.3 --jitter 0.2",
+                        help="Extra arguments for fake_openai_server.py (latency, token rate, fault injection)")
+    args = parser.parse_args()
+    mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(",") if part)}
+
+    procs = []
+    scratch = tempfile.TemporaryDirectory(prefix="aurashop-load-")
+    try:
+        if args.fake_url is None:
+            args.fake_url = f"http://127.0.0.1:{args.fake_port}"
+            procs.append(subprocess.Popen(
+                [sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(args.fake_port)] + shlex.split(args.fake_args),
+            ))
+        if args.backend_url is None:
+            args.backend_url = f"http://127.0.0.1:{args.port}"
+            env = {
+                **os.environ,
+                "OPENAI_API_KEY": "sk-fake",
+                "OPENAI_BASE_URL": f"{args.fake_url}/v1",
+                "USE_BUILTIN_CHAT": "",
+                "ORDERS_FILE": str(Path(scratch.name) / "orders.json"),
+            }
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+                cwd=str(BACKEND_DIR), env=env,
+            ))
+        asyncio.run(_wait_up(f"{args.fake_url}/stats"))
+        asyncio.run(_wait_up(f"{args.backend_url}/health"))
+        asyncio.run(run(args, mix))
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Load test /chat/stream against the fake OpenAI server: many concurrent SSE streams, then
+a batch of clients that disconnect after the first token (upstream streams must be aborted).
+Run from backend: python scripts/load_test_chat_stream.py [--streams 500] [--disconnects 100]
+Starts scripts/fake_openai_server.py and the backend (uvicorn) as subprocesses unless
+--backend-url / --fake-url point at already running instances.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MESSAGE = "tell me something nice about your store"
+
+
+async def _wait_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def one_stream(client, url, i, disconnect_early=False):
+    t0 = time.perf_counter()
+    ttft = None
+    frames = 0
+    body = {"session_id": f"load-{i}", "message": MESSAGE, "history": []}
+    async with client.stream("POST", url, json=body) as resp:
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            frames += 1
+            if ttft is None and '"content"' in line:
+                ttft = time.perf_counter() - t0
+                if disconnect_early:
+                    break
+    return ttft, time.perf_counter() - t0, frames
+
+
+def pct(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float("nan")
+
+
+async def run(args):
+    url = f"{args.backend_url}/chat/stream"
+    limits = httpx.Limits(max_connections=args.streams + args.disconnects, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        t = time.perf_counter()
+        results = await asyncio.gather(*(one_stream(client, url, i) for i in range(args.streams)), return_exceptions=True)
+        wall = time.perf_counter() - t
+        ok = [r for r in results if not isinstance(r, Exception)]
+        print(f"{len(ok)}/{args.streams} concurrent streams completed in {wall:.2f}s")
+        print(f"  TTFT   p50 {pct([r[0] for r in ok], 0.5):7.0f} ms | p99 {pct([r[0] for r in ok], 0.99):7.0f} ms")
+        print(f"  total  p50 {pct([r[1] for r in ok], 0.5):7.0f} ms | p99 {pct([r[1] for r in ok], 0.99):7.0f} ms")
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            print(f"  errors: {len(errors)} (first: {errors[0]!r})")
+
+        before = (await client.get(f"{args.fake_url}/stats")).json()
+        await asyncio.gather(*(one_stream(client, url, 10_000 + i, disconnect_early=True) for i in range(args.disconnects)), return_exceptions=True)
+        await asyncio.sleep(1.0)
+        after = (await client.get(f"{args.fake_url}/stats")).json()
+        aborted = after["streams_aborted"] - before["streams_aborted"]
+        completed = after["streams_completed"] - before["streams_completed"]
+        print(f"{args.disconnects} clients disconnected after the first token: "
+              f"upstream aborted {aborted}, ran to completion {completed}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--disconnects", type=int, default=100)
+    parser.add_argument("--backend-url", default=None)
+    parser.add_argument("--fake-url", default=None)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--fake-port", type=int, default=8901)
+    parser.add_argument("--chunks", type=int, default=40, help="Tokens per fake completion")
+    args = parser.parse_args()
+
+    procs = []
+    try:
+        if args.fake_url is None:
+            args.fake_url = f"http://127.0.0.1:{args.fake_port}"
+            procs.append(subprocess.Popen(
+                [sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(args.fake_port), "--chunks", str(args.chunks)],
+            ))
+        if args.backend_url is None:
+            args.backend_url = f"http://127.0.0.1:{args.port}"
+            env = {**os.environ, "OPENAI_API_KEY": "sk-fake", "OPENAI_BASE_URL": f"{args.fake_url}/v1", "USE_BUILTIN_CHAT": ""}
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+                cwd=str(BACKEND_DIR), env=env,
+            ))
+        asyncio.run(_wait_up(f"{args.fake_url}/stats"))
+        asyncio.run(_wait_up(f"{args.backend_url}/health"))
+        asyncio.run(run(args))
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
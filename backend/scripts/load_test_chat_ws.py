@@ -0,0 +1,191 @@
+"""
+Load test /ws/chat against the fake OpenAI server, next to the same turns over /chat/stream.
+Run from backend: python scripts/load_test_chat_ws.py [--clients 20] [--conversations 3] [--turns 4]
+Each client keeps one WebSocket and runs --conversations conversations on it concurrently,
+--turns messages each (the server keeps their history). The SSE run opens one request per
+turn and re-sends the growing history. Then: cancelling a turn mid-reply, and a client that
+stops reading (backpressure: the upstream stream must stall instead of the server buffering).
+Starts scripts/fake_openai_server.py and the backend (uvicorn) as subprocesses.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MESSAGES = ["suggest a gift for my sister", "something cheaper please", "what about shoes?", "tell me something nice about your store"]
+
+
+async def _wait_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def pct(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float("nan")
+
+
+async def ws_client(url, i, conversations, turns):
+    """One socket, several conversations in parallel; returns [(ttft, total)] per turn."""
+    results = []
+    sent_bytes = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "session_id": f"ws-{i}", "user_id": f"ws{i}@example.com"}))
+        inbox = {f"c{c}": asyncio.Queue() for c in range(conversations)}
+
+        async def reader():
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("conversation_id") in inbox:
+                    inbox[msg["conversation_id"]].put_nowait(msg)
+
+        async def conversation(cid):
+            nonlocal sent_bytes
+            for t in range(turns):
+                payload = json.dumps({"type": "chat", "conversation_id": cid, "message": MESSAGES[t % len(MESSAGES)]})
+                sent_bytes += len(payload)
+                t0 = time.perf_counter()
+                ttft = None
+                await ws.send(payload)
+                while True:
+                    msg = await inbox[cid].get()
+                    if "content" in msg and ttft is None:
+                        ttft = time.perf_counter() - t0
+                    if msg.get("done") or msg.get("type") in ("error", "cancelled"):
+                        break
+                results.append((ttft, time.perf_counter() - t0, bool(msg.get("done"))))
+
+        read_task = asyncio.create_task(reader())
+        await asyncio.gather(*(conversation(cid) for cid in inbox))
+        read_task.cancel()
+    return results, sent_bytes
+
+
+async def sse_client(client, url, i, conversations, turns):
+    results = []
+    sent_bytes = 0
+
+    async def conversation(c):
+        nonlocal sent_bytes
+        history = []
+        for t in range(turns):
+            body = {"session_id": f"sse-{i}", "message": MESSAGES[t % len(MESSAGES)], "history": history,
+                    "context": {"user_id": f"sse{i}@example.com"}}
+            sent_bytes += len(json.dumps(body))
+            t0 = time.perf_counter()
+            ttft, parts, done = None, [], False
+            async with client.stream("POST", url, json=body) as resp:
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if "content" in event:
+                        ttft = ttft or time.perf_counter() - t0
+                        parts.append(event["content"])
+                    done = done or bool(event.get("done"))
+            history = history + [{"role": "user", "content": body["message"]}, {"role": "assistant", "content": "".join(parts)}]
+            results.append((ttft, time.perf_counter() - t0, done))
+
+    await asyncio.gather(*(conversation(c) for c in range(conversations)))
+    return results, sent_bytes
+
+
+def report(label, runs, wall):
+    turns = [r for results, _ in runs for r in results]
+    done = sum(1 for r in turns if r[2])
+    sent = sum(b for _, b in runs)
+    print(f"{label:<10} {done}/{len(turns)} turns done in {wall:5.2f}s | TTFT p50 {pct([r[0] for r in turns], 0.5):5.0f} ms "
+          f"p99 {pct([r[0] for r in turns], 0.99):5.0f} ms | turn p50 {pct([r[1] for r in turns], 0.5):5.0f} ms | "
+          f"client upload {sent / 1024:6.1f} KB")
+
+
+async def cancel_and_backpressure(ws_url, fake_url):
+    async with httpx.AsyncClient() as http:
+        async with websockets.connect(ws_url) as ws:
+            await ws.send(json.dumps({"type": "chat", "conversation_id": "x", "session_id": "ws-cancel", "message": MESSAGES[3]}))
+            while "content" not in json.loads(await ws.recv()):
+                pass
+            before = (await http.get(f"{fake_url}/stats")).json()
+            await ws.send(json.dumps({"type": "cancel", "conversation_id": "x"}))
+            while json.loads(await ws.recv()).get("type") != "cancelled":
+                pass
+            await asyncio.sleep(0.5)
+            after = (await http.get(f"{fake_url}/stats")).json()
+            print(f"cancel mid-reply: cancelled event received, upstream aborted {after['streams_aborted'] - before['streams_aborted']}")
+
+        # A client that stops reading: 4 long replies on one socket, then it goes away
+        async with websockets.connect(ws_url, max_queue=1) as ws:
+            for c in range(4):
+                await ws.send(json.dumps({"type": "chat", "conversation_id": f"slow{c}", "session_id": "ws-slow", "message": MESSAGES[3]}))
+            await asyncio.sleep(3)
+            stats = (await http.get(f"{fake_url}/stats")).json()
+            print(f"client not reading for 3s: upstream streams open {stats['active_streams']}")
+            # Drop the connection without a closing handshake (the server's writes are stuck)
+            ws.transport.abort()
+        await asyncio.sleep(1)
+        final = (await http.get(f"{fake_url}/stats")).json()
+        print(f"after it disconnects: upstream aborted {final['streams_aborted'] - stats['streams_aborted']}, "
+              f"completed {final['streams_completed'] - stats['streams_completed']}, still open {final['active_streams']}")
+
+async def run(args):
+    ws_url = f"ws://127.0.0.1:{args.port}/ws/chat"
+    t = time.perf_counter()
+    runs = await asyncio.gather(*(ws_client(ws_url, i, args.conversations, args.turns) for i in range(args.clients)))
+    report("websocket", runs, time.perf_counter() - t)
+
+    limits = httpx.Limits(max_connections=args.clients * args.conversations)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        t = time.perf_counter()
+        runs = await asyncio.gather(*(sse_client(client, f"http://127.0.0.1:{args.port}/chat/stream", i, args.conversations, args.turns)
+                                      for i in range(args.clients)))
+        report("sse", runs, time.perf_counter() - t)
+
+    await cancel_and_backpressure(ws_url, args.fake_url)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8907)
+    parser.add_argument("--fake-port", type=int, default=8908)
+    args = parser.parse_args()
+    args.fake_url = f"http://127.0.0.1:{args.fake_port}"
+
+    procs = [subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "scripts" / "fake_openai_server.py"), "--port", str(args.fake_port),
+        "--chunks", "2000", "--tokens-per-s", "200",
+    ])]
+    env = {**os.environ, "OPENAI_API_KEY": "sk-fake", "OPENAI_BASE_URL": f"{args.fake_url}/v1", "USE_BUILTIN_CHAT": ""}
+    procs.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL,
+    ))
+    try:
+        asyncio.run(_wait_up(f"{args.fake_url}/stats"))
+        asyncio.run(_wait_up(f"http://127.0.0.1:{args.port}/ready"))
+        asyncio.run(run(args))
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()